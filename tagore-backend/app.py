@@ -1,22 +1,36 @@
+import signal
+import sys
 from flask import Flask  # type: ignore
 from flask_cors import CORS  # type: ignore
+from config import CORS_ORIGINS
+from maintenance import start_scheduler
 from routes.chat_routes import chat_bp
+from routes.conversation_routes import conversation_bp
 from routes.inventory_routes import inventory_bp
+from routes.work_routes import works_bp
 
 
 def create_app():
     """Create and configure the Flask application"""
     app = Flask(__name__)
-    CORS(app, origins=["https://e39f-45-113-88-36.ngrok-free.app"])
+    CORS(app, origins=CORS_ORIGINS)
    
 
     # Register blueprints
     app.register_blueprint(chat_bp)
     app.register_blueprint(inventory_bp)
+    app.register_blueprint(conversation_bp)
+    app.register_blueprint(works_bp)
+
+    # Optional in-process archival/vacuum job (TAGORE_MAINTENANCE_INTERVAL_HOURS)
+    start_scheduler()
 
     return app
 
 
 if __name__ == "__main__":
+    # Exit through sys.exit on SIGTERM so atexit hooks flush queued DB writes
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     app = create_app()
     app.run(debug=True, port=5000)
@@ -0,0 +1,191 @@
+"""
+ASGI entry point for the async chat path.
+
+Serves /api/chat and /api/inventory/query through the async service
+methods, so a conversation waiting on the model holds no thread and one
+process can keep hundreds of them in flight. SQLite work runs on the
+database executor (db.run_in_executor). Every other path is passed to the
+Flask app from create_app through asgiref's WSGI adapter, so this one
+server replaces app.py rather than running next to it.
+
+Usage:
+    uvicorn asgi:create_asgi_app --factory --port 5000
+"""
+import json
+import logging
+import uuid
+from asgiref.wsgi import WsgiToAsgi  # type: ignore
+from app import create_app
+from config import CORS_ORIGINS
+from db import flush_writes, run_in_executor
+from services.inventory_service import InventoryService
+from services.rate_limiter import DeadlineExceeded
+from services.response_service import ResponseService
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+async def _read_json(receive):
+    """Read the full request body and decode it as JSON"""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            break
+    return json.loads(body) if body else {}
+
+
+def _cors_headers(scope):
+    """Echo the request origin back if it is allowed"""
+    origin = dict(scope["headers"]).get(b"origin", b"").decode("latin-1")
+    if origin in CORS_ORIGINS:
+        return [(b"access-control-allow-origin", origin.encode("latin-1")), (b"vary", b"Origin")]
+    return []
+
+
+async def _send_json(send, scope, payload, status=200):
+    body = json.dumps(payload).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                *_cors_headers(scope),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _handle_query(scope, receive, send, handler, route_name):
+    """
+    Answer a chat-style request: {"message", "conversationId"} in,
+    {"response", "conversationId", "speakableChunks"} out, as the Flask
+    routes do
+    """
+    try:
+        data = await _read_json(receive)
+    except ValueError:
+        await _send_json(send, scope, {"error": "Invalid JSON body"}, 400)
+        return
+
+    user_message = data.get("message")
+    conversation_id = data.get("conversationId")
+
+    if not conversation_id:
+        conversation_id = str(uuid.uuid4())
+        logger.info(f"Created new conversation ID: {conversation_id}")
+
+    if not user_message:
+        await _send_json(send, scope, {"error": "No message provided"}, 400)
+        return
+
+    try:
+        response_text, speakable_chunks, *work_parts = await handler(
+            user_message, conversation_id
+        )
+        payload = {
+            "response": response_text,
+            "conversationId": conversation_id,
+            "speakableChunks": speakable_chunks,
+        }
+        if work_parts:
+            # Chat replies also carry cursors to whole works they cut short
+            payload["workParts"] = work_parts[0]
+        await _send_json(send, scope, payload)
+    except DeadlineExceeded as de:
+        logger.error(f"Model deadline exceeded in {route_name}: {str(de)}")
+        await _send_json(
+            send,
+            scope,
+            {"error": "The service is busy. Please try again shortly.", "conversationId": conversation_id},
+            503,
+        )
+    except ValueError as ve:
+        logger.error(f"Validation error in {route_name}: {str(ve)}")
+        await _send_json(
+            send, scope, {"error": str(ve), "conversationId": conversation_id}, 400
+        )
+    except Exception as e:
+        logger.error(f"Error in {route_name}: {str(e)}")
+        await _send_json(
+            send,
+            scope,
+            {
+                "error": "An unexpected error occurred. Please try again later.",
+                "conversationId": conversation_id,
+            },
+            500,
+        )
+
+
+async def _handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Commit any queued write-behind rows before the workers exit
+            await run_in_executor(flush_writes)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def create_asgi_app():
+    """Create the ASGI application: the async chat routes plus the Flask app"""
+    # create_app also starts the optional in-process archival/vacuum job
+    flask_app = WsgiToAsgi(create_app())
+    response_service = ResponseService()
+    inventory_service = InventoryService()
+
+    routes = {
+        "/api/chat": (response_service.agenerate_full_response, "chat_message"),
+        "/api/inventory/query": (
+            inventory_service.aprocess_inventory_query,
+            "inventory_query",
+        ),
+    }
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await _handle_lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        route = routes.get(scope["path"])
+        if route is None:
+            await flask_app(scope, receive, send)
+        elif scope["method"] == "OPTIONS":
+            # CORS preflight
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 204,
+                    "headers": [
+                        (b"access-control-allow-methods", b"POST, OPTIONS"),
+                        (b"access-control-allow-headers", b"Content-Type"),
+                        *_cors_headers(scope),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": b""})
+        elif scope["method"] != "POST":
+            await _send_json(send, scope, {"error": "Method not allowed"}, 405)
+        else:
+            handler, route_name = route
+            await _handle_query(scope, receive, send, handler, route_name)
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn  # type: ignore
+
+    uvicorn.run(create_asgi_app(), port=5000)
@@ -0,0 +1,190 @@
+"""
+Benchmark how many conversations one ASGI process keeps in flight.
+
+Starts the mock model server (benchmarks/mock_model_server.py) in a
+subprocess with a fixed reply latency. It then serves create_asgi_app
+with uvicorn against a throwaway conversation database and fires
+--concurrency simultaneous /api/chat requests, each for a new
+conversation. With the async path every request waits on the model at
+the same time. So the mock's peak in-flight count should reach the
+concurrency, and the wall time should stay close to one model latency
+per wave.
+
+Usage:
+    python benchmarks/bench_async_concurrency.py --concurrency 500 --latency 1.0
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+async def post_json(port, path, payload):
+    """
+    POST JSON over a fresh connection and return (status, body)
+
+    Plain asyncio streams rather than an HTTP client library, so the load
+    generator stays cheap next to the server it is measuring.
+    """
+    body = json.dumps(payload).encode("utf-8")
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        (
+            f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("ascii")
+        + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, response_body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), response_body
+
+
+async def get_json(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode("ascii")
+    )
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.partition(b"\r\n\r\n")[2])
+
+
+async def run(concurrency, requests, mock_port):
+    import uvicorn  # type: ignore
+    from asgi import create_asgi_app
+
+    app_port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(
+            create_asgi_app(), port=app_port, log_level="warning", backlog=4096
+        )
+    )
+    server_task = asyncio.create_task(server.serve())
+    await wait_for_port(app_port)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def one_request(i):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            status, _ = await post_json(
+                app_port,
+                "/api/chat",
+                {"message": f"Recite a poem ({i})", "conversationId": f"bench-{i}"},
+            )
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    stats = await get_json(mock_port, "/stats")
+
+    server.should_exit = True
+    await server_task
+    return elapsed, latencies, failures, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=None, help="Defaults to the concurrency")
+    parser.add_argument("--latency", type=float, default=1.0, help="Mock model latency in seconds")
+    args = parser.parse_args()
+    requests = args.requests or args.concurrency
+
+    mock_port = free_port()
+    mock = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(BACKEND_DIR, "benchmarks", "mock_model_server.py"),
+            "--port",
+            str(mock_port),
+            "--latency",
+            str(args.latency),
+        ]
+    )
+    os.environ["TAGORE_MODEL_BASE_URL"] = f"http://127.0.0.1:{mock_port}"
+    # Measure the server, not the client-side rate limiter
+    os.environ.setdefault("TAGORE_RATE_LIMIT_RPM", "0")
+    os.environ.setdefault("TAGORE_RATE_LIMIT_TPM", "0")
+
+    try:
+        with tempfile.TemporaryDirectory() as db_dir:
+            import db
+
+            db.DB_DIR = db_dir
+            db.DB_FILE = os.path.join(db_dir, "bench_conversations.db")
+            db.ARCHIVE_DB_FILE = os.path.join(db_dir, "bench_archive.db")
+
+            async def go():
+                await wait_for_port(mock_port)
+                return await run(args.concurrency, requests, mock_port)
+
+            # Keep per-request service logging out of the report
+            logging.disable(logging.INFO)
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed, latencies, failures, stats = asyncio.run(go())
+            db.close_connections()
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    waves = -(-requests // args.concurrency)
+    print(f"Requests:            {requests} ({failures} failed)")
+    print(f"Concurrency:         {args.concurrency}")
+    print(f"Model latency:       {args.latency:.2f}s")
+    print(f"Peak model calls in flight: {stats['peakInFlight']}")
+    print(f"Wall time:           {elapsed:.2f}s (ideal {waves * args.latency:.2f}s)")
+    print(f"Throughput:          {requests / elapsed:.1f} req/s")
+    print(
+        f"Latency p50/p95/p99: {percentile(latencies, 0.5):.2f}s / "
+        f"{percentile(latencies, 0.95):.2f}s / {percentile(latencies, 0.99):.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
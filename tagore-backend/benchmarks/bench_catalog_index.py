@@ -0,0 +1,168 @@
+"""
+Benchmark list_works and the title lookup: per-call SQL vs the catalog index.
+
+Builds a throwaway creations.db with the given numbers of works and times,
+for each size, the queries tools/tagore_tools.py used to run on every call
+against the in-memory CatalogIndex it now reads from: listing a category,
+a random pick of 5 works, an exact title lookup and a substring (fuzzy)
+title lookup. The index time includes the file stat that checks the
+catalog for changes, but not the one-off load, which is reported apart.
+
+Usage:
+    python benchmarks/bench_catalog_index.py --sizes 100,1000,10000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tools.catalog_index import CatalogIndex  # noqa: E402
+
+CATEGORIES = ("poem", "short-stories", "essay", "non-fiction")
+WORDS = (
+    "gitanjali", "stray", "birds", "gardener", "crescent", "moon", "fruit",
+    "gathering", "lover", "gift", "home", "world", "river", "post", "office",
+)
+
+
+def build_catalog(db_path, works):
+    """Create the creations.db tables and fill them with synthetic works"""
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        """
+        CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE works (
+            id INTEGER PRIMARY KEY,
+            category_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            has_parts BOOLEAN DEFAULT 0
+        );
+        """
+    )
+    conn.executemany(
+        "INSERT INTO categories (id, name) VALUES (?, ?)", enumerate(CATEGORIES, 1)
+    )
+    rng = random.Random(7)
+    titles = [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title() + f" {number}"
+        for number in range(works)
+    ]
+    conn.executemany(
+        "INSERT INTO works (category_id, title, has_parts) VALUES (?, ?, ?)",
+        [(rng.randint(1, len(CATEGORIES)), title, rng.random() < 0.3) for title in titles],
+    )
+    conn.commit()
+    conn.close()
+    return titles
+
+
+def sql_list_works(db_path, category, random_select, limit=5):
+    """The list_works query as run per call before the index"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    query = """
+    SELECT w.id, w.title, c.name as category, w.has_parts, w.date_created
+    FROM works w
+    JOIN categories c ON w.category_id = c.id
+    """
+    query_params = ()
+    if category != "all":
+        query += " WHERE c.name = ?"
+        query_params = (category,)
+    works = [dict(row) for row in conn.execute(query, query_params).fetchall()]
+    if random_select and works:
+        works = random.sample(works, min(limit, len(works)))
+    conn.close()
+    return works
+
+
+def sql_find_title(db_path, title):
+    """The get_work_content title lookup as run per call before the index"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    select = """
+    SELECT w.id, w.title, c.name as category, w.has_parts, w.date_created
+    FROM works w
+    JOIN categories c ON w.category_id = c.id
+    """
+    work = conn.execute(select + " WHERE w.title = ?", (title,)).fetchone()
+    if work is None:
+        work = conn.execute(
+            select + " WHERE w.title LIKE ? ORDER BY length(w.title) LIMIT 1",
+            (f"%{title}%",),
+        ).fetchone()
+    conn.close()
+    return dict(work) if work else None
+
+
+def median_us(function, samples):
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the catalog index")
+    parser.add_argument(
+        "--sizes", default="100,1000,10000", help="Comma separated numbers of works"
+    )
+    parser.add_argument("--samples", type=int, default=500, help="Calls per case")
+    args = parser.parse_args()
+
+    print(f"{'works':>7}  {'case':<18}  {'sql (us)':>10}  {'index (us)':>10}  {'speedup':>8}")
+    for size in sorted(int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "creations.db")
+            titles = build_catalog(db_path, size)
+            index = CatalogIndex(db_path)
+
+            start = time.perf_counter()
+            index.snapshot()
+            load_ms = (time.perf_counter() - start) * 1000
+
+            exact = random.choice(titles)
+            fuzzy = exact.split()[0].lower()
+            cases = (
+                (
+                    "list poem",
+                    lambda: sql_list_works(db_path, "poem", False),
+                    lambda: index.list_works("poem"),
+                ),
+                (
+                    "random 5",
+                    lambda: sql_list_works(db_path, "all", True),
+                    lambda: index.list_works("all", sample=5),
+                ),
+                (
+                    "exact title",
+                    lambda: sql_find_title(db_path, exact),
+                    lambda: index.find_title(exact),
+                ),
+                (
+                    "fuzzy title",
+                    lambda: sql_find_title(db_path, fuzzy),
+                    lambda: index.find_title(fuzzy),
+                ),
+            )
+            for name, sql_case, index_case in cases:
+                sql_us = median_us(sql_case, args.samples)
+                index_us = median_us(index_case, args.samples)
+                print(
+                    f"{size:>7}  {name:<18}  {sql_us:>10.1f}  {index_us:>10.1f}  "
+                    f"{sql_us / index_us:>7.1f}x"
+                )
+            print(f"{size:>7}  {'(index load)':<18}  {'':>10}  {load_ms * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
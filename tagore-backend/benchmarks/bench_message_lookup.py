@@ -0,0 +1,115 @@
+"""
+Benchmark conversation lookups in db.py as the messages table grows.
+
+Grows a throwaway conversation database to each requested size and times
+get_messages_by_conversation_id and get_last_message_id against random
+conversations. With the (conversation_id, seq) index the latency should
+stay flat as the table grows.
+
+Usage:
+    python benchmarks/bench_message_lookup.py --sizes 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import db  # noqa: E402
+
+MESSAGES_PER_CONVERSATION = 20
+
+
+def grow_table(target_rows, current_rows):
+    """Bulk insert synthetic conversations until the table holds target_rows"""
+    with db.get_connection() as conn:
+        rows = []
+        for row_number in range(current_rows, target_rows):
+            conversation_id = f"conv-{row_number // MESSAGES_PER_CONVERSATION}"
+            seq = row_number % MESSAGES_PER_CONVERSATION + 1
+            role = "user" if seq % 2 else "assistant"
+            rows.append((conversation_id, role, f"message {row_number}", seq))
+
+        conn.executemany(
+            "INSERT INTO messages (conversation_id, role, content, seq) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        # Maintain the per-conversation counters add_message keeps up to date
+        conn.execute(
+            """
+            INSERT INTO conversations (id, last_message_id, message_count, updated_at)
+            SELECT conversation_id, MAX(id), MAX(seq), CURRENT_TIMESTAMP
+            FROM messages WHERE id > ? GROUP BY conversation_id
+            ON CONFLICT (id) DO UPDATE SET
+                last_message_id = excluded.last_message_id,
+                message_count = excluded.message_count,
+                updated_at = excluded.updated_at
+            """,
+            (current_rows,),
+        )
+        conn.commit()
+
+    return target_rows
+
+
+def time_lookups(total_rows, samples):
+    """Return median microseconds for each lookup over random conversations"""
+    conversation_count = total_rows // MESSAGES_PER_CONVERSATION
+    results = {}
+
+    for name, lookup in (
+        ("get_messages_by_conversation_id", db.get_messages_by_conversation_id),
+        ("get_last_message_id", db.get_last_message_id),
+    ):
+        timings = []
+        for _ in range(samples):
+            conversation_id = f"conv-{random.randrange(conversation_count)}"
+            start = time.perf_counter()
+            lookup(conversation_id)
+            timings.append((time.perf_counter() - start) * 1_000_000)
+        timings.sort()
+        results[name] = timings[len(timings) // 2]
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark message lookups")
+    parser.add_argument(
+        "--sizes",
+        default="10000,100000,1000000",
+        help="Comma separated table sizes to measure",
+    )
+    parser.add_argument(
+        "--samples", type=int, default=2000, help="Lookups per size and function"
+    )
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db.DB_DIR = tmp_dir
+        db.DB_FILE = os.path.join(tmp_dir, "bench_conversations.db")
+        db.init_db()
+        # Measure SQLite, not the in-process history cache
+        db.history_cache.max_bytes = 0
+
+        print(f"{'rows':>10}  {'get_messages (us)':>18}  {'get_last_id (us)':>17}")
+        current_rows = 0
+        for size in sizes:
+            current_rows = grow_table(size, current_rows)
+            results = time_lookups(current_rows, args.samples)
+            print(
+                f"{current_rows:>10}  "
+                f"{results['get_messages_by_conversation_id']:>18.1f}  "
+                f"{results['get_last_message_id']:>17.1f}"
+            )
+
+        db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
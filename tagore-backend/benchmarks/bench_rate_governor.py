@@ -0,0 +1,126 @@
+"""
+Exercise the model-call rate governor against injected 429/529 errors.
+
+Starts the mock model server (benchmarks/mock_model_server.py) with a
+fraction of requests failing as 429 or 529, then sends a burst of
+AnthropicService.create_message calls from a thread pool, as Flask worker
+threads would. The burst runs twice: once with a single attempt, the
+failures callers used to see, and once with the governor's retries. Each
+run reports how many calls succeeded and the governor's retry and wait
+metrics.
+
+Usage:
+    python benchmarks/bench_rate_governor.py --calls 200 --concurrency 20 --error-rate 0.3
+"""
+import argparse
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+def run(service, governor, calls, concurrency):
+    """Send the burst and return (succeeded, failed, elapsed)"""
+    service.rate_governor = governor
+    messages = [{"role": "user", "content": "Recite a poem"}]
+
+    def one_call(_):
+        try:
+            service.create_message(messages)
+            return True
+        except Exception:
+            return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_call, range(calls)))
+    elapsed = time.perf_counter() - started
+    return results.count(True), results.count(False), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock model latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--error-status", default="429,529")
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--rpm", type=int, default=6000, help="Client-side requests per minute")
+    parser.add_argument("--tpm", type=int, default=0, help="Client-side input tokens per minute (0 = off)")
+    parser.add_argument("--deadline", type=float, default=30.0)
+    args = parser.parse_args()
+
+    mock_port = free_port()
+    command = [
+        sys.executable,
+        os.path.join(BACKEND_DIR, "benchmarks", "mock_model_server.py"),
+        "--port", str(mock_port),
+        "--latency", str(args.latency),
+        "--error-rate", str(args.error_rate),
+        "--error-status", args.error_status,
+    ]
+    if args.retry_after is not None:
+        command += ["--retry-after", str(args.retry_after)]
+    mock = subprocess.Popen(command)
+    os.environ["TAGORE_MODEL_BASE_URL"] = f"http://127.0.0.1:{mock_port}"
+
+    try:
+        wait_for_port(mock_port)
+        logging.disable(logging.CRITICAL)
+
+        from services.anthropic_service import AnthropicService
+        from services.rate_limiter import RateGovernor
+
+        service = AnthropicService()
+        for label, attempts in (("single attempt", 1), ("with retries", None)):
+            governor = RateGovernor(
+                requests_per_minute=args.rpm,
+                tokens_per_minute=args.tpm,
+                deadline=args.deadline,
+            )
+            if attempts:
+                governor.max_attempts = attempts
+            succeeded, failed, elapsed = run(service, governor, args.calls, args.concurrency)
+            stats = governor.stats()
+
+            print(f"\n{label}:")
+            print(f"  Succeeded / failed:  {succeeded} / {failed}")
+            print(f"  Wall time:           {elapsed:.2f}s")
+            print(f"  Attempts / retries:  {stats['attempts']} / {stats['retries']} {stats['retries_by_reason']}")
+            print(
+                f"  Throttle waits:      {stats['throttle_waits']} "
+                f"({stats['throttle_wait_seconds']:.2f}s total)"
+            )
+            print(f"  Backoff wait:        {stats['backoff_wait_seconds']:.2f}s total")
+            print(f"  Deadline exceeded:   {stats['deadline_exceeded']}")
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark conversation write throughput against the number of shards.
+
+Runs several worker processes that each append messages to random
+conversations through db.add_message, once per shard count, against a
+throwaway directory. With one shard every commit queues on the same SQLite
+write lock; with more shards, writes to different conversations proceed in
+parallel, so throughput should grow with the shard count up to the number
+of cores.
+
+Usage:
+    python benchmarks/bench_shard_writes.py --shards 1,2,4,8 --workers 8
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import db  # noqa: E402
+
+CONVERSATIONS = 1000
+
+
+def configure(db_dir, shard_count):
+    db.DB_DIR = db_dir
+    db.DB_FILE = os.path.join(db_dir, "bench_conversations.db")
+    db.DB_SHARD_COUNT = shard_count
+
+
+def worker(db_dir, shard_count, writes, start_barrier):
+    configure(db_dir, shard_count)
+    content = "x" * 400
+    start_barrier.wait()
+    for _ in range(writes):
+        conversation_id = f"conv-{random.randrange(CONVERSATIONS)}"
+        db.add_message(conversation_id, "user", content)
+    db.close_connections()
+
+
+def run(shard_count, workers, writes):
+    """Return messages written per second for one shard count"""
+    with tempfile.TemporaryDirectory() as db_dir:
+        configure(db_dir, shard_count)
+        db.init_db()
+        db.close_connections()
+
+        context = multiprocessing.get_context("spawn")
+        start_barrier = context.Barrier(workers + 1)
+        processes = [
+            context.Process(
+                target=worker, args=(db_dir, shard_count, writes, start_barrier)
+            )
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        start_barrier.wait()
+        start = time.perf_counter()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+    return workers * writes / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sharded writes")
+    parser.add_argument("--shards", default="1,2,4,8", help="Shard counts to test")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="Writer processes"
+    )
+    parser.add_argument(
+        "--writes", type=int, default=2000, help="Messages written per worker"
+    )
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.writes} writes, {os.cpu_count()} cores")
+    print(f"{'shards':>6}  {'writes/s':>10}")
+    for shard_count in (int(count) for count in args.shards.split(",")):
+        throughput = run(shard_count, args.workers, args.writes)
+        print(f"{shard_count:>6}  {throughput:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Measure title resolution on misspelled queries: SQL LIKE vs trigrams.
+
+Builds a corpus of misspelled titles from the works in creations.db (a
+dropped, doubled, swapped or replaced letter, a missing article, lower
+case), plus hand-written transliteration variants ("Gitanjoli",
+"Kabuliwala"). For each query it checks whether the lookup resolves to
+the intended work and whether the work is among the top 3 suggestions,
+once with the LIKE '%title%' queries tools/tagore_tools.py used to run and
+once with the trigram resolver of tools/catalog_index.py, and reports
+accuracy and median / p95 latency. It also looks up titles of Tagore's
+works that are not in the catalog and counts how many wrongly resolve to
+some other work instead of returning not-found.
+
+Usage:
+    python benchmarks/bench_title_resolver.py --variants 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tools.catalog_index import CatalogIndex  # noqa: E402
+from tools.tagore_tools import DB_PATH  # noqa: E402
+
+# Spellings seen in requests, mapped to the title they mean
+TRANSLITERATIONS = {
+    "Gitanjoli": "Gitanjali",
+    "Geetanjali": "Gitanjali",
+    "Kabuliwala": "The Cabuliwallah",
+    "Kabuliwallah": "The Cabuliwallah",
+    "Krishnokoli": "Krishnakali",
+    "Baishnab Songs": "Vaishnava Songs",
+    "Shantiniketan Song": "Santiniketan Song",
+    "Sadhna": "Sadhana",
+    "Postmastar": "The Postmaster",
+    "Haimonti": "Haimanti: Of Autumn",
+    "Raja Rani": "Raja and Rani",
+    "Giribla": "Giribala",
+}
+
+# Titles of works missing from the catalog, some sharing words with ones in it
+UNKNOWN_TITLES = (
+    "Chitra", "The Home", "Gora", "Ghare Baire", "Chokher Bali", "Red Oleanders",
+    "The Religion of Man", "Fireflies", "The Wreck", "Broken Nest", "Mashi",
+    "Sonar Tori", "Balaka", "Personality", "Letters", "My Boyhood Days",
+    "Thought Relics", "Fruit Salad",
+)
+
+
+def misspell(title, rng):
+    """One random typo in a title"""
+    operation = rng.choice(("drop", "double", "swap", "replace", "article", "lower"))
+    if operation == "article" and title.lower().startswith("the "):
+        return title[4:]
+    if operation == "lower":
+        return title.lower()
+    letters = [i for i, char in enumerate(title) if char.isalpha()]
+    if len(letters) < 4:
+        return title.lower()
+    i = rng.choice(letters[1:-1])
+    if operation == "drop":
+        return title[:i] + title[i + 1 :]
+    if operation == "double":
+        return title[:i] + title[i] + title[i:]
+    if operation == "swap":
+        return title[:i] + title[i + 1] + title[i] + title[i + 2 :]
+    return title[:i] + rng.choice("aeioukstrn") + title[i + 1 :]
+
+
+def build_corpus(titles, variants, seed):
+    rng = random.Random(seed)
+    corpus = [(query, title) for query, title in TRANSLITERATIONS.items() if title in titles]
+    for title in titles:
+        corpus.extend((misspell(title, rng), title) for _ in range(variants))
+    return corpus
+
+
+def like_resolve(db_path, title):
+    """Exact title, then the shortest title LIKE '%title%' (the old lookup)"""
+    conn = sqlite3.connect(db_path)
+    row = conn.execute("SELECT title FROM works WHERE title = ?", (title,)).fetchone()
+    if row is None:
+        row = conn.execute(
+            "SELECT title FROM works WHERE title LIKE ? ORDER BY length(title) LIMIT 1",
+            (f"%{title}%",),
+        ).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def like_suggestions(db_path, title, limit=3):
+    """The old get_title_suggestions query"""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT title FROM works WHERE title LIKE ? ORDER BY length(title) LIMIT ?",
+        (f"%{title}%", limit),
+    ).fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+
+def measure(corpus, resolve, suggest, unknown):
+    resolved = suggested = 0
+    timings = []
+    for query, expected in corpus:
+        start = time.perf_counter()
+        match = resolve(query)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+        resolved += match == expected
+        suggested += expected in suggest(query)
+    timings.sort()
+    return {
+        "false_matches": sum(resolve(title) is not None for title in unknown),
+        "resolved": resolved / len(corpus),
+        "suggested": suggested / len(corpus),
+        "p50_us": timings[len(timings) // 2],
+        "p95_us": timings[int(len(timings) * 0.95)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure fuzzy title resolution")
+    parser.add_argument("--db", default=DB_PATH, help="creations.db to read titles from")
+    parser.add_argument("--variants", type=int, default=5, help="Typos per title")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    index = CatalogIndex(args.db)
+    titles = {work[1] for work in index.snapshot().works}
+    corpus = build_corpus(titles, args.variants, args.seed)
+    unknown = [title for title in UNKNOWN_TITLES if title not in titles]
+
+    def index_resolve(query):
+        work = index.find_title(query)
+        return work["title"] if work else None
+
+    results = {
+        "LIKE": measure(
+            corpus,
+            lambda query: like_resolve(args.db, query),
+            lambda query: like_suggestions(args.db, query),
+            unknown,
+        ),
+        "trigram": measure(corpus, index_resolve, index.title_suggestions, unknown),
+    }
+
+    print(
+        f"{len(corpus)} misspelled queries over {len(titles)} titles, "
+        f"{len(unknown)} titles not in the catalog\n"
+    )
+    print(
+        f"{'resolver':<9}  {'resolved':>9}  {'in top 3':>9}  {'p50 (us)':>9}  {'p95 (us)':>9}  "
+        f"{'false matches':>13}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<9}  {result['resolved']:>9.1%}  {result['suggested']:>9.1%}  "
+            f"{result['p50_us']:>9.1f}  {result['p95_us']:>9.1f}  "
+            f"{result['false_matches']:>6}/{len(unknown)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
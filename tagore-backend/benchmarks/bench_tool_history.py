@@ -0,0 +1,169 @@
+"""
+Count repeated tool calls with text-note and structured tool history.
+
+Replays the same multi-turn conversations through
+ResponseService.generate_full_response twice: once with
+TAGORE_TOOL_HISTORY=notes, where earlier tool calls appear only as
+"[Note: Used tool ...]" text, and once with structured history, where they
+are replayed as tool_use / tool_result blocks. The follow-up turns refer
+to data fetched earlier ("which of those...", "that poem"). For each mode
+it reports the tool calls made, how many repeated an earlier call of the
+same conversation (and so were served from the tool memo), and the input
+tokens and model time spent.
+
+By default the model is the local mock (benchmarks/mock_model_server.py)
+scripted to re-fetch only what it cannot see in the history, which checks
+the replay mechanics end to end. Pass --live to use the real API
+(ANTHROPIC_API_KEY) and measure how the model actually behaves.
+
+Usage:
+    python benchmarks/bench_tool_history.py --conversations 10
+    python benchmarks/bench_tool_history.py --live --conversations 3
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+CONVERSATION = [
+    "Could you list some of your poems?",
+    "Which of those poems is the oldest?",
+    "Please read me Gitanjali.",
+    "What was the opening line of that poem again?",
+    "How many poems were in the list you gave me?",
+]
+
+# Mock rules: fetch on request, and re-fetch on a follow-up only when the
+# earlier result is not in the history
+MOCK_SCRIPT = [
+    {"match": "(?i)list some", "tool": "list_works", "input": {"category": "poem"}},
+    {"match": "(?i)which of those|in the list", "tool": "list_works",
+     "input": {"category": "poem"}, "unless_seen": True},
+    {"match": "(?i)read me", "tool": "get_work_content", "input": {"title": "Gitanjali"}},
+    {"match": "(?i)that poem", "tool": "get_work_content",
+     "input": {"title": "Gitanjali"}, "unless_seen": True},
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+def run(mode, conversations):
+    """Replay the conversations with one history mode and total their tool calls"""
+    from services import response_service
+    from services.usage_service import usage_report
+
+    response_service.TOOL_HISTORY = mode
+    service = response_service.ResponseService()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for index in range(conversations):
+            conversation_id = f"{mode}-{index}"
+            for message in CONVERSATION:
+                service.generate_full_response(message, conversation_id)
+
+    rows = usage_report("route")
+    return {
+        "tool_calls": sum(row["turn_tool_calls"] for row in rows),
+        "repeated": sum(row["repeated_tool_calls"] for row in rows),
+        "memo_hits": sum(row["memo_hits"] for row in rows),
+        "input_tokens": sum(row["input_tokens"] for row in rows),
+        "model_seconds": sum(row["model_latency_ms"] for row in rows) / 1000,
+        "tool_ms": sum(row["tool_time_ms"] for row in rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--conversations", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock model latency in seconds")
+    parser.add_argument("--live", action="store_true", help="Use the real API instead of the mock")
+    args = parser.parse_args()
+
+    mock = None
+    script_file = None
+    if not args.live:
+        script_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        json.dump(MOCK_SCRIPT, script_file)
+        script_file.close()
+        mock_port = free_port()
+        mock = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.join(BACKEND_DIR, "benchmarks", "mock_model_server.py"),
+                "--port", str(mock_port),
+                "--latency", str(args.latency),
+                "--script", script_file.name,
+            ]
+        )
+        os.environ["TAGORE_MODEL_BASE_URL"] = f"http://127.0.0.1:{mock_port}"
+        os.environ.setdefault("TAGORE_RATE_LIMIT_RPM", "0")
+        os.environ.setdefault("TAGORE_RATE_LIMIT_TPM", "0")
+
+    results = {}
+    try:
+        if mock:
+            wait_for_port(mock_port)
+        logging.disable(logging.CRITICAL)
+        import db
+        from services.tool_memo import tool_memo
+
+        for mode in ("notes", "structured"):
+            # A fresh conversation store per mode
+            with tempfile.TemporaryDirectory() as db_dir:
+                db.close_connections()
+                db.history_cache.clear()
+                tool_memo.clear()
+                db.DB_DIR = db_dir
+                db.DB_FILE = os.path.join(db_dir, "bench_conversations.db")
+                db.ARCHIVE_DB_FILE = os.path.join(db_dir, "bench_archive.db")
+                results[mode] = run(mode, args.conversations)
+                db.close_connections()
+    finally:
+        if mock:
+            mock.terminate()
+            mock.wait()
+        if script_file:
+            os.unlink(script_file.name)
+
+    turns = args.conversations * len(CONVERSATION)
+    print(f"{args.conversations} conversation(s) of {len(CONVERSATION)} turns, "
+          f"{'live API' if args.live else 'mock model'}\n")
+    for mode, result in results.items():
+        print(f"{mode}:")
+        print(f"  Tool calls:          {result['tool_calls']} ({result['tool_calls'] / turns:.2f} per turn)")
+        print(f"  Repeated calls:      {result['repeated']} ({result['memo_hits']} served from the tool memo)")
+        print(f"  Input tokens:        {result['input_tokens']} ({result['input_tokens'] // turns} per turn)")
+        print(f"  Model time:          {result['model_seconds']:.2f}s, tool time {result['tool_ms']}ms")
+
+    before, after = results["notes"]["repeated"], results["structured"]["repeated"]
+    if before:
+        print(f"\nRepeated tool calls reduced by {(before - after) / before:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Measure peak memory of a whole-work read: materialized vs streamed parts.
+
+Each mode runs in a fresh subprocess that loads the catalog, notes its peak
+RSS, reads every part of the largest work through get_work_content and
+format_work_content_response the way a streamed chat turn does, and
+reports how far the peak rose:
+
+- materialized: the response carries every part, its JSON and the list of
+  formatted chunks are built, and the reply text is accumulated (as before)
+- streamed: the response only lists part numbers and the chunks generator
+  reads STREAM_BATCH_PARTS parts at a time, each sent and dropped
+- inlined: as streamed, but the reply text is accumulated the way /api/chat
+  does, which only inlines the first INLINE_WORK_PARTS parts
+
+With --scale N the work is first copied N times over into a throwaway copy
+of creations.db, to show how each mode grows with the size of the work.
+
+Usage:
+    python benchmarks/bench_whole_work_rss.py --scale 1,10,50
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tools.tagore_tools import DB_PATH  # noqa: E402
+
+MODES = ("materialized", "streamed", "inlined")
+
+
+def largest_work(db_path):
+    """(id, title, characters) of the work with the most text"""
+    conn = sqlite3.connect(db_path)
+    row = conn.execute(
+        """
+        SELECT w.id, w.title, SUM(length(p.content)) AS chars
+        FROM works w
+        JOIN work_parts p ON p.work_id = w.id
+        GROUP BY w.id
+        ORDER BY chars DESC
+        LIMIT 1
+        """
+    ).fetchone()
+    conn.close()
+    return row
+
+
+def scale_work(db_path, work_id, scale):
+    """Repeat a work's parts scale times over, renumbering them"""
+    conn = sqlite3.connect(db_path)
+    parts = conn.execute(
+        "SELECT content FROM work_parts WHERE work_id = ? ORDER BY part_number", (work_id,)
+    ).fetchall()
+    conn.execute("DELETE FROM work_parts WHERE work_id = ?", (work_id,))
+    conn.executemany(
+        "INSERT INTO work_parts (work_id, part_number, content) VALUES (?, ?, ?)",
+        [
+            (work_id, number, content)
+            for number, (content,) in enumerate((part for _ in range(scale) for part in parts), 1)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_child(db_path, title, mode):
+    """Read the whole work in this process and print the rise in peak RSS"""
+    from tools import tagore_tools
+    from tools.catalog_index import CatalogIndex
+    from tools.part_cache import WorkPartCache
+
+    tagore_tools.catalog = CatalogIndex(db_path)
+    tagore_tools.part_cache = WorkPartCache(db_path)
+    params = {"title": title, "whole_work": True}
+    # Warm up imports, the catalog and SQLite on a one-part read
+    tagore_tools.get_work_content({"title": title, "part_number": 1})
+
+    before = peak_rss_kb()
+    tool_response = tagore_tools.get_work_content(params, stream_parts=mode != "materialized")
+    response_json = json.dumps(tool_response)
+    chars = 0
+    if mode == "materialized":
+        full_response = ""
+        for chunk in list(tagore_tools.format_work_content_response(tool_response)):
+            full_response += chunk["content"]
+        chars = len(full_response)
+    elif mode == "inlined":
+        full_response = ""
+        for chunk in tagore_tools.format_work_content_response(
+            tool_response, tagore_tools.INLINE_WORK_PARTS
+        ):
+            full_response += chunk.get("content", "")
+        chars = len(full_response)
+    else:
+        for chunk in tagore_tools.format_work_content_response(tool_response):
+            chars += len(chunk["content"])
+    print(
+        json.dumps(
+            {"rss_kb": peak_rss_kb() - before, "json_chars": len(response_json), "chars": chars}
+        )
+    )
+
+
+def measure(db_path, title, mode):
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", mode, "--db", db_path, "--title", title],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure peak RSS of whole-work reads")
+    parser.add_argument("--db", default=DB_PATH, help="creations.db to read from")
+    parser.add_argument("--scale", default="1,10,50", help="Comma separated copies of the work")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--title", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.db, args.title, args.child)
+        return
+
+    work_id, title, chars = largest_work(args.db)
+    print(f"Largest work: {title} ({chars} characters)\n")
+    print(f"{'scale':>5}  {'text (KB)':>10}  {'mode':<12}  {'peak rise (KB)':>14}  {'JSON (KB)':>9}")
+    for scale in sorted(int(scale) for scale in args.scale.split(",")):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "creations.db")
+            shutil.copyfile(args.db, db_path)
+            if scale > 1:
+                scale_work(db_path, work_id, scale)
+            for mode in MODES:
+                result = measure(db_path, title, mode)
+                print(
+                    f"{scale:>5}  {result['chars'] // 1024:>10}  {mode:<12}  "
+                    f"{result['rss_kb']:>14}  {result['json_chars'] // 1024:>9}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Load-test the Flask chat pipeline against the local mock model server.
+
+By default this starts benchmarks/mock_model_server.py in a subprocess and
+serves create_app in-process on a threaded server. The backend is pointed
+at the mock (TAGORE_MODEL_BASE_URL) and uses a throwaway conversation
+database. Worker threads then post --requests messages at --concurrency
+to one route:
+
+    chat       POST /api/chat
+    stream     POST /api/chat/stream (also measures time to the first delta)
+    inventory  POST /api/inventory/query
+
+The messages cycle through a few typical turns (a reading request, a
+short question and a longer reflective one) so the model router sees a
+realistic mix. It reports throughput, latency percentiles and failures by
+status, and for the in-process app the model router's choices and the
+hits of the tool memo and the conversation history cache. Pass --url to
+drive an already running server (Flask or ASGI) instead; the mock
+options are then ignored.
+
+Usage:
+    python benchmarks/load_test.py --route chat --concurrency 32 --requests 500
+    python benchmarks/load_test.py --route stream --latency 0.5 --tokens-per-second 40
+    python benchmarks/load_test.py --route chat --latency 1.0 --model-latency haiku=0.3
+    python benchmarks/load_test.py --route inventory --tool-rate 0.5 --error-rate 0.1 --error-status 429,529
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+ROUTES = {
+    "chat": "/api/chat",
+    "stream": "/api/chat/stream",
+    "inventory": "/api/inventory/query",
+}
+
+CHAT_MESSAGES = [
+    "Could you share one of your poems with me?",
+    "When did you receive the Nobel Prize?",
+    "I have been thinking about what you wrote on the meeting of East and West. "
+    "How would you reconcile the pull of tradition with the need for a nation to "
+    "open itself to the ideas of the wider world, and where does education fit in?",
+]
+
+MESSAGES = {
+    "chat": CHAT_MESSAGES,
+    "stream": CHAT_MESSAGES,
+    "inventory": [
+        "How many copies of Gitanjali do we have in stock?",
+        "We just sold two mugs and a copy of The Home and the World, and a customer "
+        "asked whether we could restock the portrait t-shirts in larger sizes before "
+        "the festival next month. What do you suggest we order?",
+    ],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+def percentiles(values):
+    if not values:
+        return "n/a"
+    ordered = sorted(values)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return (
+        f"p50 {at(0.5) * 1000:.0f}ms  p90 {at(0.9) * 1000:.0f}ms  "
+        f"p95 {at(0.95) * 1000:.0f}ms  p99 {at(0.99) * 1000:.0f}ms  "
+        f"max {ordered[-1] * 1000:.0f}ms"
+    )
+
+
+def one_request(session, base_url, route, conversation_id, message):
+    """
+    Send one message and time it
+
+    Returns:
+        tuple: (outcome, latency, first_token_latency) where outcome is
+        "ok", an HTTP status code or "error event"
+    """
+    started = time.perf_counter()
+    payload = {"message": message, "conversationId": conversation_id}
+
+    if route != "stream":
+        response = session.post(base_url + ROUTES[route], json=payload, timeout=300)
+        response.content
+        outcome = "ok" if response.status_code == 200 else response.status_code
+        return outcome, time.perf_counter() - started, None
+
+    first_token = None
+    outcome = "ok"
+    with session.post(
+        base_url + ROUTES[route], json=payload, stream=True, timeout=300
+    ) as response:
+        if response.status_code != 200:
+            return response.status_code, time.perf_counter() - started, None
+        for line in response.iter_lines():
+            if line == b"event: delta" and first_token is None:
+                first_token = time.perf_counter() - started
+            elif line == b"event: error":
+                outcome = "error event"
+    return outcome, time.perf_counter() - started, first_token
+
+
+def run_load(base_url, route, concurrency, requests, conversations):
+    import requests as http  # type: ignore
+
+    local = threading.local()
+    results = []
+    results_lock = threading.Lock()
+
+    def worker(i):
+        if not hasattr(local, "session"):
+            local.session = http.Session()
+        conversation_id = f"load-{i % conversations}" if conversations else f"load-{i}"
+        try:
+            message = MESSAGES[route][i % len(MESSAGES[route])]
+            result = one_request(local.session, base_url, route, conversation_id, message)
+        except Exception as e:
+            result = (type(e).__name__, 0.0, None)
+        with results_lock:
+            results.append(result)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(requests)))
+    return results, time.perf_counter() - started
+
+
+def start_mock(args):
+    port = free_port()
+    command = [
+        sys.executable,
+        os.path.join(BACKEND_DIR, "benchmarks", "mock_model_server.py"),
+        "--port", str(port),
+        "--latency", str(args.latency),
+        "--model-latency", args.model_latency,
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--tool-rate", str(args.tool_rate),
+        "--error-rate", str(args.error_rate),
+        "--error-status", args.error_status,
+    ]
+    if args.retry_after is not None:
+        command += ["--retry-after", str(args.retry_after)]
+    if args.script:
+        command += ["--script", args.script]
+    process = subprocess.Popen(command)
+    wait_for_port(port)
+    return process, port
+
+
+def start_app(db_dir):
+    """Serve create_app in-process on a threaded server, returning (server, port)"""
+    from werkzeug.serving import make_server  # type: ignore
+    import db
+
+    db.DB_DIR = db_dir
+    db.DB_FILE = os.path.join(db_dir, "load_conversations.db")
+    db.ARCHIVE_DB_FILE = os.path.join(db_dir, "load_archive.db")
+
+    from app import create_app
+
+    port = free_port()
+    server = make_server("127.0.0.1", port, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, port
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--route", choices=sorted(ROUTES), default="chat")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument(
+        "--conversations", type=int, default=0,
+        help="Spread requests over this many conversations (0 = a new one per request)",
+    )
+    parser.add_argument("--url", help="Drive this running server instead of an in-process app")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock: seconds before the first token")
+    parser.add_argument(
+        "--model-latency", default="", help="Mock: per-model latency, e.g. haiku=0.2"
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="Mock: output rate")
+    parser.add_argument("--tool-rate", type=float, default=0.0, help="Mock: fraction of replies using a tool")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock: fraction of failed calls")
+    parser.add_argument("--error-status", default="429,529", help="Mock: statuses to inject")
+    parser.add_argument("--retry-after", type=float, default=None, help="Mock: retry-after seconds")
+    parser.add_argument("--script", help="Mock: JSON file of reply rules")
+    args = parser.parse_args()
+
+    mock = None
+    server = None
+    governor_stats = None
+    router_stats = None
+    memo_stats = None
+    history_stats = None
+    mock_stats = None
+    output = io.StringIO()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        try:
+            if args.url:
+                base_url = args.url.rstrip("/")
+            else:
+                mock, mock_port = start_mock(args)
+                os.environ["TAGORE_MODEL_BASE_URL"] = f"http://127.0.0.1:{mock_port}"
+                # The client-side limiter would otherwise cap the offered load
+                os.environ.setdefault("TAGORE_RATE_LIMIT_RPM", "0")
+                os.environ.setdefault("TAGORE_RATE_LIMIT_TPM", "0")
+
+                # Keep per-request service logging out of the report
+                logging.disable(logging.CRITICAL)
+                with contextlib.redirect_stdout(output):
+                    server, app_port = start_app(db_dir)
+                base_url = f"http://127.0.0.1:{app_port}"
+
+            with contextlib.redirect_stdout(output):
+                results, elapsed = run_load(
+                    base_url, args.route, args.concurrency, args.requests, args.conversations
+                )
+
+            if mock:
+                import requests as http  # type: ignore
+                import db
+                from services.model_router import model_router
+                from services.rate_limiter import rate_governor
+                from services.tool_memo import tool_memo
+
+                mock_stats = http.get(f"http://127.0.0.1:{mock_port}/stats").json()
+                governor_stats = rate_governor.stats()
+                router_stats = model_router.stats()
+                memo_stats = tool_memo.stats()
+                history_stats = db.get_history_cache_stats()
+        finally:
+            if server:
+                server.shutdown()
+            if mock:
+                mock.terminate()
+                mock.wait()
+            if not args.url:
+                import db
+
+                db.close_connections()
+
+    succeeded = [r for r in results if r[0] == "ok"]
+    failures = {}
+    for outcome, _, _ in results:
+        if outcome != "ok":
+            failures[str(outcome)] = failures.get(str(outcome), 0) + 1
+
+    print(f"Route:            {ROUTES[args.route]}")
+    print(f"Requests:         {len(results)} at concurrency {args.concurrency}")
+    print(f"Succeeded:        {len(succeeded)}")
+    print(f"Failures:         {json.dumps(failures) if failures else 'none'}")
+    print(f"Wall time:        {elapsed:.2f}s")
+    print(f"Throughput:       {len(succeeded) / elapsed:.1f} req/s")
+    print(f"Latency:          {percentiles([r[1] for r in succeeded])}")
+    if args.route == "stream":
+        print(f"First token:      {percentiles([r[2] for r in succeeded if r[2] is not None])}")
+    if mock_stats:
+        print(
+            f"Mock model:       {mock_stats['requests']} calls, "
+            f"peak {mock_stats['peakInFlight']} in flight, "
+            f"{mock_stats['toolUses']} tool_use replies, errors {mock_stats['errors']}"
+        )
+    if governor_stats:
+        print(
+            f"Rate governor:    {governor_stats['retries']} retries "
+            f"{governor_stats['retries_by_reason']}, "
+            f"{governor_stats['backoff_wait_seconds']:.2f}s backoff"
+        )
+    if router_stats:
+        print(
+            f"Model router:     {json.dumps(router_stats['by_tier'])} "
+            f"by rule {json.dumps(router_stats['by_rule'])}"
+        )
+    if memo_stats:
+        print(
+            f"Tool memo:        {memo_stats['hits']} hits / {memo_stats['misses']} misses "
+            f"({memo_stats['hit_rate']:.0%}), {memo_stats['stale']} stale"
+        )
+    if history_stats:
+        print(
+            f"History cache:    {history_stats['hits']} hits / {history_stats['misses']} misses "
+            f"({history_stats['hit_rate']:.0%}), {history_stats['evictions']} evictions, "
+            f"{history_stats['conversations']} conversations, "
+            f"{history_stats['bytes'] // 1024}/{history_stats['max_bytes'] // 1024} KB"
+        )
+
+
+if __name__ == "__main__":
+    main()
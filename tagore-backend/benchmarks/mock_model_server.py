@@ -0,0 +1,462 @@
+"""
+A local stand-in for the Anthropic Messages API, for benchmarks and load tests.
+
+Answers POST /v1/messages, streaming (SSE) or not, so the chat pipeline
+can be driven at high concurrency without spending real API money:
+
+- latency: seconds before the first token, optionally per model (any
+  model id containing a given substring, e.g. haiku=0.3)
+- tokens per second: the rate at which output tokens (words) are emitted
+- tool use: a fraction of requests that offer tools get a tool_use block
+  for one of them, with canned inputs (e.g. list_works, record_transaction)
+- error injection: a fraction of requests fail with the given statuses
+  (e.g. 429 rate limits or 529 overloads), optionally with retry-after
+- a script: a JSON list of rules matched against the last user message,
+  each overriding the reply, e.g.
+      [{"match": "(?i)sold", "tool": "record_transaction",
+        "input": {"item_name": "Gitanjali", "transaction_type": "sale", "quantity": 1}},
+       {"match": "(?i)overload", "status": 529},
+       {"match": ".*", "text": "Hello from the mock", "latency": 0.2}]
+  A rule may call several tools at once with "tools": [{"name", "input"}].
+  Tool rules only fire at their "step" of the tool loop (default 0, the
+  user's message; step n answers the n-th round of tool results), e.g.
+      [{"match": "(?i)restock", "tool": "list_items"},
+       {"match": "(?i)restock", "step": 1, "tools": [
+           {"name": "update_item", "input": {"item_name": "Gitanjali", "stock": 40}},
+           {"name": "update_item", "input": {"item_name": "Gora", "stock": 20}}]}]
+  With "unless_seen": true a tool rule is skipped when the history already
+  holds a tool_use block for the same tool, as a model that can see the
+  earlier result would not fetch it again.
+
+GET /stats reports how many model calls were served, how many errors were
+injected and the peak number in flight at once.
+
+Point the backend at it with TAGORE_MODEL_BASE_URL=http://127.0.0.1:<port>
+(or the SDK's own ANTHROPIC_BASE_URL).
+
+Usage:
+    python benchmarks/mock_model_server.py --port 8765 --latency 1.0
+    python benchmarks/mock_model_server.py --latency 1.0 --model-latency haiku=0.3
+    python benchmarks/mock_model_server.py --tokens-per-second 50 --tool-rate 0.2
+    python benchmarks/mock_model_server.py --error-rate 0.3 --error-status 429,529 --retry-after 1
+    python benchmarks/mock_model_server.py --script mock_script.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+
+DEFAULT_REPLY = (
+    "The song that I came to sing remains unsung to this day. "
+    "I have spent my days in stringing and in unstringing my instrument."
+)
+
+# Error bodies in the Messages API format
+ERROR_TYPES = {
+    429: "rate_limit_error",
+    500: "api_error",
+    529: "overloaded_error",
+}
+
+# Inputs used when the mock decides to call one of the backend's tools
+TOOL_INPUTS = {
+    "list_works": {"category": "poem", "random": True, "limit": 5},
+    "get_work_content": {"title": "Gitanjali", "whole_work": False},
+    "search_works": {"query": "mind without fear"},
+    "list_items": {"category": "all"},
+    "get_item_details": {"item_name": "Gitanjali"},
+    "record_transaction": {
+        "item_name": "Gitanjali",
+        "transaction_type": "sale",
+        "quantity": 1,
+    },
+}
+
+
+class MockModelServer:
+    """ASGI app imitating the Messages API"""
+
+    def __init__(
+        self,
+        latency=1.0,
+        tokens_per_second=0,
+        reply=DEFAULT_REPLY,
+        error_rate=0.0,
+        error_statuses=(429,),
+        retry_after=None,
+        tool_rate=0.0,
+        script=None,
+        model_latency=None,
+    ):
+        self.latency = latency
+        self.model_latency = model_latency or {}
+        self.tokens_per_second = tokens_per_second
+        self.reply = reply
+        self.error_rate = error_rate
+        self.error_statuses = list(error_statuses)
+        self.retry_after = retry_after
+        self.tool_rate = tool_rate
+        self.script = [
+            dict(rule, match=re.compile(rule.get("match", ".*")))
+            for rule in (script or [])
+        ]
+        self.requests = 0
+        self.errors = {}
+        self.tool_uses = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._ids = itertools.count(1)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        if scope["type"] != "http":
+            return
+
+        if scope["method"] == "GET" and scope["path"] == "/stats":
+            await self._send_json(send, 200, self.stats())
+        elif scope["method"] == "POST" and scope["path"] == "/v1/messages":
+            body = await self._read_body(receive)
+            await self._messages(send, json.loads(body or b"{}"), len(body))
+        else:
+            await self._send_json(
+                send, 404, {"type": "error", "error": {"type": "not_found_error", "message": "Not found"}}
+            )
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "errors": {str(status): count for status, count in self.errors.items()},
+            "toolUses": self.tool_uses,
+            "inFlight": self.in_flight,
+            "peakInFlight": self.peak_in_flight,
+        }
+
+    def _plan(self, request):
+        """Decide how to answer a request: status, latency, text and tool call"""
+        latency = next(
+            (
+                seconds
+                for fragment, seconds in self.model_latency.items()
+                if fragment in request.get("model", "")
+            ),
+            self.latency,
+        )
+        plan = {"status": None, "latency": latency, "text": self.reply, "tools": []}
+
+        offered_tools = [tool["name"] for tool in request.get("tools") or []]
+        messages = request.get("messages") or []
+        last_user_text = _last_user_text(messages)
+        step = _tool_result_rounds(messages)
+
+        for rule in self.script:
+            calls_tools = rule.get("tool") or rule.get("tools")
+            if calls_tools and rule.get("step", 0) != step:
+                continue
+            if rule.get("unless_seen") and self._seen_tools(rule) & _history_tool_names(messages):
+                continue
+            if rule["match"].search(last_user_text):
+                plan["status"] = rule.get("status")
+                plan["latency"] = rule.get("latency", latency)
+                plan["text"] = rule.get("text", self.reply)
+                if rule.get("tool"):
+                    plan["tools"] = [
+                        (rule["tool"], rule.get("input", TOOL_INPUTS.get(rule["tool"], {})))
+                    ]
+                for tool in rule.get("tools", []):
+                    plan["tools"].append(
+                        (tool["name"], tool.get("input", TOOL_INPUTS.get(tool["name"], {})))
+                    )
+                if calls_tools and "text" not in rule:
+                    plan["text"] = ""
+                return plan
+
+        if self.error_rate and random.random() < self.error_rate:
+            plan["status"] = random.choice(self.error_statuses)
+        elif offered_tools and not step:
+            # Tool results are always answered with text
+            if self.tool_rate and random.random() < self.tool_rate:
+                name = random.choice(offered_tools)
+                plan["tools"] = [(name, TOOL_INPUTS.get(name, {}))]
+                plan["text"] = "Let me look that up for you."
+        return plan
+
+    @staticmethod
+    def _seen_tools(rule):
+        names = {tool["name"] for tool in rule.get("tools", [])}
+        if rule.get("tool"):
+            names.add(rule["tool"])
+        return names
+
+    async def _messages(self, send, request, request_bytes):
+        self.requests += 1
+        plan = self._plan(request)
+        if plan["status"]:
+            await self._inject_error(send, plan["status"])
+            return
+
+        self.tool_uses += len(plan["tools"])
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            message = self._message(request, request_bytes, plan)
+            if request.get("stream"):
+                await self._stream(send, message, plan)
+            else:
+                await asyncio.sleep(
+                    plan["latency"] + self._emit_seconds(message["usage"]["output_tokens"])
+                )
+                await self._send_json(send, 200, message)
+        finally:
+            self.in_flight -= 1
+
+    def _message(self, request, request_bytes, plan):
+        content = []
+        if plan["text"]:
+            content.append({"type": "text", "text": plan["text"]})
+        for name, tool_input in plan["tools"]:
+            content.append(
+                {
+                    "type": "tool_use",
+                    "id": f"toolu_mock_{next(self._ids)}",
+                    "name": name,
+                    "input": tool_input,
+                }
+            )
+
+        return {
+            "id": f"msg_mock_{next(self._ids)}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "mock"),
+            "content": content,
+            "stop_reason": "tool_use" if plan["tools"] else "end_turn",
+            "stop_sequence": None,
+            "usage": {
+                # Same chars/4 estimate the history window uses
+                "input_tokens": request_bytes // 4,
+                "output_tokens": len(plan["text"].split()) + 20 * len(plan["tools"]),
+                "cache_creation_input_tokens": 0,
+                "cache_read_input_tokens": 0,
+            },
+        }
+
+    def _emit_seconds(self, tokens):
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    async def _stream(self, send, message, plan):
+        """Send the message as Messages API server-sent events, word by word"""
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                ],
+            }
+        )
+
+        async def event(name, data):
+            payload = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+            await send({"type": "http.response.body", "body": payload, "more_body": True})
+
+        await asyncio.sleep(plan["latency"])
+        start = dict(message, content=[], stop_reason=None)
+        start["usage"] = dict(message["usage"], output_tokens=1)
+        await event("message_start", {"type": "message_start", "message": start})
+
+        delay = self._emit_seconds(1)
+        for index, block in enumerate(message["content"]):
+            if block["type"] == "text":
+                await event(
+                    "content_block_start",
+                    {"type": "content_block_start", "index": index, "content_block": {"type": "text", "text": ""}},
+                )
+                words = re.findall(r"\S+\s*", block["text"])
+                for word in words:
+                    if delay:
+                        await asyncio.sleep(delay)
+                    await event(
+                        "content_block_delta",
+                        {"type": "content_block_delta", "index": index, "delta": {"type": "text_delta", "text": word}},
+                    )
+            else:
+                await event(
+                    "content_block_start",
+                    {
+                        "type": "content_block_start",
+                        "index": index,
+                        "content_block": dict(block, input={}),
+                    },
+                )
+                await event(
+                    "content_block_delta",
+                    {
+                        "type": "content_block_delta",
+                        "index": index,
+                        "delta": {"type": "input_json_delta", "partial_json": json.dumps(block["input"])},
+                    },
+                )
+            await event("content_block_stop", {"type": "content_block_stop", "index": index})
+
+        await event(
+            "message_delta",
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                "usage": {"output_tokens": message["usage"]["output_tokens"]},
+            },
+        )
+        await event("message_stop", {"type": "message_stop"})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def _inject_error(self, send, status):
+        self.errors[status] = self.errors.get(status, 0) + 1
+        headers = []
+        if self.retry_after is not None:
+            headers.append((b"retry-after", str(self.retry_after).encode("ascii")))
+        payload = {
+            "type": "error",
+            "error": {
+                "type": ERROR_TYPES.get(status, "api_error"),
+                "message": f"Injected {status} from the mock server",
+            },
+        }
+        await self._send_json(send, status, payload, headers)
+
+    @staticmethod
+    async def _read_body(receive):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                return body
+
+    @staticmethod
+    async def _send_json(send, status, payload, headers=()):
+        body = json.dumps(payload).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    *headers,
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def _has_tool_results(message):
+    content = message.get("content")
+    return not isinstance(content, str) and any(
+        block.get("type") == "tool_result" for block in content or []
+    )
+
+
+def _last_user_text(messages):
+    """Text of the last user message (string or text blocks), skipping tool results"""
+    for message in reversed(messages):
+        if message.get("role") != "user" or _has_tool_results(message):
+            continue
+        content = message.get("content")
+        if isinstance(content, str):
+            return content
+        return " ".join(
+            block.get("text", "") for block in content or [] if block.get("type") == "text"
+        )
+    return ""
+
+
+def _history_tool_names(messages):
+    """Names of the tools called in earlier assistant messages"""
+    return {
+        block.get("name")
+        for message in messages
+        if message.get("role") == "assistant" and not isinstance(message.get("content"), str)
+        for block in message.get("content") or []
+        if block.get("type") == "tool_use"
+    }
+
+
+def _tool_result_rounds(messages):
+    """How many rounds of tool results follow the last user message"""
+    rounds = 0
+    for message in reversed(messages):
+        if message.get("role") != "user":
+            continue
+        if not _has_tool_results(message):
+            break
+        rounds += 1
+    return rounds
+
+
+def main():
+    import uvicorn  # type: ignore
+
+    parser = argparse.ArgumentParser(description="Mock Anthropic Messages API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds before the first token")
+    parser.add_argument(
+        "--model-latency",
+        default="",
+        help="Per-model latency overrides, e.g. haiku=0.3,sonnet=1.0 (matched as substrings)",
+    )
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=0, help="Output rate (0 = all at once)"
+    )
+    parser.add_argument(
+        "--tool-rate", type=float, default=0.0, help="Fraction of tool-enabled requests answered with tool_use"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of requests to fail"
+    )
+    parser.add_argument(
+        "--error-status", default="429", help="Comma-separated statuses to inject, e.g. 429,529"
+    )
+    parser.add_argument(
+        "--retry-after", type=float, default=None, help="retry-after seconds on injected errors"
+    )
+    parser.add_argument("--script", help="JSON file of reply rules (see module docstring)")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+
+    server = MockModelServer(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        error_statuses=[int(status) for status in args.error_status.split(",")],
+        retry_after=args.retry_after,
+        tool_rate=args.tool_rate,
+        script=script,
+        model_latency={
+            fragment: float(seconds)
+            for fragment, seconds in (
+                pair.split("=") for pair in args.model_latency.split(",") if pair
+            )
+        },
+    )
+    uvicorn.run(server, host=args.host, port=args.port, log_level="warning", backlog=4096)
+
+
+if __name__ == "__main__":
+    main()
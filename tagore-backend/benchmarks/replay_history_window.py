@@ -0,0 +1,111 @@
+"""
+Replay stored conversations through the history window and report savings.
+
+For every user turn in the conversation database, compares the estimated
+input tokens of sending the full history against the windowed history
+(recent turns plus a summary of at most SUMMARY_MAX_TOKENS). No model calls
+are made; summaries are costed at their maximum size.
+
+Usage:
+    python benchmarks/replay_history_window.py [--db path/to/conversations.db]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from itertools import groupby
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import db  # noqa: E402
+from config import HISTORY_TOKEN_BUDGET, SUMMARY_MAX_TOKENS  # noqa: E402
+from services.history_service import (  # noqa: E402
+    estimate_messages_tokens,
+    select_window_start,
+)
+
+
+def load_conversations(db_path):
+    """Yield (conversation_id, messages) for every stored conversation"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "SELECT conversation_id, role, content FROM messages ORDER BY conversation_id, id"
+    )
+
+    for conversation_id, rows in groupby(cursor, key=lambda row: row["conversation_id"]):
+        yield conversation_id, [
+            {"role": row["role"], "content": row["content"]} for row in rows
+        ]
+
+    conn.close()
+
+
+def replay(messages, budget):
+    """Return (full_tokens, window_tokens, summary_updates) per user turn"""
+    turns = []
+    covered = 0
+    for index, message in enumerate(messages):
+        if message["role"] != "user":
+            continue
+
+        history = messages[: index + 1]
+        start = select_window_start(history, covered, budget=budget)
+        summary_updated = start > covered
+        covered = start
+
+        full_tokens = estimate_messages_tokens(history)
+        window_tokens = estimate_messages_tokens(history[covered:])
+        if covered:
+            window_tokens += SUMMARY_MAX_TOKENS
+
+        turns.append((full_tokens, window_tokens, summary_updated))
+
+    return turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay history windowing")
+    parser.add_argument("--db", default=db.DB_FILE, help="Conversation database")
+    parser.add_argument(
+        "--budget", type=int, default=HISTORY_TOKEN_BUDGET, help="Token budget"
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Error: Database file '{args.db}' not found.")
+        return
+
+    conversations = 0
+    all_turns = []
+    for _, messages in load_conversations(args.db):
+        conversations += 1
+        all_turns.extend(replay(messages, args.budget))
+
+    if not all_turns:
+        print("No user turns found.")
+        return
+
+    full_total = sum(turn[0] for turn in all_turns)
+    window_total = sum(turn[1] for turn in all_turns)
+    summary_updates = sum(1 for turn in all_turns if turn[2])
+    savings = [turn[0] - turn[1] for turn in all_turns]
+    savings.sort()
+
+    print(f"Conversations:            {conversations}")
+    print(f"User turns:               {len(all_turns)}")
+    print(f"Token budget:             {args.budget}")
+    print(f"Full-history tokens:      {full_total}")
+    print(f"Windowed tokens:          {window_total}")
+    print(f"Saved:                    {full_total - window_total} "
+          f"({(full_total - window_total) / full_total:.1%})")
+    print(f"Mean saved per turn:      {sum(savings) / len(savings):.0f}")
+    print(f"Median saved per turn:    {savings[len(savings) // 2]}")
+    print(f"Max saved per turn:       {savings[-1]}")
+    print(f"Summary regenerations:    {summary_updates}")
+
+
+if __name__ == "__main__":
+    main()
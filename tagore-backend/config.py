@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv  # type: ignore
 import datetime
@@ -36,6 +37,9 @@ def get_location_info():
 # Load environment variables
 load_dotenv()
 
+# Browser origins allowed to call the API (Flask and ASGI servers)
+CORS_ORIGINS = ["https://e39f-45-113-88-36.ngrok-free.app"]
+
 # Anthropic API settings
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 
@@ -47,16 +51,101 @@ ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 # model: claude-3-7-sonnet-20250219| pricing: $3.00 / $15.00 | cutoff: Nov 2024
 
 ANTHROPIC_MODEL = "claude-3-5-sonnet-latest"
+
+# Model routing: each turn goes to the "fast" or the "deep" model. The rules
+# are tried in order and the first whose conditions all hold picks the tier;
+# otherwise the route's default applies. Conditions:
+#   routes       - only for these routes ("chat", "inventory")
+#   max_chars    - the user message is at most this long
+#   max_depth    - the conversation has at most this many messages
+#   catalog_tool - whether the message looks like it needs a catalog tool
+#                  (reading or listing works), see services/model_router.py
+# TAGORE_MODEL_ROUTING_RULES may hold the rules as JSON instead.
+MODEL_ROUTING = os.environ.get("TAGORE_MODEL_ROUTING", "true").lower() == "true"
+MODEL_TIERS = {
+    "fast": os.environ.get("TAGORE_FAST_MODEL", "claude-3-5-haiku-latest"),
+    "deep": ANTHROPIC_MODEL,
+}
+ROUTE_MODEL_DEFAULTS = {"chat": "deep", "inventory": "deep"}
+MODEL_ROUTING_RULES = (
+    json.loads(os.environ["TAGORE_MODEL_ROUTING_RULES"])
+    if os.environ.get("TAGORE_MODEL_ROUTING_RULES")
+    else [
+        # "Read me X": the text comes from the tool, the model only picks it
+        {"name": "catalog_request", "routes": ["chat"], "catalog_tool": True, "max_chars": 300, "model": "fast"},
+        # Short questions early in a conversation
+        {"name": "short_question", "max_chars": 160, "max_depth": 8, "model": "fast"},
+    ]
+)
+
+# USD per million input / output tokens, matched by model id prefix (see the
+# table above). Cache writes cost 1.25x and cache reads 0.1x the input rate.
+MODEL_PRICING = {
+    "claude-3-7-sonnet": (3.00, 15.00),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-5-haiku": (0.80, 4.00),
+    "claude-3-opus": (15.00, 75.00),
+    "claude-3-haiku": (0.25, 1.25),
+}
+CACHE_WRITE_PRICE_MULTIPLIER = 1.25
+CACHE_READ_PRICE_MULTIPLIER = 0.1
+
+# Send model calls to another Messages API endpoint instead, e.g. the local
+# mock server (benchmarks/mock_model_server.py) for load tests
+MODEL_BASE_URL = os.environ.get("TAGORE_MODEL_BASE_URL")
 MAX_TOKENS = 1000
 
+# History window settings (token counts are estimates, ~4 characters per token)
+# Once the unsummarized history exceeds HISTORY_TOKEN_BUDGET, older turns are
+# folded into the summary until the recent window is back under
+# HISTORY_TOKEN_BUDGET * HISTORY_TARGET_RATIO, so summaries are only
+# regenerated every few turns.
+HISTORY_TOKEN_BUDGET = int(os.environ.get("TAGORE_HISTORY_TOKEN_BUDGET", "4000"))
+HISTORY_TARGET_RATIO = 0.5
+SUMMARY_MAX_TOKENS = 300
+
+# Mark the tool definitions and static system prompt as a cacheable prefix
+PROMPT_CACHING = os.environ.get("TAGORE_PROMPT_CACHING", "true").lower() == "true"
+
+# Client-side rate governance for model calls (0 disables a limit). Keep
+# these a little under the organization's API limits so bursts queue here
+# instead of coming back as 429s.
+RATE_LIMIT_REQUESTS_PER_MINUTE = int(os.environ.get("TAGORE_RATE_LIMIT_RPM", "50"))
+RATE_LIMIT_TOKENS_PER_MINUTE = int(os.environ.get("TAGORE_RATE_LIMIT_TPM", "40000"))
+RETRY_MAX_ATTEMPTS = int(os.environ.get("TAGORE_RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = 0.5  # seconds, doubled on every attempt
+RETRY_MAX_DELAY = 30.0  # seconds
+MODEL_REQUEST_DEADLINE = float(os.environ.get("TAGORE_MODEL_DEADLINE", "60"))
+
+# Agentic tool loop: tool results go back to the model, which may call more
+# tools, for at most TOOL_LOOP_MAX_STEPS model calls per turn and no new call
+# after TOOL_LOOP_DEADLINE seconds. Tools requested together in one response
+# run concurrently on a pool of TOOL_WORKERS threads.
+TOOL_LOOP_MAX_STEPS = int(os.environ.get("TAGORE_TOOL_LOOP_MAX_STEPS", "5"))
+TOOL_LOOP_DEADLINE = float(os.environ.get("TAGORE_TOOL_LOOP_DEADLINE", "90"))
+TOOL_WORKERS = int(os.environ.get("TAGORE_TOOL_WORKERS", "8"))
+
+# How earlier tool calls are replayed to the model: "structured" rebuilds
+# them from tool_calls as tool_use / tool_result blocks, each result
+# compacted to at most TOOL_HISTORY_MAX_CHARS; "notes" sends only the
+# stored reply text.
+TOOL_HISTORY = os.environ.get("TAGORE_TOOL_HISTORY", "structured")
+TOOL_HISTORY_MAX_CHARS = int(os.environ.get("TAGORE_TOOL_HISTORY_MAX_CHARS", "1200"))
+
+# Results of the read-only tools (list_works without random, get_work_content,
+# search_works, get_item_details) are reused when a conversation repeats a
+# call with the same parameters and the underlying data has not changed. The memo holds at
+# most TOOL_MEMO_MAX_BYTES of serialized results across conversations.
+TOOL_MEMO = os.environ.get("TAGORE_TOOL_MEMO", "true").lower() == "true"
+TOOL_MEMO_MAX_BYTES = int(os.environ.get("TAGORE_TOOL_MEMO_MAX_BYTES", str(16 * 1024 * 1024)))
+
 # Get dynamic context information
-current_datetime = get_current_datetime()
 location_info = get_location_info()
 
-SYSTEM_PROMPT = f"""
+# The persona prompt is static so it can be served from the prompt cache; the
+# date and location are sent after it by get_system_context()
+SYSTEM_PROMPT = """
         You are Rabindranath Tagore (1861-1941), the Bengali poet, writer, composer, and thinker.
-        The current date and time is {current_datetime}.
-        The user's approximate location is {location_info}.
         When responding to users, maintain a conversational, humble tone while embodying Tagore's essence.
 
         Response directives
@@ -91,6 +180,15 @@ SYSTEM_PROMPT = f"""
         Express curiosity about the user's thoughts and experiences.
         Don't respond with filler lines. For example if asked tell a story about New York, don't start by saying "Let me see what stories I might share about New York" instead start responding with the story.
 
-        Remember that the current date is {current_datetime} and you're speaking to someone in {location_info}. Be mindful of this context in your responses.
         Remember to embody Tagore's thoughtful but accessible nature, balancing wisdom with warmth and occasionally keeping the conversation flowing but don't end the response with a question.
     """
+
+
+def get_system_context():
+    """Get the volatile part of the system prompt (current date and location)."""
+    current_datetime = get_current_datetime()
+    return f"""
+        The current date and time is {current_datetime}.
+        The user's approximate location is {location_info}.
+        Remember that the current date is {current_datetime} and you're speaking to someone in {location_info}. Be mindful of this context in your responses.
+    """
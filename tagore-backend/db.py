@@ -1,244 +1,2027 @@
+import asyncio
+import atexit
+import hashlib
+import queue
 import sqlite3
 import os
+import threading
+import time
 import uuid
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from lru import ByteBudgetLRU
 
 DB_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tagore-data"))
 
 DB_FILE = os.path.join(DB_DIR, "tagore_speaks_conversations.db")
 
+# Number of SQLite files conversations are hash-partitioned across. With a
+# single shard everything lives in DB_FILE.
+DB_SHARD_COUNT = int(os.environ.get("TAGORE_DB_SHARDS", "1"))
+
+# Conversations idle for longer than the retention period are moved here
+ARCHIVE_DB_FILE = os.path.join(DB_DIR, "tagore_speaks_conversations_archive.db")
+ARCHIVE_BATCH_SIZE = 50
+INCREMENTAL_VACUUM_PAGES = 1000
+
+# Inline tool responses moved into blobs per transaction at startup
+BLOB_MIGRATION_BATCH_SIZE = 200
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.environ.get("TAGORE_DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = 30  # seconds to wait for a free connection
+DB_BUSY_TIMEOUT_MS = 5000
+DB_STATEMENT_CACHE_SIZE = 128
+
+# Write-behind settings. When enabled, writes are group-committed in batches
+# by a background writer. DB_DURABILITY "sync" makes every caller wait for
+# its batch to commit; "async" lets callers that pass wait=False return as
+# soon as the write is queued.
+DB_WRITE_BEHIND = os.environ.get("TAGORE_DB_WRITE_BEHIND", "false").lower() == "true"
+DB_DURABILITY = os.environ.get("TAGORE_DB_DURABILITY", "sync")
+DB_WRITE_QUEUE_SIZE = 1000
+DB_WRITE_BATCH_SIZE = 100
+
+# Conversation history cache budget (approximate bytes of message content)
+HISTORY_CACHE_MAX_BYTES = int(
+    os.environ.get("TAGORE_HISTORY_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+)
+
+# Threads the async server uses for blocking database calls
+DB_EXECUTOR_WORKERS = int(os.environ.get("TAGORE_DB_EXECUTOR_WORKERS", "32"))
+
+
+class ConnectionPool:
+    """A bounded pool of SQLite connections to a single database file"""
+
+    def __init__(self, db_file, max_size=DB_POOL_SIZE):
+        self.db_file = db_file
+        self.max_size = max_size
+        self._idle = queue.LifoQueue()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Open a new connection configured for concurrent use"""
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        # Must precede the switch to WAL to take effect on a new database;
+        # existing ones are converted by convert_to_incremental_vacuum
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        return conn
+
+    def acquire(self):
+        """Borrow a connection, opening a new one while the pool is below max_size"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._connections) < self.max_size:
+                conn = self._connect()
+                self._connections.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=DB_POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Timed out waiting for a connection to {self.db_file}"
+            )
+
+    def release(self, conn):
+        """Return a borrowed connection to the pool"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that borrows a connection and always returns it"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every connection opened by this pool"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._idle = queue.LifoQueue()
+
+
+class WriteBehindQueue:
+    """Background writer that drains a bounded queue and commits in batches"""
+
+    def __init__(
+        self, db_file=None, max_size=DB_WRITE_QUEUE_SIZE, batch_size=DB_WRITE_BATCH_SIZE
+    ):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the writer thread if it is not already running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="db-write-behind", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, operation, args, wait=True):
+        """
+        Queue a write operation
+
+        Blocks while the queue is full, which applies backpressure to callers.
+
+        Args:
+            operation (callable): Function called as operation(cursor, *args)
+            args (tuple): Arguments for the operation
+            wait (bool): Whether to block until the batch holding it commits
+
+        Returns:
+            The operation's return value if wait is True, otherwise None
+        """
+        self.start()
+        future = Future()
+        self._queue.put((operation, args, future))
+        return future.result() if wait else None
+
+    def flush(self):
+        """
+        Block until the writes queued before this call have been committed
+
+        Waits on a no-op queued behind them rather than for the queue to
+        drain, so writes submitted meanwhile by other threads do not hold
+        up the caller.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            self.submit(_flush_marker, ())
+
+    def stop(self):
+        """Flush pending writes and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+
+            batch = [item]
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                self._commit_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if stopping:
+                self._queue.task_done()
+                return
+
+    def _commit_batch(self, batch):
+        """
+        Commit a batch in one transaction, isolating failures to single writes
+
+        Never raises: every future of the batch is resolved, with the error
+        if the write failed, so waiting callers are released and the writer
+        thread keeps running.
+        """
+        try:
+            with get_connection(self.db_file) as conn:
+                cursor = conn.cursor()
+                try:
+                    results = [operation(cursor, *args) for operation, args, _ in batch]
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    if len(batch) > 1:
+                        # Retry one by one so a single bad write does not lose the rest
+                        for item in batch:
+                            self._commit_batch([item])
+                        return
+                    print(f"Database error in write-behind queue: {str(e)}")
+                    batch[0][2].set_exception(e)
+                    return
+        except Exception as e:
+            # No connection could be borrowed, or the rollback failed
+            print(f"Database error in write-behind queue: {str(e)}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+def _flush_marker(cursor):
+    """No-op write queued by WriteBehindQueue.flush"""
+    return None
+
+
+class ConversationCache:
+    """
+    Bounded LRU cache of conversation histories keyed by conversation ID
+
+    Entries are evicted least-recently-used first once the approximate size
+    of the cached messages exceeds max_bytes. The cache is per process, so it
+    assumes this process is the only writer for the conversations it serves.
+    """
+
+    # Rough per-message overhead of the dict, role string and list slot
+    MESSAGE_OVERHEAD_BYTES = 200
+
+    def __init__(self, max_bytes=HISTORY_CACHE_MAX_BYTES):
+        self._lru = ByteBudgetLRU(max_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_bytes(self):
+        return self._lru.max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes):
+        with self._lock:
+            self._lru.max_bytes = max_bytes
+            self._lru.evict()
+
+    @classmethod
+    def _message_size(cls, message):
+        return len(message["content"]) + cls.MESSAGE_OVERHEAD_BYTES
+
+    def get(self, conversation_id):
+        """Return a copy of the cached history, or None on a miss"""
+        with self._lock:
+            messages = self._lru.get(conversation_id)
+            if messages is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(messages)
+
+    def put(self, conversation_id, messages):
+        """Cache a full conversation history"""
+        with self._lock:
+            size = sum(self._message_size(message) for message in messages)
+            self._lru.put(conversation_id, list(messages), size)
+
+    def append(self, conversation_id, message):
+        """Append a message to a cached history; no-op if it is not cached"""
+        with self._lock:
+            messages = self._lru.get(conversation_id)
+            if messages is None:
+                return
+            messages.append(message)
+            self._lru.add_bytes(conversation_id, self._message_size(message))
+
+    def invalidate(self, conversation_id):
+        """Drop a conversation from the cache"""
+        with self._lock:
+            self._lru.pop(conversation_id)
+
+    def clear(self):
+        """Drop every cached conversation"""
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self):
+        """Return hit/miss counters and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self._lru.evictions,
+                "conversations": len(self._lru),
+                "bytes": self._lru.total_bytes,
+                "max_bytes": self._lru.max_bytes,
+            }
+
+
+history_cache = ConversationCache()
+
+_pools = {}
+_pools_lock = threading.Lock()
+_writers = {}
+_writers_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_pool(db_file=None):
+    """Get (or lazily create) the connection pool for a database file"""
+    db_file = db_file or DB_FILE
+    with _pools_lock:
+        pool = _pools.get(db_file)
+        if pool is None:
+            pool = ConnectionPool(db_file)
+            _pools[db_file] = pool
+        return pool
+
+
+def shard_files(shard_count=None):
+    """
+    List the database files of a shard layout
+
+    Args:
+        shard_count (int, optional): Number of shards (defaults to DB_SHARD_COUNT)
+
+    Returns:
+        list: Database file paths, indexed by shard number
+    """
+    shard_count = shard_count or DB_SHARD_COUNT
+    if shard_count <= 1:
+        return [DB_FILE]
+
+    base, extension = os.path.splitext(DB_FILE)
+    return [f"{base}_{shard}{extension}" for shard in range(shard_count)]
+
+
+def shard_for(conversation_id, shard_count=None):
+    """
+    Get the database file that stores a conversation
+
+    Uses a stable hash so every process routes a conversation the same way.
+
+    Args:
+        conversation_id (str): The unique ID of the conversation
+        shard_count (int, optional): Number of shards (defaults to DB_SHARD_COUNT)
+
+    Returns:
+        str: Database file path
+    """
+    files = shard_files(shard_count)
+    if len(files) == 1:
+        return files[0]
+    return files[zlib.crc32(conversation_id.encode("utf-8")) % len(files)]
+
+
+def get_writer(db_file=None):
+    """Get (or lazily create) the write-behind queue for a database file"""
+    db_file = db_file or DB_FILE
+    with _writers_lock:
+        writer = _writers.get(db_file)
+        if writer is None:
+            writer = WriteBehindQueue(db_file)
+            _writers[db_file] = writer
+        return writer
+
+
+def flush_writes(db_file=None):
+    """Block until queued writes (for one file, or all files) are committed"""
+    with _writers_lock:
+        writers = list(_writers.values()) if db_file is None else [_writers.get(db_file)]
+
+    for writer in writers:
+        if writer is not None:
+            writer.flush()
+
+
+def get_executor():
+    """Get (or lazily create) the thread pool for blocking database work"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="tagore-db"
+            )
+        return _executor
+
+
+async def run_in_executor(func, *args):
+    """
+    Run a blocking database call from async code without stalling the event loop
+
+    Args:
+        func (callable): The blocking function, e.g. add_message
+        *args: Positional arguments for func
+
+    Returns:
+        Whatever func returns
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), func, *args)
+
+
+def get_history_cache_stats():
+    """Return hit/miss counters for the conversation history cache"""
+    return history_cache.stats()
+
+
+def close_connections():
+    """
+    Flush pending writes and close all pooled connections
+
+    Registered to run at interpreter exit so a graceful stop loses no rows.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+
+    for writer in writers:
+        writer.stop()
+
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
+
+atexit.register(close_connections)
+
 
 def init_db():
-    """Initialize the database and create tables if they don't exist"""
+    """Initialize every shard database and create tables if they don't exist"""
 
     os.makedirs(DB_DIR, exist_ok=True)
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    for db_file in shard_files():
+        _init_db_file(db_file)
+
+
+def _init_db_file(db_file):
+    """Create the tables in one database file and apply pending migrations"""
+    with get_connection(db_file) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+        CREATE TABLE IF NOT EXISTS conversations (
+            id TEXT PRIMARY KEY,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+        )
+
+        cursor.execute(
+            """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT,
+            role TEXT,
+            content TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+        )
+        """
+        )
+
+        cursor.execute(
+            """
+        CREATE TABLE IF NOT EXISTS tool_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT,
+            message_id INTEGER,
+            tool_name TEXT,
+            tool_parameters TEXT,
+            tool_response TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (conversation_id) REFERENCES conversations (id),
+            FOREIGN KEY (message_id) REFERENCES messages (id)
+        )
+        """
+        )
+
+        conn.commit()
+
+        _apply_migrations(conn)
+        _move_inline_tool_responses(conn)
+
+
+def _migrate_message_sequence(cursor):
+    """v1: per-conversation message sequence and conversation-scoped indexes"""
+    cursor.execute("ALTER TABLE messages ADD COLUMN seq INTEGER")
+
+    # Number existing messages in insertion order within each conversation
+    cursor.execute(
+        """
+        UPDATE messages SET seq = ordered.seq
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY conversation_id ORDER BY id
+            ) AS seq
+            FROM messages
+        ) AS ordered
+        WHERE ordered.id = messages.id
+        """
+    )
+
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_conversation_seq ON messages (conversation_id, seq)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tool_calls_conversation ON tool_calls (conversation_id, id)"
+    )
+
+
+def _migrate_conversation_summaries(cursor):
+    """v2: rolling summaries of the older part of long conversations"""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS conversation_summaries (
+            conversation_id TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            covered_messages INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+        )
+        """
+    )
+
+
+def _migrate_tool_response_blobs(cursor):
+    """
+    v3: store tool responses once, compressed, keyed by content hash
+
+    Existing inline responses are moved afterwards, outside the migration
+    transaction, by _move_inline_tool_responses.
+    """
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tool_response_blobs (
+            hash TEXT PRIMARY KEY,
+            compression TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+        """
+    )
+    cursor.execute("ALTER TABLE tool_calls ADD COLUMN response_hash TEXT")
+    # The tool calls still referencing a blob, checked before deleting it
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tool_calls_response_hash ON tool_calls (response_hash)"
+    )
+    # The responses still stored inline, left to move
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_tool_calls_inline_response ON tool_calls (id)
+        WHERE tool_response IS NOT NULL
+        """
+    )
+
+
+def _migrate_conversation_counters(cursor):
+    """v4: per-conversation last message, message count and recency"""
+    cursor.execute("ALTER TABLE conversations ADD COLUMN last_message_id INTEGER")
+    cursor.execute(
+        "ALTER TABLE conversations ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0"
+    )
+    cursor.execute("ALTER TABLE conversations ADD COLUMN updated_at TIMESTAMP")
+
+    # Older rows may reference conversations that were never recorded
+    cursor.execute(
+        """
+        INSERT OR IGNORE INTO conversations (id)
+        SELECT DISTINCT conversation_id FROM messages WHERE conversation_id IS NOT NULL
+        """
+    )
+
+    # message_count doubles as the last assigned seq, so backfill it from seq
+    cursor.execute(
+        """
+        UPDATE conversations SET
+            message_count = totals.last_seq,
+            updated_at = totals.updated_at,
+            last_message_id = (
+                SELECT m.id FROM messages m
+                WHERE m.conversation_id = conversations.id AND m.seq = totals.last_seq
+            )
+        FROM (
+            SELECT conversation_id, MAX(seq) AS last_seq, MAX(timestamp) AS updated_at
+            FROM messages
+            GROUP BY conversation_id
+        ) AS totals
+        WHERE totals.conversation_id = conversations.id
+        """
+    )
+    cursor.execute(
+        "UPDATE conversations SET updated_at = created_at WHERE updated_at IS NULL"
+    )
+
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations (updated_at)"
+    )
+
+    # Keep last_message_id current as part of each message insert
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS messages_last_message_id AFTER INSERT ON messages
+        BEGIN
+            UPDATE conversations SET last_message_id = new.id
+            WHERE id = new.conversation_id;
+        END
+        """
+    )
+
+
+def _migrate_tool_call_message_index(cursor):
+    """v5: look up tool calls by the message that triggered them"""
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tool_calls_message ON tool_calls (message_id)"
+    )
+
+
+def _migrate_message_metrics(cursor):
+    """v6: token usage and latency per assistant message, duration per tool call"""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS message_metrics (
+            message_id INTEGER PRIMARY KEY,
+            conversation_id TEXT,
+            route TEXT,
+            model TEXT,
+            model_calls INTEGER DEFAULT 0,
+            input_tokens INTEGER DEFAULT 0,
+            output_tokens INTEGER DEFAULT 0,
+            cache_read_tokens INTEGER DEFAULT 0,
+            cache_write_tokens INTEGER DEFAULT 0,
+            model_latency_ms INTEGER DEFAULT 0,
+            tool_time_ms INTEGER DEFAULT 0,
+            tools TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (message_id) REFERENCES messages (id)
+        )
+        """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_message_metrics_created_at ON message_metrics (created_at)"
+    )
+
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(tool_calls)")]
+    if "duration_ms" not in columns:
+        cursor.execute("ALTER TABLE tool_calls ADD COLUMN duration_ms INTEGER")
+
+
+def _migrate_routing_rule(cursor):
+    """v7: which model router rule picked the model of each turn"""
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(message_metrics)")]
+    if "routing_rule" not in columns:
+        cursor.execute("ALTER TABLE message_metrics ADD COLUMN routing_rule TEXT")
+
+
+def _migrate_repeated_tool_calls(cursor):
+    """v8: tool calls per turn that repeated an earlier call of the conversation"""
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(message_metrics)")]
+    if "repeated_tool_calls" not in columns:
+        cursor.execute(
+            "ALTER TABLE message_metrics ADD COLUMN repeated_tool_calls INTEGER DEFAULT 0"
+        )
+
+
+def _migrate_tool_memo_counts(cursor):
+    """v9: tool calls per turn and how many were served from the tool memo"""
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(message_metrics)")]
+    if "tool_calls" not in columns:
+        cursor.execute("ALTER TABLE message_metrics ADD COLUMN tool_calls INTEGER DEFAULT 0")
+    if "memo_hits" not in columns:
+        cursor.execute("ALTER TABLE message_metrics ADD COLUMN memo_hits INTEGER DEFAULT 0")
+
+
+# Ordered schema upgrades, tracked with PRAGMA user_version
+SCHEMA_MIGRATIONS = [
+    (1, _migrate_message_sequence),
+    (2, _migrate_conversation_summaries),
+    (3, _migrate_tool_response_blobs),
+    (4, _migrate_conversation_counters),
+    (5, _migrate_tool_call_message_index),
+    (6, _migrate_message_metrics),
+    (7, _migrate_routing_rule),
+    (8, _migrate_repeated_tool_calls),
+    (9, _migrate_tool_memo_counts),
+]
+
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+def _apply_migrations(conn):
+    """
+    Bring the schema up to SCHEMA_VERSION
+
+    Each migration runs in its own immediate transaction together with the
+    user_version bump, so a crash never leaves a half-applied upgrade and
+    concurrent processes do not apply the same migration twice.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the database
+    """
+    cursor = conn.cursor()
+
+    for version, migration in SCHEMA_MIGRATIONS:
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            current_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            if current_version >= version:
+                conn.rollback()
+                continue
+
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Database error when migrating schema to v{version}: {str(e)}")
+            conn.rollback()
+            raise e
+
+
+def _move_inline_tool_responses(conn, batch_size=BLOB_MIGRATION_BATCH_SIZE, pause=0.01):
+    """
+    Move tool responses stored inline (before v3) into tool_response_blobs
+
+    Each batch is its own short immediate transaction, so other processes
+    starting at the same time only wait for one batch, and an interrupted
+    move resumes where it stopped. Reads fall back to the inline column, so
+    a partly moved history stays readable. The freed pages are released
+    afterwards if the file uses incremental auto-vacuum; older files shrink
+    after manage_conversations.py vacuum.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the database
+        batch_size (int): Responses moved per transaction
+        pause (float): Seconds to sleep between batches to let writers in
+
+    Returns:
+        int: Number of responses moved
+    """
+    cursor = conn.cursor()
+    moved = 0
+    while True:
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            rows = cursor.execute(
+                """
+                SELECT id, tool_response FROM tool_calls
+                WHERE tool_response IS NOT NULL
+                ORDER BY id LIMIT ?
+                """,
+                (batch_size,),
+            ).fetchall()
+            for row in rows:
+                response_hash = _store_blob(cursor, row["tool_response"])
+                cursor.execute(
+                    "UPDATE tool_calls SET response_hash = ?, tool_response = NULL WHERE id = ?",
+                    (response_hash, row["id"]),
+                )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Database error when moving tool responses into blobs: {str(e)}")
+            conn.rollback()
+            raise e
+
+        if not rows:
+            break
+        moved += len(rows)
+        time.sleep(pause)
+
+    if moved:
+        _incremental_vacuum(conn, pause)
+    return moved
+
+
+def _incremental_vacuum(conn, pause):
+    """
+    Release free pages a step at a time, if the file uses incremental
+    auto-vacuum
+
+    Returns:
+        int: Pages freed, or None if the file is not incremental
+    """
+    cursor = conn.cursor()
+    if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return None
+
+    freed = 0
+    while True:
+        free_pages = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free_pages:
+            return freed
+        step = min(free_pages, INCREMENTAL_VACUUM_PAGES)
+        # executescript steps the pragma to completion; execute() would
+        # only free a single page
+        cursor.executescript(f"PRAGMA incremental_vacuum({step});")
+        freed += step
+        time.sleep(pause)
+
+
+def get_connection(db_file=None):
+    """
+    Borrow a pooled database connection
+
+    Use as a context manager; the connection is returned to the pool on exit.
+
+    Args:
+        db_file (str, optional): Database file to connect to (defaults to DB_FILE)
+
+    Returns:
+        contextmanager: Yields a sqlite3.Connection
+    """
+    return get_pool(db_file).connection()
+
+
+def _write(operation, args, error_message, wait=True, db_file=None):
+    """
+    Run a write operation directly or through the write-behind queue
+
+    Args:
+        operation (callable): Function called as operation(cursor, *args)
+        args (tuple): Arguments for the operation
+        error_message (str): Prefix for logged database errors
+        wait (bool): Whether the caller needs the result; only honored when
+            write-behind is enabled with async durability
+        db_file (str, optional): Database file to write to (defaults to DB_FILE)
+
+    Returns:
+        The operation's return value, or None if it was queued without waiting
+    """
+    if DB_WRITE_BEHIND:
+        return get_writer(db_file).submit(
+            operation, args, wait=wait or DB_DURABILITY != "async"
+        )
+
+    with get_connection(db_file) as conn:
+        cursor = conn.cursor()
+
+        try:
+            result = operation(cursor, *args)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"{error_message}: {str(e)}")
+            conn.rollback()
+            raise e
+
+    return result
+
+
+def get_messages_by_conversation_id(conversation_id):
+    """
+    Retrieve all messages for a specific conversation
+
+    Args:
+        conversation_id (str): The unique ID of the conversation
+
+    Returns:
+        list: List of message dictionaries with role and content
+    """
+    cached = history_cache.get(conversation_id)
+    if cached is not None:
+        return cached
+
+    db_file = shard_for(conversation_id)
+    flush_writes(db_file)
+
+    with get_connection(db_file) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY seq",
+            (conversation_id,),
+        )
+
+        messages = [
+            {"role": row["role"], "content": row["content"]}
+            for row in cursor.fetchall()
+        ]
+
+    if not messages:
+        # Slower path: the conversation may have been archived
+        messages = _get_archived_messages(conversation_id)
+
+    history_cache.put(conversation_id, messages)
+    return messages
+
+
+def _restore_archived_conversation(cursor, conversation_id):
+    """
+    Copy an archived conversation back into its shard (no commit)
+
+    Called on the first write to a conversation new to its shard. The
+    archived rows are left in place; archiving the conversation again merges
+    the new messages into them.
+
+    Returns:
+        bool: Whether the conversation was found in the archive
+    """
+    if not os.path.exists(ARCHIVE_DB_FILE):
+        return False
+
+    with get_connection(ARCHIVE_DB_FILE) as archive:
+        found = archive.execute(
+            "SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        if found:
+            _copy_conversation(archive, cursor.connection, conversation_id)
+    return found is not None
+
+
+def _get_archived_messages(conversation_id):
+    """Read a conversation's messages from the archive database, if any"""
+    if not os.path.exists(ARCHIVE_DB_FILE):
+        return []
+
+    with get_connection(ARCHIVE_DB_FILE) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY seq",
+            (conversation_id,),
+        )
+
+        return [
+            {"role": row["role"], "content": row["content"]}
+            for row in cursor.fetchall()
+        ]
+
+
+def _insert_message(cursor, conversation_id, role, content, metrics=None):
+    """Insert a message (creating its conversation if needed) and return its ID"""
+    # Create or bump the conversation in one statement; the new count is the
+    # message's position in the conversation
+    cursor.execute(
+        """
+        INSERT INTO conversations (id, message_count, updated_at)
+        VALUES (?, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (id) DO UPDATE SET
+            message_count = message_count + 1,
+            updated_at = CURRENT_TIMESTAMP
+        RETURNING message_count
+        """,
+        (conversation_id,),
+    )
+    seq = cursor.fetchone()[0]
+    if seq == 1 and _restore_archived_conversation(cursor, conversation_id):
+        # A resumed archived conversation continues its history and seq
+        cursor.execute(
+            "UPDATE conversations SET message_count = message_count + 1 WHERE id = ? RETURNING message_count",
+            (conversation_id,),
+        )
+        seq = cursor.fetchone()[0]
+
+    # The messages_last_message_id trigger points the conversation at it
+    cursor.execute(
+        "INSERT INTO messages (conversation_id, role, content, seq) VALUES (?, ?, ?, ?)",
+        (conversation_id, role, content, seq),
+    )
+    message_id = cursor.lastrowid
+
+    if metrics:
+        _insert_message_metrics(cursor, message_id, conversation_id, metrics)
+
+    return message_id
+
+
+# Columns of message_metrics that callers supply (see add_message)
+MESSAGE_METRIC_FIELDS = (
+    "route",
+    "routing_rule",  # the model router rule that picked the model
+    "model",
+    "model_calls",
+    "input_tokens",
+    "output_tokens",
+    "cache_read_tokens",
+    "cache_write_tokens",
+    "model_latency_ms",
+    "tool_time_ms",
+    "repeated_tool_calls",
+    "tool_calls",
+    "memo_hits",  # tool calls served from services.tool_memo
+    "tools",  # JSON array of the tool names used in the turn
+)
+
+
+def _insert_message_metrics(cursor, message_id, conversation_id, metrics):
+    cursor.execute(
+        f"""
+        INSERT INTO message_metrics (message_id, conversation_id, {", ".join(MESSAGE_METRIC_FIELDS)})
+        VALUES (?, ?, {", ".join("?" for _ in MESSAGE_METRIC_FIELDS)})
+        """,
+        (message_id, conversation_id, *(metrics.get(field) for field in MESSAGE_METRIC_FIELDS)),
+    )
+
+
+def _store_blob(cursor, payload):
+    """
+    Store a text payload once in tool_response_blobs
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor inside the caller's transaction
+        payload (str): Text to store
+
+    Returns:
+        str: SHA-256 hex digest identifying the blob
+    """
+    encoded = payload.encode("utf-8")
+    payload_hash = hashlib.sha256(encoded).hexdigest()
+
+    cursor.execute("SELECT 1 FROM tool_response_blobs WHERE hash = ?", (payload_hash,))
+    if not cursor.fetchone():
+        cursor.execute(
+            "INSERT INTO tool_response_blobs (hash, compression, size, data) VALUES (?, ?, ?, ?)",
+            (payload_hash, "zlib", len(encoded), zlib.compress(encoded)),
+        )
+
+    return payload_hash
+
+
+def _load_blob(compression, data):
+    """Decode a blob written by _store_blob"""
+    if compression == "zlib":
+        data = zlib.decompress(data)
+    return data.decode("utf-8")
+
+
+def _insert_tool_call(
+    cursor,
+    conversation_id,
+    message_id,
+    tool_name,
+    tool_parameters,
+    tool_response,
+    duration_ms=None,
+):
+    """Insert a tool call row (response stored as a shared blob) and return its ID"""
+    response_hash = (
+        _store_blob(cursor, tool_response) if tool_response is not None else None
+    )
+
+    cursor.execute(
+        """
+        INSERT INTO tool_calls 
+        (conversation_id, message_id, tool_name, tool_parameters, response_hash, duration_ms) 
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (conversation_id, message_id, tool_name, tool_parameters, response_hash, duration_ms),
+    )
+
+    return cursor.lastrowid
+
+
+def add_message(conversation_id, role, content, wait=True, metrics=None):
+    """
+    Add a new message to the database
+
+    Args:
+        conversation_id (str): The unique ID of the conversation
+        role (str): The role of the message sender (user or assistant)
+        content (str): The content of the message
+        wait (bool): Whether to wait for the write when write-behind is
+            enabled with async durability
+        metrics (dict, optional): Token usage and timings of the turn that
+            produced an assistant message (keys in MESSAGE_METRIC_FIELDS),
+            stored in the same transaction
+
+    Returns:
+        tuple: (conversation_id, message_id); message_id is None if the
+            write was queued without waiting
+    """
+
+    if conversation_id is None:
+        conversation_id = str(uuid.uuid4())
+
+    if role is None or content is None:
+        raise ValueError("Role and content must be provided")
+
+    message_id = _write(
+        _insert_message,
+        (conversation_id, role, content, metrics),
+        "Database error",
+        wait=wait,
+        db_file=shard_for(conversation_id),
+    )
+
+    history_cache.append(conversation_id, {"role": role, "content": content})
+
+    return conversation_id, message_id
+
+
+def add_tool_call(
+    conversation_id,
+    message_id,
+    tool_name,
+    tool_parameters,
+    tool_response,
+    wait=True,
+    duration_ms=None,
+):
+    """
+    Record a tool call in the database
+
+    Args:
+        conversation_id (str): The unique ID of the conversation
+        message_id (int): The ID of the message that triggered the tool call
+        tool_name (str): The name of the tool that was called
+        tool_parameters (str): JSON string of parameters passed to the tool
+        tool_response (str): JSON string of the response from the tool
+        wait (bool): Whether to wait for the write when write-behind is
+            enabled with async durability
+        duration_ms (int, optional): How long the tool took to execute
+
+    Returns:
+        int: The ID of the inserted tool call record, or None if the write
+            was queued without waiting
+    """
+    if conversation_id is None or tool_name is None:
+        raise ValueError("Conversation ID and tool name must be provided")
+
+    return _write(
+        _insert_tool_call,
+        (
+            conversation_id,
+            message_id,
+            tool_name,
+            tool_parameters,
+            tool_response,
+            duration_ms,
+        ),
+        "Database error when adding tool call",
+        wait=wait,
+        db_file=shard_for(conversation_id),
+    )
+
+
+def get_last_message_id(conversation_id):
+    """
+    Get the ID of the most recent message in a conversation
+
+    Args:
+        conversation_id (str): The unique ID of the conversation
 
-    cursor.execute(
-        """
-    CREATE TABLE IF NOT EXISTS conversations (
-        id TEXT PRIMARY KEY,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
+    Returns:
+        int: The ID of the most recent message
     """
-    )
+    db_file = shard_for(conversation_id)
+    flush_writes(db_file)
 
-    cursor.execute(
-        """
-    CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        conversation_id TEXT,
-        role TEXT,
-        content TEXT,
-        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (conversation_id) REFERENCES conversations (id)
-    )
+    with get_connection(db_file) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT last_message_id FROM conversations WHERE id = ?",
+            (conversation_id,),
+        )
+
+        result = cursor.fetchone()
+
+    return result[0] if result else None
+
+
+def get_message_count(conversation_id):
     """
-    )
+    Get the number of messages in a conversation
 
-    cursor.execute(
-        """
-    CREATE TABLE IF NOT EXISTS tool_calls (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        conversation_id TEXT,
-        message_id INTEGER,
-        tool_name TEXT,
-        tool_parameters TEXT,
-        tool_response TEXT,
-        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (conversation_id) REFERENCES conversations (id),
-        FOREIGN KEY (message_id) REFERENCES messages (id)
-    )
+    Args:
+        conversation_id (str): The unique ID of the conversation
+
+    Returns:
+        int: The number of messages (0 for an unknown conversation)
     """
-    )
+    db_file = shard_for(conversation_id)
+    flush_writes(db_file)
 
-    conn.commit()
-    conn.close()
+    with get_connection(db_file) as conn:
+        cursor = conn.cursor()
 
+        cursor.execute(
+            "SELECT message_count FROM conversations WHERE id = ?",
+            (conversation_id,),
+        )
 
-def get_connection():
-    """Get a database connection"""
-    return sqlite3.connect(DB_FILE)
+        result = cursor.fetchone()
 
+    return result[0] if result else 0
 
-def get_messages_by_conversation_id(conversation_id):
+
+def _transcript_db_file(conversation_id):
+    """Get the file holding a conversation: its shard, or the archive"""
+    db_file = shard_for(conversation_id)
+    flush_writes(db_file)
+
+    with get_connection(db_file) as conn:
+        found = conn.execute(
+            "SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+
+    if not found and os.path.exists(ARCHIVE_DB_FILE):
+        return ARCHIVE_DB_FILE
+    return db_file
+
+
+def get_conversation_version(conversation_id):
     """
-    Retrieve all messages for a specific conversation
+    Get a cheap version stamp that changes whenever a conversation changes
 
     Args:
         conversation_id (str): The unique ID of the conversation
 
     Returns:
-        list: List of message dictionaries with role and content
+        tuple: (message_count, last_tool_call_id); (0, 0) if unknown
     """
-    conn = get_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    with get_connection(_transcript_db_file(conversation_id)) as conn:
+        cursor = conn.cursor()
 
-    cursor.execute(
-        "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY timestamp",
-        (conversation_id,),
-    )
+        cursor.execute(
+            """
+            SELECT c.message_count,
+                   (SELECT MAX(t.id) FROM tool_calls t WHERE t.conversation_id = c.id)
+            FROM conversations c
+            WHERE c.id = ?
+            """,
+            (conversation_id,),
+        )
 
-    messages = [
-        {"role": row["role"], "content": row["content"]} for row in cursor.fetchall()
-    ]
+        result = cursor.fetchone()
 
-    conn.close()
-    return messages
+    if result is None:
+        return (0, 0)
+    return (result[0], result[1] or 0)
 
 
-def add_message(conversation_id, role, content):
+def get_messages_page(conversation_id, after_seq=0, limit=50):
     """
-    Add a new message to the database
+    Retrieve a page of a conversation's messages with their tool calls
+
+    Uses keyset pagination on the per-conversation sequence, so each page
+    costs the same regardless of how far into the conversation it starts.
 
     Args:
         conversation_id (str): The unique ID of the conversation
-        role (str): The role of the message sender (user or assistant)
-        content (str): The content of the message
+        after_seq (int): Return messages with a sequence number above this
+        limit (int): Maximum number of messages to return
 
     Returns:
-        tuple: (conversation_id, message_id)
+        dict: {"messages": [...], "has_more": bool}; each message has seq,
+            id, role, content, timestamp and a list of tool_calls
     """
+    with get_connection(_transcript_db_file(conversation_id)) as conn:
+        cursor = conn.cursor()
 
-    if conversation_id is None:
-        conversation_id = str(uuid.uuid4())
+        # Fetch one extra message to learn whether another page follows
+        cursor.execute(
+            """
+            SELECT m.id, m.seq, m.role, m.content, m.timestamp,
+                   t.id AS tool_call_id, t.tool_name, t.tool_parameters,
+                   t.tool_response, b.compression, b.data
+            FROM (
+                SELECT id, seq, role, content, timestamp FROM messages
+                WHERE conversation_id = ? AND seq > ?
+                ORDER BY seq
+                LIMIT ?
+            ) AS m
+            LEFT JOIN tool_calls t ON t.message_id = m.id
+            LEFT JOIN tool_response_blobs b ON b.hash = t.response_hash
+            ORDER BY m.seq, t.id
+            """,
+            (conversation_id, after_seq, limit + 1),
+        )
 
-    if role is None or content is None:
-        raise ValueError("Role and content must be provided")
+        messages = []
+        for row in cursor.fetchall():
+            if not messages or messages[-1]["id"] != row["id"]:
+                messages.append(
+                    {
+                        "id": row["id"],
+                        "seq": row["seq"],
+                        "role": row["role"],
+                        "content": row["content"],
+                        "timestamp": row["timestamp"],
+                        "tool_calls": [],
+                    }
+                )
 
-    conn = get_connection()
-    cursor = conn.cursor()
+            if row["tool_call_id"] is not None:
+                messages[-1]["tool_calls"].append(
+                    {
+                        "id": row["tool_call_id"],
+                        "tool_name": row["tool_name"],
+                        "parameters": row["tool_parameters"],
+                        "response": (
+                            _load_blob(row["compression"], row["data"])
+                            if row["data"] is not None
+                            else row["tool_response"]
+                        ),
+                    }
+                )
 
-    try:
-        # Check if conversation exists
-        cursor.execute("SELECT id FROM conversations WHERE id = ?", (conversation_id,))
-        if not cursor.fetchone():
-            cursor.execute(
-                "INSERT INTO conversations (id) VALUES (?)", (conversation_id,)
-            )
+    has_more = len(messages) > limit
+    return {"messages": messages[:limit], "has_more": has_more}
+
+
+def get_tool_calls_by_conversation_id(conversation_id):
+    """
+    Retrieve all tool calls for a specific conversation
+
+    Args:
+        conversation_id (str): The unique ID of the conversation
+
+    Returns:
+        list: List of tool call dictionaries
+    """
+    db_file = shard_for(conversation_id)
+    flush_writes(db_file)
+
+    with get_connection(db_file) as conn:
+        cursor = conn.cursor()
 
         cursor.execute(
-            "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)",
-            (conversation_id, role, content),
+            """
+            SELECT t.id, t.message_id, t.tool_name, t.tool_parameters,
+                   t.tool_response, t.timestamp, b.compression, b.data
+            FROM tool_calls t
+            LEFT JOIN tool_response_blobs b ON b.hash = t.response_hash
+            WHERE t.conversation_id = ? 
+            ORDER BY t.id
+            """,
+            (conversation_id,),
         )
 
-        message_id = cursor.lastrowid
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"Database error: {str(e)}")
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
+        tool_calls = [
+            {
+                "id": row["id"],
+                "message_id": row["message_id"],
+                "tool_name": row["tool_name"],
+                "parameters": row["tool_parameters"],
+                "response": (
+                    _load_blob(row["compression"], row["data"])
+                    if row["data"] is not None
+                    else row["tool_response"]
+                ),
+                "timestamp": row["timestamp"],
+            }
+            for row in cursor.fetchall()
+        ]
 
-    return conversation_id, message_id
+    return tool_calls
 
 
-def add_tool_call(
-    conversation_id, message_id, tool_name, tool_parameters, tool_response
-):
+def get_tool_calls_by_turn(conversation_id, from_seq=1):
     """
-    Record a tool call in the database
+    Retrieve a conversation's tool calls grouped by the user message whose
+    turn made them, for replaying the history with tool_use blocks
 
     Args:
         conversation_id (str): The unique ID of the conversation
-        message_id (int): The ID of the message that triggered the tool call
-        tool_name (str): The name of the tool that was called
-        tool_parameters (str): JSON string of parameters passed to the tool
-        tool_response (str): JSON string of the response from the tool
+        from_seq (int): Skip turns whose user message comes before this
+            sequence number (e.g. the part covered by the summary)
 
     Returns:
-        int: The ID of the inserted tool call record
+        dict: User message seq -> list of {"id", "tool_name", "parameters",
+            "response"} in call order
     """
-    if conversation_id is None or tool_name is None:
-        raise ValueError("Conversation ID and tool name must be provided")
-
-    conn = get_connection()
-    cursor = conn.cursor()
+    with get_connection(_transcript_db_file(conversation_id)) as conn:
+        cursor = conn.cursor()
 
-    try:
         cursor.execute(
             """
-            INSERT INTO tool_calls 
-            (conversation_id, message_id, tool_name, tool_parameters, tool_response) 
-            VALUES (?, ?, ?, ?, ?)
+            SELECT m.seq, t.id, t.tool_name, t.tool_parameters, t.tool_response,
+                   b.compression, b.data
+            FROM tool_calls t
+            JOIN messages m ON m.id = t.message_id
+            LEFT JOIN tool_response_blobs b ON b.hash = t.response_hash
+            WHERE t.conversation_id = ? AND m.seq >= ?
+            ORDER BY m.seq, t.id
             """,
-            (conversation_id, message_id, tool_name, tool_parameters, tool_response),
+            (conversation_id, from_seq),
         )
 
-        conn.commit()
-        tool_call_id = cursor.lastrowid
-    except sqlite3.Error as e:
-        print(f"Database error when adding tool call: {str(e)}")
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
+        turns = {}
+        for row in cursor.fetchall():
+            turns.setdefault(row["seq"], []).append(
+                {
+                    "id": row["id"],
+                    "tool_name": row["tool_name"],
+                    "parameters": row["tool_parameters"],
+                    "response": (
+                        _load_blob(row["compression"], row["data"])
+                        if row["data"] is not None
+                        else row["tool_response"]
+                    ),
+                }
+            )
 
-    return tool_call_id
+    return turns
 
 
-def get_last_message_id(conversation_id):
+def get_conversation_summary(conversation_id):
     """
-    Get the ID of the most recent message in a conversation
+    Get the rolling summary of the older part of a conversation
 
     Args:
         conversation_id (str): The unique ID of the conversation
 
     Returns:
-        int: The ID of the most recent message
+        dict: {"summary", "covered_messages"}, or None if there is no summary
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    with get_connection(shard_for(conversation_id)) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT summary, covered_messages FROM conversation_summaries WHERE conversation_id = ?",
+            (conversation_id,),
+        )
 
+        row = cursor.fetchone()
+
+    if row is None:
+        return None
+
+    return {"summary": row["summary"], "covered_messages": row["covered_messages"]}
+
+
+def _upsert_conversation_summary(cursor, conversation_id, summary, covered_messages):
     cursor.execute(
-        "SELECT id FROM messages WHERE conversation_id = ? ORDER BY timestamp DESC LIMIT 1",
-        (conversation_id,),
+        """
+        INSERT INTO conversation_summaries (conversation_id, summary, covered_messages)
+        VALUES (?, ?, ?)
+        ON CONFLICT (conversation_id) DO UPDATE SET
+            summary = excluded.summary,
+            covered_messages = excluded.covered_messages,
+            updated_at = CURRENT_TIMESTAMP
+        """,
+        (conversation_id, summary, covered_messages),
     )
 
-    result = cursor.fetchone()
-    conn.close()
 
-    return result[0] if result else None
+def save_conversation_summary(conversation_id, summary, covered_messages):
+    """
+    Store the rolling summary of a conversation
+
+    Args:
+        conversation_id (str): The unique ID of the conversation
+        summary (str): Summary of the first covered_messages messages
+        covered_messages (int): How many leading messages the summary covers
+    """
+    _write(
+        _upsert_conversation_summary,
+        (conversation_id, summary, covered_messages),
+        "Database error when saving conversation summary",
+        db_file=shard_for(conversation_id),
+    )
 
 
-def get_tool_calls_by_conversation_id(conversation_id):
+def list_conversations(limit=50, offset=0):
     """
-    Retrieve all tool calls for a specific conversation
+    List conversations across all shards, most recently active first
 
     Args:
-        conversation_id (str): The unique ID of the conversation
+        limit (int): Maximum number of conversations to return
+        offset (int): Number of conversations to skip
 
     Returns:
-        list: List of tool call dictionaries
+        list: Conversation dictionaries with id, created_at and message_count
     """
-    conn = get_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    flush_writes()
 
-    cursor.execute(
+    conversations = []
+    for db_file in shard_files():
+        with get_connection(db_file) as conn:
+            cursor = conn.cursor()
+
+            # Each shard contributes at most limit + offset rows to the merge
+            cursor.execute(
+                """
+                SELECT id, created_at, updated_at, message_count
+                FROM conversations
+                ORDER BY updated_at DESC
+                LIMIT ?
+                """,
+                (limit + offset,),
+            )
+
+            conversations.extend(
+                {
+                    "id": row["id"],
+                    "created_at": row["created_at"],
+                    "updated_at": row["updated_at"],
+                    "message_count": row["message_count"],
+                }
+                for row in cursor.fetchall()
+            )
+
+    conversations.sort(key=lambda conversation: conversation["updated_at"], reverse=True)
+    return conversations[offset : offset + limit]
+
+
+# SQL grouping key (and extra FROM clause) for each usage report dimension
+USAGE_GROUPS = {
+    "day": ("date(m.created_at)", ""),
+    "route": ("m.route", ""),
+    "model": ("m.model", ""),
+    "rule": ("m.routing_rule", ""),
+    "tool": ("t.value", ", json_each(m.tools) t"),
+}
+
+
+def _usage_files():
+    """Every database file holding conversations: the shards and the archive"""
+    files = list(shard_files())
+    if os.path.exists(ARCHIVE_DB_FILE):
+        # An archive written before v6 has no message_metrics table yet
+        _init_db_file(ARCHIVE_DB_FILE)
+        files.append(ARCHIVE_DB_FILE)
+    return files
+
+
+def get_usage_totals(group_by="day", days=30):
+    """
+    Sum token usage and latency of assistant messages across all shards
+
+    Args:
+        group_by (str): "day", "route", "model", "rule" or "tool" (turns
+            that used the tool)
+        days (int): How many days back to include
+
+    Returns:
+        list: One dict per (group, model) with message, token and latency
+            totals; cost is left to the caller since it depends on the model
+    """
+    if group_by not in USAGE_GROUPS:
+        raise ValueError(f"Unknown usage grouping '{group_by}'")
+    key, extra_from = USAGE_GROUPS[group_by]
+
+    flush_writes()
+
+    totals = {}
+    for db_file in _usage_files():
+        with get_connection(db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT {key} AS grouping, m.model AS model,
+                       COUNT(*) AS messages,
+                       SUM(m.model_calls) AS model_calls,
+                       SUM(m.input_tokens) AS input_tokens,
+                       SUM(m.output_tokens) AS output_tokens,
+                       SUM(m.cache_read_tokens) AS cache_read_tokens,
+                       SUM(m.cache_write_tokens) AS cache_write_tokens,
+                       SUM(m.model_latency_ms) AS model_latency_ms,
+                       MAX(m.model_latency_ms) AS max_model_latency_ms,
+                       SUM(m.tool_time_ms) AS tool_time_ms,
+                       SUM(m.repeated_tool_calls) AS repeated_tool_calls,
+                       SUM(m.tool_calls) AS turn_tool_calls,
+                       SUM(m.memo_hits) AS memo_hits
+                FROM message_metrics m{extra_from}
+                WHERE m.created_at >= datetime('now', ?)
+                GROUP BY grouping, m.model
+                """,
+                (f"-{int(days)} days",),
+            )
+
+            for row in cursor.fetchall():
+                entry = totals.setdefault(
+                    (row["grouping"], row["model"]),
+                    {"group": row["grouping"], "model": row["model"]},
+                )
+                for column in row.keys()[2:]:
+                    value = row[column] or 0
+                    if column.startswith("max_"):
+                        entry[column] = max(entry.get(column, 0), value)
+                    else:
+                        entry[column] = entry.get(column, 0) + value
+
+    return sorted(totals.values(), key=lambda entry: (str(entry["group"]), str(entry["model"])))
+
+
+def get_tool_timings(days=30):
+    """
+    Count tool calls and sum their execution time across all shards
+
+    Args:
+        days (int): How many days back to include
+
+    Returns:
+        dict: Tool name -> {"calls", "duration_ms", "max_duration_ms"}
+    """
+    flush_writes()
+
+    timings = {}
+    for db_file in _usage_files():
+        with get_connection(db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT tool_name, COUNT(*) AS calls,
+                       SUM(duration_ms) AS duration_ms,
+                       MAX(duration_ms) AS max_duration_ms
+                FROM tool_calls
+                WHERE timestamp >= datetime('now', ?)
+                GROUP BY tool_name
+                """,
+                (f"-{int(days)} days",),
+            )
+
+            for row in cursor.fetchall():
+                entry = timings.setdefault(
+                    row["tool_name"], {"calls": 0, "duration_ms": 0, "max_duration_ms": 0}
+                )
+                entry["calls"] += row["calls"]
+                entry["duration_ms"] += row["duration_ms"] or 0
+                entry["max_duration_ms"] = max(
+                    entry["max_duration_ms"], row["max_duration_ms"] or 0
+                )
+
+    return timings
+
+
+def _delete_conversation(conn, conversation_id):
+    """
+    Delete one conversation's rows through an open connection (no commit),
+    along with the response blobs no other tool call references
+    """
+    response_hashes = conn.execute(
+        """
+        SELECT DISTINCT response_hash FROM tool_calls
+        WHERE conversation_id = ? AND response_hash IS NOT NULL
+        """,
+        (conversation_id,),
+    ).fetchall()
+    conn.execute("DELETE FROM tool_calls WHERE conversation_id = ?", (conversation_id,))
+    conn.executemany(
         """
-        SELECT id, message_id, tool_name, tool_parameters, tool_response, timestamp 
-        FROM tool_calls 
-        WHERE conversation_id = ? 
-        ORDER BY timestamp
+        DELETE FROM tool_response_blobs
+        WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM tool_calls WHERE response_hash = ?)
         """,
+        [(row[0], row[0]) for row in response_hashes],
+    )
+    conn.execute(
+        "DELETE FROM message_metrics WHERE conversation_id = ?", (conversation_id,)
+    )
+    conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+    conn.execute(
+        "DELETE FROM conversation_summaries WHERE conversation_id = ?",
         (conversation_id,),
     )
+    conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
 
-    tool_calls = [
-        {
-            "id": row["id"],
-            "message_id": row["message_id"],
-            "tool_name": row["tool_name"],
-            "parameters": row["tool_parameters"],
-            "response": row["tool_response"],
-            "timestamp": row["timestamp"],
-        }
-        for row in cursor.fetchall()
-    ]
 
-    conn.close()
-    return tool_calls
+def _copy_conversation(source, target, conversation_id):
+    """
+    Merge one conversation's rows into another file (no commit)
+
+    Rows already in the target are kept: messages are matched by seq and
+    only the missing ones are inserted, with their tool calls and metrics.
+    Re-running an interrupted copy, or archiving a resumed conversation
+    again, therefore neither duplicates nor drops rows.
+    """
+    row = source.execute(
+        "SELECT id, created_at, message_count, updated_at FROM conversations WHERE id = ?",
+        (conversation_id,),
+    ).fetchone()
+    target.execute(
+        """
+        INSERT INTO conversations (id, created_at, message_count, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            created_at = MIN(created_at, excluded.created_at),
+            message_count = MAX(message_count, excluded.message_count),
+            updated_at = MAX(updated_at, excluded.updated_at)
+        """,
+        (row["id"], row["created_at"], row["message_count"], row["updated_at"]),
+    )
+
+    # Message IDs are per-file, so remap them for the tool call references
+    existing = dict(
+        target.execute(
+            "SELECT seq, id FROM messages WHERE conversation_id = ?", (conversation_id,)
+        ).fetchall()
+    )
+    message_ids = {}
+    copied = set()
+    for message in source.execute(
+        "SELECT id, role, content, timestamp, seq FROM messages WHERE conversation_id = ? ORDER BY seq",
+        (conversation_id,),
+    ).fetchall():
+        if message["seq"] in existing:
+            message_ids[message["id"]] = existing[message["seq"]]
+            continue
+        cursor = target.execute(
+            "INSERT INTO messages (conversation_id, role, content, timestamp, seq) VALUES (?, ?, ?, ?, ?)",
+            (
+                conversation_id,
+                message["role"],
+                message["content"],
+                message["timestamp"],
+                message["seq"],
+            ),
+        )
+        message_ids[message["id"]] = cursor.lastrowid
+        copied.add(message["id"])
+
+    target.execute(
+        """
+        UPDATE conversations SET last_message_id = (
+            SELECT id FROM messages WHERE conversation_id = ? ORDER BY seq DESC LIMIT 1
+        )
+        WHERE id = ?
+        """,
+        (conversation_id, conversation_id),
+    )
+
+    def is_new(message_id):
+        # Rows not tied to a message are only copied into an empty target
+        return message_id in copied if message_id is not None else not existing
+
+    for tool_call in source.execute(
+        """
+        SELECT t.message_id, t.tool_name, t.tool_parameters, t.tool_response,
+               t.timestamp, t.response_hash, t.duration_ms, b.compression, b.size, b.data
+        FROM tool_calls t
+        LEFT JOIN tool_response_blobs b ON b.hash = t.response_hash
+        WHERE t.conversation_id = ?
+        ORDER BY t.id
+        """,
+        (conversation_id,),
+    ).fetchall():
+        if not is_new(tool_call["message_id"]):
+            continue
+        if tool_call["data"] is not None:
+            target.execute(
+                "INSERT OR IGNORE INTO tool_response_blobs (hash, compression, size, data) VALUES (?, ?, ?, ?)",
+                (
+                    tool_call["response_hash"],
+                    tool_call["compression"],
+                    tool_call["size"],
+                    tool_call["data"],
+                ),
+            )
+        target.execute(
+            """
+            INSERT INTO tool_calls
+            (conversation_id, message_id, tool_name, tool_parameters, tool_response,
+             timestamp, response_hash, duration_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                conversation_id,
+                message_ids.get(tool_call["message_id"]),
+                tool_call["tool_name"],
+                tool_call["tool_parameters"],
+                tool_call["tool_response"],
+                tool_call["timestamp"],
+                tool_call["response_hash"],
+                tool_call["duration_ms"],
+            ),
+        )
+
+    for metrics in source.execute(
+        "SELECT * FROM message_metrics WHERE conversation_id = ?", (conversation_id,)
+    ).fetchall():
+        if not is_new(metrics["message_id"]):
+            continue
+        target.execute(
+            f"""
+            INSERT INTO message_metrics
+            (message_id, conversation_id, created_at, {", ".join(MESSAGE_METRIC_FIELDS)})
+            VALUES (?, ?, ?, {", ".join("?" for _ in MESSAGE_METRIC_FIELDS)})
+            """,
+            (
+                message_ids.get(metrics["message_id"]),
+                conversation_id,
+                metrics["created_at"],
+                *(metrics[field] for field in MESSAGE_METRIC_FIELDS),
+            ),
+        )
+
+    summary = source.execute(
+        "SELECT summary, covered_messages, updated_at FROM conversation_summaries WHERE conversation_id = ?",
+        (conversation_id,),
+    ).fetchone()
+    if summary:
+        # Keep whichever summary covers more of the conversation
+        target.execute(
+            """
+            INSERT INTO conversation_summaries (conversation_id, summary, covered_messages, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (conversation_id) DO UPDATE SET
+                summary = excluded.summary,
+                covered_messages = excluded.covered_messages,
+                updated_at = excluded.updated_at
+            WHERE excluded.covered_messages >= conversation_summaries.covered_messages
+            """,
+            (
+                conversation_id,
+                summary["summary"],
+                summary["covered_messages"],
+                summary["updated_at"],
+            ),
+        )
+
+
+def rebalance_shards(source_files):
+    """
+    Move conversations into the shard the current layout routes them to
+
+    Run after changing DB_SHARD_COUNT, passing the files of the previous
+    layout (see shard_files). Each conversation is merged into its target
+    shard and committed before it is deleted from the source, one
+    conversation per transaction. A conversation that was copied but not yet
+    deleted is merged again on the next run, which adds nothing, so an
+    interrupted rebalance can be resumed.
+
+    Args:
+        source_files (list): Database files of the previous shard layout
+
+    Returns:
+        int: Number of conversations moved
+    """
+    init_db()
+    flush_writes()
+
+    moved = 0
+    for source_file in source_files:
+        if not os.path.exists(source_file):
+            continue
+
+        _init_db_file(source_file)
+
+        with get_connection(source_file) as source:
+            conversation_ids = [
+                row["id"] for row in source.execute("SELECT id FROM conversations")
+            ]
+
+            for conversation_id in conversation_ids:
+                target_file = shard_for(conversation_id)
+                if target_file == source_file:
+                    continue
+
+                with get_connection(target_file) as target:
+                    try:
+                        _copy_conversation(source, target, conversation_id)
+                        target.commit()
+                    except sqlite3.Error as e:
+                        print(f"Database error when copying {conversation_id}: {str(e)}")
+                        target.rollback()
+                        raise e
+
+                try:
+                    _delete_conversation(source, conversation_id)
+                    source.commit()
+                except sqlite3.Error as e:
+                    print(f"Database error when removing {conversation_id}: {str(e)}")
+                    source.rollback()
+                    raise e
+
+                history_cache.invalidate(conversation_id)
+                moved += 1
+
+    return moved
+
+
+def archive_idle_conversations(idle_days, batch_size=ARCHIVE_BATCH_SIZE, pause=0.05):
+    """
+    Move conversations idle for more than idle_days into the archive database
+
+    Works in batches. Each batch holds its shard's write lock from picking
+    the idle conversations until they are deleted, with the copy committed
+    to the archive in between, so a message written meanwhile waits for the
+    batch instead of being deleted unarchived. Archived conversations stay
+    readable through get_messages_by_conversation_id; a new message restores
+    one to its shard, and archiving it again merges the new rows into the
+    archive.
+
+    Args:
+        idle_days (int): Archive conversations whose last message is older
+        batch_size (int): Conversations moved per transaction
+        pause (float): Seconds to sleep between batches to let writers in
+
+    Returns:
+        int: Number of conversations archived
+    """
+    os.makedirs(DB_DIR, exist_ok=True)
+    _init_db_file(ARCHIVE_DB_FILE)
+    flush_writes()
+
+    archived = 0
+    for db_file in shard_files():
+        while True:
+            with get_connection(db_file) as source:
+                try:
+                    source.execute("BEGIN IMMEDIATE")
+                    conversation_ids = [
+                        row["id"]
+                        for row in source.execute(
+                            """
+                            SELECT id FROM conversations
+                            WHERE updated_at < datetime('now', ?)
+                            LIMIT ?
+                            """,
+                            (f"-{int(idle_days)} days", batch_size),
+                        )
+                    ]
+                    if not conversation_ids:
+                        source.rollback()
+                        break
+
+                    with get_connection(ARCHIVE_DB_FILE) as archive:
+                        try:
+                            for conversation_id in conversation_ids:
+                                _copy_conversation(source, archive, conversation_id)
+                            archive.commit()
+                        except sqlite3.Error as e:
+                            print(f"Database error when archiving conversations: {str(e)}")
+                            archive.rollback()
+                            raise e
+
+                    for conversation_id in conversation_ids:
+                        _delete_conversation(source, conversation_id)
+                        history_cache.invalidate(conversation_id)
+                    source.commit()
+                except sqlite3.Error as e:
+                    print(f"Database error when removing archived conversations: {str(e)}")
+                    source.rollback()
+                    raise e
+            archived += len(conversation_ids)
+            time.sleep(pause)
+
+    return archived
+
+
+def optimize_database(db_file, pause=0.01):
+    """
+    Reclaim free pages and refresh query planner statistics for one file
+
+    Free pages are released with PRAGMA incremental_vacuum a few pages at a
+    time so each step is a short write transaction. Databases created before
+    incremental auto-vacuum was enabled are left as they are; they need a
+    one-time convert_to_incremental_vacuum first.
+
+    Args:
+        db_file (str): Database file to optimize
+        pause (float): Seconds to sleep between incremental vacuum steps
+
+    Returns:
+        dict: Pages freed and whether the file uses incremental auto-vacuum
+    """
+    with get_connection(db_file) as conn:
+        cursor = conn.cursor()
+
+        freed = _incremental_vacuum(conn, pause)
+
+        # Bound the cost of ANALYZE on large tables
+        cursor.execute("PRAGMA analysis_limit = 1000")
+        cursor.execute("ANALYZE")
+        cursor.execute("PRAGMA optimize")
+
+    return {"freed_pages": freed or 0, "incremental": freed is not None}
+
+
+def convert_to_incremental_vacuum(db_file):
+    """
+    Switch a database created without auto-vacuum to incremental auto-vacuum
+
+    This rewrites the whole file with VACUUM, which holds an exclusive lock
+    for as long as the copy takes, so it is an explicit admin step
+    (manage_conversations.py vacuum) rather than part of the scheduled job.
+
+    Args:
+        db_file (str): Database file to convert
+
+    Returns:
+        bool: Whether the file needed converting
+    """
+    with get_connection(db_file) as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    return True
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+
+class ByteBudgetLRU:
+    """
+    LRU mapping bounded by the approximate size of its values in bytes
+
+    Callers give each value's size, so a cached container can be grown in
+    place with add_bytes(). Once the total exceeds max_bytes, entries are
+    evicted least-recently-used first. Not thread-safe: the caches built on
+    it hold their own lock around each call.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, touch=True):
+        """The value for key, or None; touch marks it most recently used"""
+        value = self._entries.get(key)
+        if value is not None and touch:
+            self._entries.move_to_end(key)
+        return value
+
+    def touch(self, key):
+        """Mark key as most recently used"""
+        self._entries.move_to_end(key)
+
+    def put(self, key, value, size):
+        """Store value as the most recently used entry, then evict"""
+        self.pop(key)
+        self._entries[key] = value
+        self._sizes[key] = size
+        self.total_bytes += size
+        self.evict()
+
+    def add_bytes(self, key, size):
+        """Account for a value grown (or shrunk, if negative) in place, then evict"""
+        self._sizes[key] += size
+        self.total_bytes += size
+        self.evict()
+
+    def pop(self, key):
+        """Remove key, returning its value or None"""
+        if key not in self._entries:
+            return None
+        self.total_bytes -= self._sizes.pop(key)
+        return self._entries.pop(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._sizes.clear()
+        self.total_bytes = 0
+
+    def evict(self):
+        """Drop least-recently-used entries until within max_bytes"""
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, _ = self._entries.popitem(last=False)
+            self.total_bytes -= self._sizes.pop(key)
+            self.evictions += 1
@@ -0,0 +1,88 @@
+import logging
+import os
+import threading
+import db
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Conversations with no message for this many days are archived
+RETENTION_IDLE_DAYS = int(os.environ.get("TAGORE_RETENTION_IDLE_DAYS", "90"))
+
+# Run maintenance in-process every N hours (0 disables the scheduler)
+MAINTENANCE_INTERVAL_HOURS = float(
+    os.environ.get("TAGORE_MAINTENANCE_INTERVAL_HOURS", "0")
+)
+
+
+def run_maintenance(idle_days=RETENTION_IDLE_DAYS):
+    """
+    Archive idle conversations, then vacuum and analyze every database file
+
+    Args:
+        idle_days (int): Archive conversations idle for longer than this
+
+    Returns:
+        dict: Number of conversations archived and per-file optimize results
+    """
+    db.init_db()
+
+    archived = db.archive_idle_conversations(idle_days)
+    logger.info(f"Archived {archived} conversation(s) idle for over {idle_days} days")
+
+    optimized = {}
+    for db_file in db.shard_files() + [db.ARCHIVE_DB_FILE]:
+        if not os.path.exists(db_file):
+            continue
+        optimized[db_file] = db.optimize_database(db_file)
+        logger.info(f"Optimized {db_file}: {optimized[db_file]}")
+
+    return {"archived": archived, "optimized": optimized}
+
+
+class MaintenanceScheduler:
+    """Runs run_maintenance periodically on a background thread"""
+
+    def __init__(self, interval_hours=MAINTENANCE_INTERVAL_HOURS, idle_days=RETENTION_IDLE_DAYS):
+        self.interval_seconds = interval_hours * 3600
+        self.idle_days = idle_days
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the scheduler thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="db-maintenance", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"Maintenance scheduled every {self.interval_seconds / 3600:g} hours"
+        )
+
+    def stop(self):
+        """Stop the scheduler thread after any run in progress"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                run_maintenance(self.idle_days)
+            except Exception as e:
+                logger.error(f"Error running database maintenance: {str(e)}")
+
+
+def start_scheduler():
+    """Start the in-process scheduler if TAGORE_MAINTENANCE_INTERVAL_HOURS is set"""
+    if MAINTENANCE_INTERVAL_HOURS <= 0:
+        return None
+
+    scheduler = MaintenanceScheduler()
+    scheduler.start()
+    return scheduler
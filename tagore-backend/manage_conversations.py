@@ -0,0 +1,137 @@
+import argparse
+import os
+import db
+from maintenance import RETENTION_IDLE_DAYS, run_maintenance
+from services.usage_service import usage_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the conversation database")
+    subparsers = parser.add_subparsers(dest="command", help="Command to run")
+
+    # List conversations command
+    list_parser = subparsers.add_parser(
+        "list", help="List conversations across all shards"
+    )
+    list_parser.add_argument("-n", "--limit", type=int, default=50, help="Rows to show")
+    list_parser.add_argument("--offset", type=int, default=0, help="Rows to skip")
+
+    # Rebalance command
+    rebalance_parser = subparsers.add_parser(
+        "rebalance",
+        help="Move conversations into their shard after changing TAGORE_DB_SHARDS",
+    )
+    rebalance_parser.add_argument(
+        "--from-shards",
+        type=int,
+        required=True,
+        help="Shard count of the previous layout",
+    )
+
+    # Maintenance command
+    maintain_parser = subparsers.add_parser(
+        "maintain",
+        help="Archive idle conversations, then vacuum and analyze the databases",
+    )
+    maintain_parser.add_argument(
+        "--idle-days",
+        type=int,
+        default=RETENTION_IDLE_DAYS,
+        help="Archive conversations idle for longer than this many days",
+    )
+
+    # Vacuum conversion command
+    subparsers.add_parser(
+        "vacuum",
+        help="Convert databases to incremental auto-vacuum (one-time full VACUUM; "
+        "locks each file while it is rewritten)",
+    )
+
+    # Usage report command
+    report_parser = subparsers.add_parser(
+        "report", help="Summarize token cost and latency of assistant turns"
+    )
+    report_parser.add_argument(
+        "--by",
+        choices=["day", "route", "model", "rule", "tool"],
+        default="day",
+        help="How to group the report",
+    )
+    report_parser.add_argument(
+        "--days", type=int, default=30, help="How many days back to include"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        db.init_db()
+        conversations = db.list_conversations(args.limit, args.offset)
+
+        if not conversations:
+            print("No conversations found")
+        else:
+            print("\n=== Conversations ===")
+            for conversation in conversations:
+                print(
+                    f"{conversation['id']}  {conversation['created_at']}  "
+                    f"{conversation['message_count']} messages"
+                )
+    elif args.command == "rebalance":
+        source_files = db.shard_files(args.from_shards)
+        print(
+            f"Rebalancing {len(source_files)} shard(s) into "
+            f"{len(db.shard_files())} shard(s)"
+        )
+        moved = db.rebalance_shards(source_files)
+        print(f"Moved {moved} conversation(s)")
+    elif args.command == "maintain":
+        result = run_maintenance(args.idle_days)
+        print(f"Archived {result['archived']} conversation(s)")
+        for db_file, stats in result["optimized"].items():
+            print(
+                f"{db_file}: freed {stats['freed_pages']} page(s)"
+                f"{'' if stats['incremental'] else ' (not incremental; run the vacuum command once)'}"
+            )
+    elif args.command == "vacuum":
+        db.init_db()
+        for db_file in db.shard_files() + [db.ARCHIVE_DB_FILE]:
+            if not os.path.exists(db_file):
+                continue
+            converted = db.convert_to_incremental_vacuum(db_file)
+            print(
+                f"{db_file}: "
+                f"{'converted to incremental auto-vacuum' if converted else 'already incremental'}"
+            )
+    elif args.command == "report":
+        db.init_db()
+        rows = usage_report(args.by, args.days)
+
+        if not rows:
+            print("No usage recorded")
+        else:
+            print(f"\n=== Usage by {args.by}, last {args.days} day(s) ===")
+            for row in rows:
+                cost = "n/a" if row["cost"] is None else f"${row['cost']:.4f}"
+                print(
+                    f"{row['group']}  {row['messages']} turns  {row['model_calls']} model calls  "
+                    f"in {row['input_tokens']} / out {row['output_tokens']} / "
+                    f"cache read {row['cache_read_tokens']} / cache write {row['cache_write_tokens']} tokens  "
+                    f"{cost}"
+                )
+                print(
+                    f"    model latency avg {row['avg_model_latency_ms']}ms "
+                    f"max {row['max_model_latency_ms']}ms  tool time {row['tool_time_ms']}ms  "
+                    f"{row['repeated_tool_calls']} repeated tool calls  "
+                    f"memo {row['memo_hits']}/{row['turn_tool_calls']} ({row['memo_hit_rate']:.0%})"
+                    + (
+                        f"  ({row['tool_calls']} calls, avg {row['avg_tool_ms']}ms, max {row['max_tool_ms']}ms)"
+                        if "tool_calls" in row
+                        else ""
+                    )
+                )
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
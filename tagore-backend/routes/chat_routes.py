@@ -2,6 +2,7 @@ import uuid
 import logging
 import os
 from flask import Response, stream_with_context, Blueprint, request, jsonify  # type: ignore
+from services.rate_limiter import DeadlineExceeded
 from services.response_service import ResponseService
 import json
 
@@ -28,7 +29,7 @@ def chat_message():
         return jsonify({"error": "No message provided"}), 400
 
     try:
-        response_text, speakable_chunks = response_service.generate_full_response(
+        response_text, speakable_chunks, work_parts = response_service.generate_full_response(
             user_message, conversation_id
         )
         return jsonify(
@@ -36,8 +37,12 @@ def chat_message():
                 "response": response_text,
                 "conversationId": conversation_id,
                 "speakableChunks": speakable_chunks,
+                "workParts": work_parts,
             }
         )
+    except DeadlineExceeded as de:
+        logger.error(f"Model deadline exceeded in chat_message: {str(de)}")
+        return jsonify({"error": "The service is busy. Please try again shortly.", "conversationId": conversation_id}), 503
     except ValueError as ve:
         logger.error(f"Validation error in chat_message: {str(ve)}")
         return jsonify({"error": str(ve), "conversationId": conversation_id}), 400
@@ -46,6 +51,50 @@ def chat_message():
         return jsonify({"error": "An unexpected error occurred. Please try again later.", "conversationId": conversation_id}), 500
 
 
+@chat_bp.route("/api/chat/stream", methods=["POST"])
+def chat_message_stream():
+    """Stream the reply as Server-Sent Events (delta, speakable, done, error)"""
+    data = request.json
+    user_message = data.get("message")
+    conversation_id = data.get("conversationId")
+
+    if not conversation_id:
+        conversation_id = str(uuid.uuid4())
+        logger.info(f"Created new conversation ID: {conversation_id}")
+
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+
+    def generate():
+        try:
+            for event in response_service.stream_response(
+                user_message, conversation_id
+            ):
+                event_type = event.pop("type")
+                yield f"event: {event_type}\ndata: {json.dumps(event)}\n\n"
+        except DeadlineExceeded as de:
+            logger.error(f"Model deadline exceeded in chat_message_stream: {str(de)}")
+            error = {"error": "The service is busy. Please try again shortly.", "conversationId": conversation_id}
+            yield f"event: error\ndata: {json.dumps(error)}\n\n"
+        except ValueError as ve:
+            logger.error(f"Validation error in chat_message_stream: {str(ve)}")
+            error = {"error": str(ve), "conversationId": conversation_id}
+            yield f"event: error\ndata: {json.dumps(error)}\n\n"
+        except Exception as e:
+            logger.error(f"Error in chat_message_stream: {str(e)}")
+            error = {
+                "error": "An unexpected error occurred. Please try again later.",
+                "conversationId": conversation_id,
+            }
+            yield f"event: error\ndata: {json.dumps(error)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @chat_bp.route("/api/cartesia-auth", methods=["GET"])
 def get_cartesia_auth():
     try:
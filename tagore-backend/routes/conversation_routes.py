@@ -0,0 +1,84 @@
+import hashlib
+import json
+import logging
+from flask import Blueprint, Response, request, jsonify  # type: ignore
+from db import get_conversation_version, get_messages_page
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+conversation_bp = Blueprint("conversation", __name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+@conversation_bp.route("/api/conversations/<conversation_id>/messages", methods=["GET"])
+def get_conversation_messages(conversation_id):
+    """Get a page of a conversation's transcript, newer than the `after` sequence"""
+    try:
+        after = int(request.args.get("after", 0))
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "after and limit must be integers"}), 400
+
+    if after < 0 or limit < 1:
+        return jsonify({"error": "after must be >= 0 and limit >= 1"}), 400
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    try:
+        # The ETag only depends on the conversation's version and the page
+        # requested, so an unchanged page is answered without reading it
+        message_count, last_tool_call_id = get_conversation_version(conversation_id)
+        etag = hashlib.sha1(
+            f"{conversation_id}:{message_count}:{last_tool_call_id}:{after}:{limit}".encode(
+                "utf-8"
+            )
+        ).hexdigest()
+
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        page = get_messages_page(conversation_id, after, limit)
+        messages = [
+            {
+                "id": message["id"],
+                "seq": message["seq"],
+                "role": message["role"],
+                "content": message["content"],
+                "timestamp": message["timestamp"],
+                "toolCalls": [
+                    {
+                        "id": tool_call["id"],
+                        "toolName": tool_call["tool_name"],
+                        "parameters": json.loads(tool_call["parameters"] or "{}"),
+                        "response": (
+                            json.loads(tool_call["response"])
+                            if tool_call["response"]
+                            else None
+                        ),
+                    }
+                    for tool_call in message["tool_calls"]
+                ],
+            }
+            for message in page["messages"]
+        ]
+
+        response = jsonify(
+            {
+                "conversationId": conversation_id,
+                "messages": messages,
+                "nextAfter": messages[-1]["seq"] if messages else after,
+                "hasMore": page["has_more"],
+                "messageCount": message_count,
+            }
+        )
+        response.set_etag(etag)
+        return response
+    except Exception as e:
+        logger.error(f"Error in get_conversation_messages: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred. Please try again later."}), 500
@@ -2,6 +2,7 @@ import uuid
 import logging
 from flask import Blueprint, request, jsonify  # type: ignore
 from services.inventory_service import InventoryService
+from services.rate_limiter import DeadlineExceeded
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -36,6 +37,9 @@ def inventory_query():
                 "speakableChunks": speakable_chunks,
             }
         )
+    except DeadlineExceeded as de:
+        logger.error(f"Model deadline exceeded in inventory_query: {str(de)}")
+        return jsonify({"error": "The service is busy. Please try again shortly.", "conversationId": conversation_id}), 503
     except ValueError as ve:
         logger.error(f"Validation error in inventory_query: {str(ve)}")
         return jsonify({"error": str(ve), "conversationId": conversation_id}), 400
@@ -0,0 +1,91 @@
+import json
+import logging
+from flask import Blueprint, Response, request, jsonify, stream_with_context  # type: ignore
+from tools.tagore_tools import catalog, data_version, iter_work_parts, part_cache
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+works_bp = Blueprint("works", __name__)
+
+DEFAULT_PAGE_SIZE = 5
+MAX_PAGE_SIZE = 20
+
+
+@works_bp.route("/api/works/<int:work_id>/parts", methods=["GET"])
+def get_work_parts(work_id):
+    """
+    Get the parts of a work numbered from `from` to `to`, inclusive
+
+    A page holds at most `limit` parts. With stream=true the whole range is
+    sent instead as server-sent `part` events, read a few parts at a time,
+    followed by a `done` event.
+    """
+    try:
+        part_from = request.args.get("from")
+        part_from = int(part_from) if part_from is not None else None
+        part_to = request.args.get("to")
+        part_to = int(part_to) if part_to is not None else None
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "from, to and limit must be integers"}), 400
+
+    if limit < 1 or (part_from is not None and part_to is not None and part_to < part_from):
+        return jsonify({"error": "limit must be >= 1 and to must be >= from"}), 400
+    limit = min(limit, MAX_PAGE_SIZE)
+    stream = request.args.get("stream", "false").lower() == "true"
+
+    try:
+        work = catalog.find_id(work_id)
+        if work is None:
+            return jsonify({"error": f"Work {work_id} not found"}), 404
+
+        part_numbers = catalog.part_numbers(work_id)
+        in_range = [
+            part_number
+            for part_number in part_numbers
+            if (part_from is None or part_number >= part_from)
+            and (part_to is None or part_number <= part_to)
+        ]
+
+        if stream:
+
+            def generate():
+                try:
+                    for part in iter_work_parts(work_id, in_range):
+                        data = {"partNumber": part["part_number"], "content": part["content"]}
+                        yield f"event: part\ndata: {json.dumps(data)}\n\n"
+                    done = {"workId": work_id, "partCount": len(part_numbers)}
+                    yield f"event: done\ndata: {json.dumps(done)}\n\n"
+                except Exception as e:
+                    logger.error(f"Error streaming parts of work {work_id}: {str(e)}")
+                    error = {"error": "An unexpected error occurred. Please try again later."}
+                    yield f"event: error\ndata: {json.dumps(error)}\n\n"
+
+            return Response(
+                stream_with_context(generate()),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
+        page = in_range[:limit]
+        parts = part_cache.get_parts(work_id, page, data_version()) if page else []
+        return jsonify(
+            {
+                "workId": work_id,
+                "title": work["title"],
+                "category": work["category"],
+                "parts": [
+                    {"partNumber": part["part_number"], "content": part["content"]}
+                    for part in parts
+                ],
+                "nextFrom": in_range[limit] if len(in_range) > limit else None,
+                "hasMore": len(in_range) > limit,
+                "partCount": len(part_numbers),
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error getting parts of work {work_id}: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred. Please try again later."}), 500
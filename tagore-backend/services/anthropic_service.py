@@ -1,20 +1,48 @@
 import logging
 import anthropic  # type: ignore
-from config import ANTHROPIC_API_KEY, ANTHROPIC_MODEL, MAX_TOKENS, SYSTEM_PROMPT
+from config import (
+    ANTHROPIC_API_KEY,
+    ANTHROPIC_MODEL,
+    MAX_TOKENS,
+    MODEL_BASE_URL,
+    PROMPT_CACHING,
+    SYSTEM_PROMPT,
+    get_system_context,
+)
 import os 
+import time
 import certifi
+from services.rate_limiter import DeadlineExceeded, rate_governor
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 class AnthropicService:
-    def __init__(self):
-        """Initialize the Anthropic client"""
+    def __init__(self, base_url=MODEL_BASE_URL):
+        """Initialize the Anthropic client
+
+        Args:
+            base_url (str, optional): Messages API endpoint to use instead of
+                the live API, e.g. the local mock server for load tests
+        """
         # Set up SSL certificates
         
         os.environ['SSL_CERT_FILE'] = certifi.where()
         print(f"API Key loaded: {'*****' + ANTHROPIC_API_KEY[-4:] if ANTHROPIC_API_KEY else 'None'}")
-        self.client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+        api_key = ANTHROPIC_API_KEY
+        if base_url:
+            logger.info(f"Sending model calls to {base_url}")
+            # A mock endpoint does not check the key, but the SDK requires one
+            api_key = api_key or "mock-key"
+        # Retries are handled by the shared rate governor, not the SDK
+        self.client = anthropic.Anthropic(
+            api_key=api_key, base_url=base_url, max_retries=0
+        )
+        # Used by the ASGI server so a model call does not hold a thread
+        self.async_client = anthropic.AsyncAnthropic(
+            api_key=api_key, base_url=base_url, max_retries=0
+        )
+        self.rate_governor = rate_governor
         self.model = ANTHROPIC_MODEL
         self.max_tokens = MAX_TOKENS
         self.system_prompt = SYSTEM_PROMPT
@@ -24,25 +52,143 @@ class AnthropicService:
         """Return the initialized client"""
         return self.client
 
-    def create_message(self, messages, tools=None):
-        """Create a non-streaming message"""
-        try:
-            return self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                system=self.system_prompt,
-                messages=messages,
-                tools=tools,
-            )
-        except anthropic.APIConnectionError as e:
+    def _build_request(self, messages, tools=None, system=None, max_tokens=None, model=None):
+        """Assemble the keyword arguments for a Messages API call
+
+        With the persona prompt, the tool definitions and the static system
+        prompt form a stable prefix that ends in a cache breakpoint; the
+        date/location context is sent after it so it does not invalidate
+        the cache.
+        """
+        use_persona = system is None
+        if use_persona:
+            static_block = {"type": "text", "text": self.system_prompt}
+            if PROMPT_CACHING:
+                static_block["cache_control"] = {"type": "ephemeral"}
+            system = [static_block, {"type": "text", "text": get_system_context()}]
+
+        request = {
+            "model": model or self.model,
+            "max_tokens": max_tokens or self.max_tokens,
+            "system": system,
+            "messages": messages,
+        }
+        if tools:
+            request["tools"] = tools
+            if PROMPT_CACHING and use_persona:
+                # Tools precede the system prompt in the cached prefix
+                request["tools"] = tools[:-1] + [
+                    {**tools[-1], "cache_control": {"type": "ephemeral"}}
+                ]
+        return request
+
+    def _log_usage(self, usage):
+        """Log token usage, including prompt cache reads and writes"""
+        logger.info(
+            f"Usage: input={usage.input_tokens} output={usage.output_tokens} "
+            f"cache_read={getattr(usage, 'cache_read_input_tokens', None) or 0} "
+            f"cache_write={getattr(usage, 'cache_creation_input_tokens', None) or 0}"
+        )
+
+    def _log_api_error(self, e):
+        """Log an Anthropic API error before it is re-raised"""
+        if isinstance(e, anthropic.APIConnectionError):
             logger.error("The server could not be reached")
             logger.error(f"Cause: {e.__cause__}")  # an underlying Exception, likely raised within httpx.
-            raise
-        except anthropic.RateLimitError as e:
+        elif isinstance(e, anthropic.RateLimitError):
             logger.error("A 429 status code was received; we should back off a bit.")
-            raise
-        except anthropic.APIStatusError as e:
+        elif isinstance(e, anthropic.APIStatusError):
             logger.error("Another non-200-range status code was received")
             logger.error(f"Status code: {e.status_code}")
             logger.error(f"Response: {e.response}")
-            raise
\ No newline at end of file
+
+    def create_message(self, messages, tools=None, system=None, max_tokens=None, model=None):
+        """Create a non-streaming message
+
+        system and max_tokens override the Tagore persona prompt and the
+        default token limit, e.g. for internal summarization calls; model
+        overrides ANTHROPIC_MODEL, e.g. with the model router's pick. Calls
+        are throttled and retried by the shared rate governor and raise
+        DeadlineExceeded if they cannot finish in time.
+        """
+        request = self._build_request(messages, tools, system, max_tokens, model)
+
+        try:
+            response = self.rate_governor.call(self.client.messages.create, request)
+        except (anthropic.APIConnectionError, anthropic.APIStatusError) as e:
+            self._log_api_error(e)
+            raise
+        except DeadlineExceeded as e:
+            logger.error(f"Model call abandoned: {e}")
+            raise
+
+        self._log_usage(response.usage)
+        return response
+
+    async def acreate_message(
+        self, messages, tools=None, system=None, max_tokens=None, model=None
+    ):
+        """Async variant of create_message, awaiting the model on the event loop"""
+        request = self._build_request(messages, tools, system, max_tokens, model)
+
+        try:
+            response = await self.rate_governor.acall(
+                self.async_client.messages.create, request
+            )
+        except (anthropic.APIConnectionError, anthropic.APIStatusError) as e:
+            self._log_api_error(e)
+            raise
+        except DeadlineExceeded as e:
+            logger.error(f"Model call abandoned: {e}")
+            raise
+
+        self._log_usage(response.usage)
+        return response
+
+    def stream_message(self, messages, tools=None, system=None, max_tokens=None, model=None):
+        """Create a streaming message, yielding events as they arrive
+
+        Yields the SDK's stream events: "text" events carry text deltas and
+        "content_block_stop" events carry each finished block, including
+        complete tool_use blocks with their parsed input. The closing
+        "message_stop" event carries the complete message with its usage.
+        """
+        request = self._build_request(messages, tools, system, max_tokens, model)
+        governor = self.rate_governor
+        deadline = governor.start()
+        estimated_tokens = governor.estimate_tokens(request)
+        attempt = 0
+
+        while True:
+            try:
+                time.sleep(governor.throttle(estimated_tokens, deadline))
+            except DeadlineExceeded as e:
+                logger.error(f"Model call abandoned: {e}")
+                raise
+
+            attempt += 1
+            streaming = False
+            try:
+                with self.client.messages.stream(
+                    **request, timeout=max(deadline - time.monotonic(), 0.001)
+                ) as stream:
+                    for event in stream:
+                        streaming = True
+                        yield event
+                    final_message = stream.get_final_message()
+            except (anthropic.APIConnectionError, anthropic.APIStatusError) as e:
+                # Only retry before any event has reached the caller
+                try:
+                    delay = None if streaming else governor.retry_delay(e, attempt, deadline)
+                except DeadlineExceeded as deadline_error:
+                    logger.error(f"Model call abandoned: {deadline_error}")
+                    raise
+                if delay is None:
+                    self._log_api_error(e)
+                    raise
+                time.sleep(delay)
+                continue
+
+            governor.record_usage(estimated_tokens, final_message.usage)
+            self._log_usage(final_message.usage)
+            return
@@ -0,0 +1,211 @@
+import logging
+from db import get_conversation_summary, run_in_executor, save_conversation_summary
+from config import HISTORY_TOKEN_BUDGET, HISTORY_TARGET_RATIO, SUMMARY_MAX_TOKENS
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a conversation between a user and Rabindranath Tagore.
+Update the existing summary with the new messages. Keep names, works discussed, questions asked and anything the user shared about themselves.
+Write plain prose in the third person, under 200 words. Return only the summary."""
+
+
+def estimate_tokens(text):
+    """Cheap token estimate for budgeting (no tokenizer round trip)"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_messages_tokens(messages):
+    """Estimated tokens for a list of {"role", "content"} messages"""
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+def select_window_start(
+    messages, covered, budget=HISTORY_TOKEN_BUDGET, target_ratio=HISTORY_TARGET_RATIO
+):
+    """
+    Choose how many leading messages should be covered by the summary
+
+    The split only moves forward, and only once the unsummarized messages
+    exceed the budget. It then moves far enough that the recent window drops
+    to budget * target_ratio, and always lands on a user message so the
+    window is a valid Messages API history.
+
+    Args:
+        messages (list): Full conversation history, oldest first
+        covered (int): Messages already covered by the stored summary
+        budget (int): Token budget for the recent window
+        target_ratio (float): Fraction of the budget to shrink back to
+
+    Returns:
+        int: Index of the first message kept verbatim
+    """
+    if estimate_messages_tokens(messages[covered:]) <= budget:
+        return covered
+
+    target = budget * target_ratio
+    kept_tokens = 0
+    start = len(messages)
+    # Walk back from the newest message while the window fits the target
+    for index in range(len(messages) - 1, covered - 1, -1):
+        kept_tokens += estimate_tokens(messages[index]["content"])
+        if kept_tokens > target and start < len(messages):
+            break
+        if messages[index]["role"] == "user":
+            start = index
+
+    if start == len(messages):
+        return covered
+
+    # Never drop the latest user message, even if it alone exceeds the target
+    return max(start, covered)
+
+
+class HistoryService:
+    def __init__(self, anthropic_service):
+        """Initialize the history service"""
+        self.anthropic_service = anthropic_service
+
+    def build_window(self, conversation_id, messages):
+        """
+        Reduce a conversation history to a summary plus the most recent turns
+
+        Args:
+            conversation_id (str): The conversation ID
+            messages (list): Full conversation history, oldest first
+
+        Returns:
+            list: Messages to send to the model
+        """
+        plan = self.plan_window(conversation_id, messages)
+        new_summary = None
+        if plan["start"] > plan["covered"]:
+            new_summary = self._summarize(
+                plan["summary"], messages[plan["covered"] : plan["start"]]
+            )
+        return self.apply_window(conversation_id, messages, plan, new_summary)
+
+    async def abuild_window(self, conversation_id, messages):
+        """
+        Async variant of build_window for the ASGI server
+
+        The summary is read and saved on the database executor, while the
+        summarization call, which can take seconds, is awaited on the event
+        loop instead of holding an executor thread.
+        """
+        plan = await run_in_executor(self.plan_window, conversation_id, messages)
+        new_summary = None
+        if plan["start"] > plan["covered"]:
+            new_summary = await self._asummarize(
+                plan["summary"], messages[plan["covered"] : plan["start"]]
+            )
+        return await run_in_executor(
+            self.apply_window, conversation_id, messages, plan, new_summary
+        )
+
+    def plan_window(self, conversation_id, messages):
+        """
+        Read the stored summary and choose where the recent window starts
+
+        Returns:
+            dict: {"summary", "covered", "start"}; the messages from covered
+                up to start need folding into the summary
+        """
+        summary_record = get_conversation_summary(conversation_id)
+        summary = summary_record["summary"] if summary_record else ""
+        covered = summary_record["covered_messages"] if summary_record else 0
+        # The stored summary may be ahead of a truncated history
+        covered = max(min(covered, len(messages) - 1), 0)
+
+        return {
+            "summary": summary,
+            "covered": covered,
+            "start": select_window_start(messages, covered),
+        }
+
+    def apply_window(self, conversation_id, messages, plan, new_summary):
+        """
+        Save a new summary, if there is one, and build the window of plan
+
+        Args:
+            plan (dict): The result of plan_window
+            new_summary (str): The summary up to plan["start"], or None if
+                none was needed or summarizing failed
+
+        Returns:
+            list: Messages to send to the model
+        """
+        summary = plan["summary"]
+        covered = plan["covered"]
+        if new_summary is not None:
+            summary = new_summary
+            save_conversation_summary(conversation_id, summary, plan["start"])
+            covered = plan["start"]
+
+        window = [dict(message) for message in messages[covered:]]
+        if summary and window:
+            window[0]["content"] = (
+                f"[Summary of our earlier conversation: {summary}]\n\n"
+                f"{window[0]['content']}"
+            )
+
+        full_tokens = estimate_messages_tokens(messages)
+        window_tokens = estimate_messages_tokens(window)
+        logger.info(
+            f"History window: {len(window)}/{len(messages)} messages, "
+            f"~{window_tokens}/{full_tokens} input tokens "
+            f"(saved ~{full_tokens - window_tokens})"
+        )
+
+        return window
+
+    @staticmethod
+    def _summary_request(previous_summary, new_messages):
+        """The messages asking the model to fold new_messages into the summary"""
+        transcript = "\n".join(
+            f"{message['role'].capitalize()}: {message['content']}"
+            for message in new_messages
+        )
+        prompt = (
+            f"Existing summary:\n{previous_summary or '(none)'}\n\n"
+            f"New messages:\n{transcript}"
+        )
+        return [{"role": "user", "content": prompt}]
+
+    @staticmethod
+    def _summary_text(response):
+        return "".join(
+            block.text for block in response.content if block.type == "text"
+        ).strip()
+
+    def _summarize(self, previous_summary, new_messages):
+        """Fold new_messages into previous_summary; returns None on failure"""
+        try:
+            response = self.anthropic_service.create_message(
+                self._summary_request(previous_summary, new_messages),
+                system=SUMMARY_SYSTEM_PROMPT,
+                max_tokens=SUMMARY_MAX_TOKENS,
+            )
+        except Exception as e:
+            logger.error(f"Error summarizing conversation history: {str(e)}")
+            return None
+
+        return self._summary_text(response)
+
+    async def _asummarize(self, previous_summary, new_messages):
+        """Async variant of _summarize"""
+        try:
+            response = await self.anthropic_service.acreate_message(
+                self._summary_request(previous_summary, new_messages),
+                system=SUMMARY_SYSTEM_PROMPT,
+                max_tokens=SUMMARY_MAX_TOKENS,
+            )
+        except Exception as e:
+            logger.error(f"Error summarizing conversation history: {str(e)}")
+            return None
+
+        return self._summary_text(response)
@@ -1,8 +1,19 @@
 import json
 import logging
+import time
 import traceback
-from db import add_message, add_tool_call, init_db
+from db import add_message, add_tool_call, init_db, run_in_executor
 from services.anthropic_service import AnthropicService
+from services.model_router import model_router
+from services.tool_loop import (
+    ToolLoopBudget,
+    assistant_message,
+    run_tools,
+    tool_result,
+    tool_results_message,
+)
+from services.tool_memo import tool_memo
+from services.usage_service import TurnUsage
 from tools.inventory_tools import (
     LIST_ITEMS_TOOL,
     GET_ITEM_DETAILS_TOOL,
@@ -33,6 +44,12 @@ INVENTORY_TOOLS = [
     TRANSACTION_TOOL
 ]
 
+# Tools that only read the inventory and may run alongside each other; the
+# others write and run one at a time, in the order the model asked for them
+READ_ONLY_INVENTORY_TOOLS = frozenset(
+    {LIST_ITEMS_TOOL["name"], GET_ITEM_DETAILS_TOOL["name"]}
+)
+
 class InventoryService:
     def __init__(self):
         """Initialize the inventory service"""
@@ -43,6 +60,10 @@ class InventoryService:
     def process_inventory_query(self, user_message, conversation_id):
         """
         Process an inventory-related query using Claude API with tool support
+
+        Tool results are sent back to the model, so one query can chain
+        lookups and updates (e.g. check stock, then restock the low items)
+        within the tool loop's step and time budget.
         
         Args:
             user_message (str): The message from the user
@@ -51,14 +72,10 @@ class InventoryService:
         Returns:
             tuple: (response_text, speakable_chunks)
         """
-        conversation_id, user_message_id = add_message(
-            conversation_id, "user", user_message
-        )
-        logger.info(
-            f"\n--- New inventory query in conversation_id {conversation_id} user_message_id {user_message_id} ---"
+        conversation_id, user_message_id = self._record_query(
+            user_message, conversation_id
         )
-        logger.info(f"User: {user_message}")
-        
+
         # Create system prompt for inventory management
         system_prompt = """You are Tagore's Inventory Assistant, a helpful and knowledgeable assistant who helps manage a store's inventory.
 
@@ -81,38 +98,147 @@ Be helpful, concise and professional.
         ]
         
         # Call Claude with inventory tools
-        response = self.anthropic_service.create_message(messages, INVENTORY_TOOLS)
-        
-        # Process the response and handle any tool calls
-        full_response = ""
-        history_response = ""
-        speakable_chunks = []
-        
+        routing = model_router.choose("inventory", user_message)
+        usage = TurnUsage("inventory", routing.rule)
+        budget = ToolLoopBudget()
+        reply = {"full_response": "", "history_response": "", "speakable_chunks": []}
+
+        while budget.next_step():
+            started = time.perf_counter()
+            response = self.anthropic_service.create_message(
+                messages, INVENTORY_TOOLS, model=routing.model
+            )
+            usage.add_response(response, time.perf_counter() - started)
+
+            results = self._process_response(
+                response, conversation_id, user_message_id, usage, reply
+            )
+            if not results or response.stop_reason != "tool_use":
+                break
+            messages = messages + [
+                assistant_message(response.content),
+                tool_results_message(results),
+            ]
+
+        return self._save_reply(conversation_id, reply, usage)
+
+    async def aprocess_inventory_query(self, user_message, conversation_id):
+        """
+        Async variant of process_inventory_query for the ASGI server
+
+        Args:
+            user_message (str): The message from the user
+            conversation_id (str): The conversation ID
+
+        Returns:
+            tuple: (response_text, speakable_chunks)
+        """
+        conversation_id, user_message_id = await run_in_executor(
+            self._record_query, user_message, conversation_id
+        )
+
+        messages = [
+            {"role": "user", "content": user_message}
+        ]
+
+        routing = model_router.choose("inventory", user_message)
+        usage = TurnUsage("inventory", routing.rule)
+        budget = ToolLoopBudget()
+        reply = {"full_response": "", "history_response": "", "speakable_chunks": []}
+
+        while budget.next_step():
+            started = time.perf_counter()
+            response = await self.anthropic_service.acreate_message(
+                messages, INVENTORY_TOOLS, model=routing.model
+            )
+            usage.add_response(response, time.perf_counter() - started)
+
+            results = await run_in_executor(
+                self._process_response,
+                response,
+                conversation_id,
+                user_message_id,
+                usage,
+                reply,
+            )
+            if not results or response.stop_reason != "tool_use":
+                break
+            messages = messages + [
+                assistant_message(response.content),
+                tool_results_message(results),
+            ]
+
+        return await run_in_executor(self._save_reply, conversation_id, reply, usage)
+
+    def _record_query(self, user_message, conversation_id):
+        """Store the user's inventory query, returning (conversation_id, user_message_id)"""
+        conversation_id, user_message_id = add_message(
+            conversation_id, "user", user_message
+        )
+        logger.info(
+            f"\n--- New inventory query in conversation_id {conversation_id} user_message_id {user_message_id} ---"
+        )
+        logger.info(f"User: {user_message}")
+        return conversation_id, user_message_id
+
+    def _process_response(self, response, conversation_id, user_message_id, usage, reply):
+        """
+        Add one model response to the reply, running its inventory tool
+        calls (the read-only ones concurrently when there are several)
+
+        Args:
+            reply (dict): The query's full_response, history_response and
+                speakable_chunks, updated in place
+
+        Returns:
+            list: The tool result dicts, to be sent back to the model
+        """
+        tool_uses = [block for block in response.content if block.type == "tool_use"]
+        results = run_tools(
+            lambda tool_use: self._handle_inventory_tool_call(
+                tool_use, conversation_id, user_message_id, usage
+            ),
+            tool_uses,
+            READ_ONLY_INVENTORY_TOOLS,
+        )
+        results_by_id = {result["tool_use_id"]: result for result in results}
+
         for content_block in response.content:
             if content_block.type == "text":
                 text_content = content_block.text
-                full_response += text_content
-                history_response += text_content
-                speakable_chunks.append({"text": text_content, "speakable": True})
+                reply["full_response"] += text_content
+                reply["history_response"] += text_content
+                reply["speakable_chunks"].append({"text": text_content, "speakable": True})
             elif content_block.type == "tool_use":
-                # Process the tool call and capture the results
-                tool_results = self._handle_inventory_tool_call(
-                    content_block, conversation_id, user_message_id
-                )
-                
-                for result in tool_results:
-                    full_response += result["content"]
-                    if result.get("speakable", False):
-                        speakable_chunks.append({
-                            "text": result["content"],
+                # Add the tool's formatted output to the reply
+                for chunk in results_by_id[content_block.id]["chunks"]:
+                    reply["full_response"] += chunk["content"]
+                    if chunk.get("speakable", False):
+                        reply["speakable_chunks"].append({
+                            "text": chunk["content"],
                             "speakable": True
                         })
                 
-                history_response += f"\n\n[Note: Used tool '{content_block.name}' for inventory management]"
+                reply["history_response"] += f"\n\n[Note: Used tool '{content_block.name}' for inventory management]"
+        
+        return results
+
+    def _save_reply(self, conversation_id, reply, usage):
+        """
+        Save the assistant reply along with the query's usage metrics
+
+        Returns:
+            tuple: (response_text, speakable_chunks)
+        """
+        full_response = reply["full_response"]
         
         # Save the complete response
         conversation_id, assistant_message_id = add_message(
-            conversation_id, "assistant", history_response
+            conversation_id,
+            "assistant",
+            reply["history_response"],
+            wait=False,
+            metrics=usage.as_metrics(),
         )
         
         logger.info(f"\n--- Complete assistant response ---")
@@ -122,10 +248,10 @@ Be helpful, concise and professional.
             else f"Assistant (full): {full_response}"
         )
         
-        return full_response, speakable_chunks
+        return full_response, reply["speakable_chunks"]
     
-    def _handle_inventory_tool_call(self, tool_use, conversation_id, user_message_id):
-        """Handle an inventory tool call and return the results"""
+    def _handle_inventory_tool_call(self, tool_use, conversation_id, user_message_id, usage):
+        """Handle an inventory tool call and return its tool result dict"""
         tool_name = tool_use.name
         tool_params = tool_use.input
         
@@ -140,30 +266,41 @@ Be helpful, concise and professional.
         
         try:
             if tool_name in tool_handlers:
-                return list(tool_handlers[tool_name](tool_use, conversation_id, user_message_id))
+                tool_response, tool_response_json, chunks = tool_handlers[tool_name](
+                    tool_use, conversation_id, user_message_id, usage
+                )
+                return tool_result(
+                    tool_use,
+                    tool_response_json,
+                    chunks,
+                    is_error=not tool_response.get("success", False),
+                )
             else:
                 # Handle unknown tool
                 logger.error(f"Unknown inventory tool '{tool_name}' called")
-                return [{
+                return tool_result(tool_use, f"Unknown tool '{tool_name}'", [{
                     "type": "chunk",
                     "content": f"\n\nI tried to use an inventory tool that isn't available ({tool_name}). Please contact support.\n\n",
                     "speakable": True
-                }]
+                }], is_error=True)
         except Exception as e:
             logger.error(f"Error executing inventory tool {tool_name}: {str(e)}")
             logger.error(traceback.format_exc())
-            return [{
+            return tool_result(tool_use, f"Error executing {tool_name}: {str(e)}", [{
                 "type": "chunk",
                 "content": f"\n\nI encountered an error while trying to use the {tool_name} tool: {str(e)}\n\n",
                 "speakable": True
-            }]
+            }], is_error=True)
     
-    def _handle_list_items(self, tool_use, conversation_id, user_message_id):
-        """Handle the list_items tool"""
+    def _handle_list_items(self, tool_use, conversation_id, user_message_id, usage):
+        """Handle the list_items tool, returning (tool_response, response_json, chunks)"""
         tool_params = tool_use.input
         
         # Execute the tool
+        started = time.perf_counter()
         tool_response = list_items(tool_params)
+        duration = time.perf_counter() - started
+        usage.add_tool("list_items", duration, tool_params)
         
         logger.info(f"Tool Response (list_items): {json.dumps(tool_response, indent=2)[:500]}...")
         
@@ -177,22 +314,34 @@ Be helpful, concise and professional.
             "list_items",
             tool_params_json,
             tool_response_json,
+            wait=False,
+            duration_ms=round(duration * 1000),
         )
         
-        return format_inventory_response(tool_response)
+        return tool_response, tool_response_json, format_inventory_response(tool_response)
     
-    def _handle_get_item_details(self, tool_use, conversation_id, user_message_id):
-        """Handle the get_item_details tool"""
+    def _handle_get_item_details(self, tool_use, conversation_id, user_message_id, usage):
+        """Handle the get_item_details tool, returning (tool_response, response_json, chunks)"""
         tool_params = tool_use.input
         
-        # Execute the tool
-        tool_response = get_item(tool_params)
+        # Execute the tool, or reuse this conversation's earlier lookup if
+        # the inventory has not been written since
+        started = time.perf_counter()
+        tool_response, tool_response_json, memo_hit = tool_memo.call(
+            conversation_id, "get_item_details", tool_params, get_item
+        )
+        duration = time.perf_counter() - started
+        usage.add_tool("get_item_details", duration, tool_params, memo_hit=memo_hit)
         
-        logger.info(f"Tool Response (get_item_details): {json.dumps(tool_response, indent=2)}")
+        if memo_hit:
+            # Already stored in tool_calls by the earlier turn
+            logger.info("Tool Response (get_item_details) served from memo")
+            return tool_response, tool_response_json, format_inventory_response(tool_response)
+        
+        logger.info(f"Tool Response (get_item_details): {tool_response_json}")
         
         # Store the tool call
         tool_params_json = json.dumps(tool_params) if tool_params else "{}"
-        tool_response_json = json.dumps(tool_response)
         
         add_tool_call(
             conversation_id,
@@ -200,16 +349,21 @@ Be helpful, concise and professional.
             "get_item_details",
             tool_params_json,
             tool_response_json,
+            wait=False,
+            duration_ms=round(duration * 1000),
         )
         
-        return format_inventory_response(tool_response)
+        return tool_response, tool_response_json, format_inventory_response(tool_response)
     
-    def _handle_create_item(self, tool_use, conversation_id, user_message_id):
-        """Handle the create_item tool"""
+    def _handle_create_item(self, tool_use, conversation_id, user_message_id, usage):
+        """Handle the create_item tool, returning (tool_response, response_json, chunks)"""
         tool_params = tool_use.input
         
         # Execute the tool
+        started = time.perf_counter()
         tool_response = create_item(tool_params)
+        duration = time.perf_counter() - started
+        usage.add_tool("create_item", duration, tool_params)
         
         logger.info(f"Tool Response (create_item): {json.dumps(tool_response, indent=2)}")
         
@@ -223,16 +377,21 @@ Be helpful, concise and professional.
             "create_item",
             tool_params_json,
             tool_response_json,
+            wait=False,
+            duration_ms=round(duration * 1000),
         )
         
-        return format_inventory_response(tool_response)
+        return tool_response, tool_response_json, format_inventory_response(tool_response)
     
-    def _handle_update_item(self, tool_use, conversation_id, user_message_id):
-        """Handle the update_item tool"""
+    def _handle_update_item(self, tool_use, conversation_id, user_message_id, usage):
+        """Handle the update_item tool, returning (tool_response, response_json, chunks)"""
         tool_params = tool_use.input
         
         # Execute the tool
+        started = time.perf_counter()
         tool_response = update_item(tool_params)
+        duration = time.perf_counter() - started
+        usage.add_tool("update_item", duration, tool_params)
         
         logger.info(f"Tool Response (update_item): {json.dumps(tool_response, indent=2)}")
         
@@ -246,16 +405,21 @@ Be helpful, concise and professional.
             "update_item",
             tool_params_json,
             tool_response_json,
+            wait=False,
+            duration_ms=round(duration * 1000),
         )
         
-        return format_inventory_response(tool_response)
+        return tool_response, tool_response_json, format_inventory_response(tool_response)
     
-    def _handle_record_transaction(self, tool_use, conversation_id, user_message_id):
-        """Handle the record_transaction tool"""
+    def _handle_record_transaction(self, tool_use, conversation_id, user_message_id, usage):
+        """Handle the record_transaction tool, returning (tool_response, response_json, chunks)"""
         tool_params = tool_use.input
         
         # Execute the tool
+        started = time.perf_counter()
         tool_response = record_transaction(tool_params)
+        duration = time.perf_counter() - started
+        usage.add_tool("record_transaction", duration, tool_params)
         
         logger.info(f"Tool Response (record_transaction): {json.dumps(tool_response, indent=2)}")
         
@@ -269,9 +433,11 @@ Be helpful, concise and professional.
             "record_transaction",
             tool_params_json,
             tool_response_json,
+            wait=False,
+            duration_ms=round(duration * 1000),
         )
         
-        return format_inventory_response(tool_response)
+        return tool_response, tool_response_json, format_inventory_response(tool_response)
     
     def initialize_sample_inventory(self):
         """Initialize a sample inventory with some basic items"""
@@ -0,0 +1,131 @@
+import logging
+import re
+import threading
+from config import (
+    MODEL_ROUTING,
+    MODEL_ROUTING_RULES,
+    MODEL_TIERS,
+    ROUTE_MODEL_DEFAULTS,
+)
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Words that suggest the user wants a work read out or listed, i.e. that the
+# turn will mostly be a list_works / get_work_content call
+CATALOG_HINTS = re.compile(
+    r"\b(read|recite|poems?|poetry|stor(y|ies)|songs?|gitanjali|verses?|"
+    r"works|writings|novels?|plays?|essays?|collections?|chapters?|part)\b",
+    re.IGNORECASE,
+)
+
+
+class RoutingDecision:
+    """The model picked for a turn and the rule that picked it"""
+
+    def __init__(self, tier, model, rule):
+        self.tier = tier
+        self.model = model
+        self.rule = rule
+
+    def __repr__(self):
+        return f"RoutingDecision({self.tier}, {self.model}, {self.rule})"
+
+
+class ModelRouter:
+    """
+    Picks the fast or the deep model for a turn from cheap request features
+
+    The features are the user message length, the conversation depth and
+    whether a catalog tool is likely needed; the rules and per-route
+    defaults come from config (MODEL_ROUTING_RULES, ROUTE_MODEL_DEFAULTS).
+    """
+
+    def __init__(
+        self,
+        rules=MODEL_ROUTING_RULES,
+        route_defaults=ROUTE_MODEL_DEFAULTS,
+        tiers=MODEL_TIERS,
+        enabled=MODEL_ROUTING,
+    ):
+        self.rules = rules
+        self.route_defaults = route_defaults
+        self.tiers = tiers
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"decisions": 0, "by_tier": {}, "by_rule": {}}
+
+    def stats(self):
+        """Routing counters since the last reset"""
+        with self._lock:
+            return {
+                "decisions": self._stats["decisions"],
+                "by_tier": dict(self._stats["by_tier"]),
+                "by_rule": dict(self._stats["by_rule"]),
+            }
+
+    def features(self, user_message, depth):
+        """The request features the rules are matched against"""
+        return {
+            "chars": len(user_message or ""),
+            "depth": depth,
+            "catalog_tool": bool(CATALOG_HINTS.search(user_message or "")),
+        }
+
+    def _matches(self, rule, route, features):
+        if "routes" in rule and route not in rule["routes"]:
+            return False
+        if "max_chars" in rule and features["chars"] > rule["max_chars"]:
+            return False
+        if "max_depth" in rule and features["depth"] > rule["max_depth"]:
+            return False
+        if "catalog_tool" in rule and features["catalog_tool"] != rule["catalog_tool"]:
+            return False
+        return True
+
+    def choose(self, route, user_message, depth=1):
+        """
+        Pick the model for one turn
+
+        Args:
+            route (str): The calling route, e.g. "chat" or "inventory"
+            user_message (str): The new user message
+            depth (int): Messages in the conversation so far, this one included
+
+        Returns:
+            RoutingDecision: tier, model id and the name of the deciding rule
+                ("default" for the route default, "disabled" when routing
+                is off)
+        """
+        tier = self.route_defaults.get(route, "deep")
+        rule_name = "default"
+
+        if not self.enabled:
+            tier, rule_name = "deep", "disabled"
+        else:
+            features = self.features(user_message, depth)
+            for rule in self.rules:
+                if self._matches(rule, route, features):
+                    tier = rule["model"]
+                    rule_name = rule.get("name", tier)
+                    break
+
+        decision = RoutingDecision(tier, self.tiers[tier], rule_name)
+        logger.info(f"Routing {route} turn to {decision.model} ({rule_name})")
+
+        with self._lock:
+            self._stats["decisions"] += 1
+            self._stats["by_tier"][tier] = self._stats["by_tier"].get(tier, 0) + 1
+            self._stats["by_rule"][rule_name] = self._stats["by_rule"].get(rule_name, 0) + 1
+
+        return decision
+
+
+# Shared by all services
+model_router = ModelRouter()
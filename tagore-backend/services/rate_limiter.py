@@ -0,0 +1,314 @@
+import asyncio
+import email.utils
+import json
+import logging
+import random
+import threading
+import time
+import anthropic  # type: ignore
+from config import (
+    MODEL_REQUEST_DEADLINE,
+    RATE_LIMIT_REQUESTS_PER_MINUTE,
+    RATE_LIMIT_TOKENS_PER_MINUTE,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY,
+)
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: timeouts, lock conflicts, rate limits,
+# server errors and 529 (overloaded)
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class DeadlineExceeded(Exception):
+    """A model call could not be completed within its deadline"""
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket refilled continuously at a per-minute rate
+
+    reserve() always takes the tokens, letting the balance go negative, and
+    returns how long the caller must wait. Concurrent callers therefore
+    queue in arrival order instead of racing for the next refill.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Take amount from the bucket and return the seconds to wait before using it"""
+        if self.capacity <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            # A request bigger than the bucket waits for a full bucket at most
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount):
+        """Give back tokens from a reservation that was not used (or over-estimated)"""
+        if self.capacity <= 0:
+            return
+
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateGovernor:
+    """
+    Client-side rate limiting and retries for Messages API calls
+
+    Every attempt first reserves one request and its estimated input tokens
+    from two token buckets, sleeping if the buckets are empty. Retryable
+    failures (429, 529, 5xx, connection errors) are retried with
+    exponential backoff and full jitter, honoring retry-after headers. All
+    waiting is bounded by a per-call deadline; a call that cannot finish in
+    time raises DeadlineExceeded.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=RATE_LIMIT_REQUESTS_PER_MINUTE,
+        tokens_per_minute=RATE_LIMIT_TOKENS_PER_MINUTE,
+        max_attempts=RETRY_MAX_ATTEMPTS,
+        base_delay=RETRY_BASE_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+        deadline=MODEL_REQUEST_DEADLINE,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.retries_by_reason = {}
+        self.throttle_waits = 0
+        self.throttle_wait_seconds = 0.0
+        self.backoff_wait_seconds = 0.0
+        self.deadline_exceeded = 0
+        self.failures = 0
+
+    def reset_stats(self):
+        with self._lock:
+            self._reset_counters()
+
+    def stats(self):
+        """Return call, retry and wait counters"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "retries_by_reason": dict(self.retries_by_reason),
+                "throttle_waits": self.throttle_waits,
+                "throttle_wait_seconds": round(self.throttle_wait_seconds, 3),
+                "backoff_wait_seconds": round(self.backoff_wait_seconds, 3),
+                "deadline_exceeded": self.deadline_exceeded,
+                "failures": self.failures,
+            }
+
+    @staticmethod
+    def estimate_tokens(request):
+        """Estimate the input tokens of a request (~4 characters per token)"""
+        payload = [request.get("system"), request.get("tools"), request.get("messages")]
+        return len(json.dumps(payload, default=str)) // 4
+
+    def record_usage(self, estimated_tokens, usage):
+        """Correct the token bucket with the real input token count of a response"""
+        actual = usage.input_tokens + (
+            getattr(usage, "cache_creation_input_tokens", None) or 0
+        )
+        self.token_bucket.refund(estimated_tokens - actual)
+
+    def start(self):
+        """Begin a governed call, returning its deadline (time.monotonic())"""
+        with self._lock:
+            self.calls += 1
+        return time.monotonic() + self.deadline
+
+    def throttle(self, estimated_tokens, deadline):
+        """
+        Reserve capacity for one attempt
+
+        Returns:
+            float: Seconds to wait before sending the attempt
+
+        Raises:
+            DeadlineExceeded: If the wait would run past the deadline
+        """
+        wait = max(
+            self.request_bucket.reserve(1),
+            self.token_bucket.reserve(estimated_tokens),
+        )
+        if wait > deadline - time.monotonic():
+            self.request_bucket.refund(1)
+            self.token_bucket.refund(estimated_tokens)
+            self._count_deadline_exceeded()
+            raise DeadlineExceeded(
+                f"Rate limit queue wait of {wait:.1f}s exceeds the request deadline"
+            )
+
+        with self._lock:
+            self.attempts += 1
+            if wait > 0:
+                self.throttle_waits += 1
+                self.throttle_wait_seconds += wait
+        return wait
+
+    def retry_delay(self, error, attempt, deadline):
+        """
+        Decide whether a failed attempt should be retried
+
+        Args:
+            error (Exception): The error raised by the attempt
+            attempt (int): Number of attempts made so far (1 for the first)
+            deadline (float): The call's deadline (time.monotonic())
+
+        Returns:
+            float or None: Seconds to sleep before retrying, or None if the
+            error should be raised to the caller
+
+        Raises:
+            DeadlineExceeded: If the backoff would run past the deadline
+        """
+        reason = self._retry_reason(error)
+        if reason is None or attempt >= self.max_attempts:
+            with self._lock:
+                self.failures += 1
+            return None
+
+        # Full jitter keeps a burst of failed callers from retrying in lockstep
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        if delay > deadline - time.monotonic():
+            self._count_deadline_exceeded()
+            raise DeadlineExceeded(
+                f"Retrying after {reason} would exceed the request deadline"
+            ) from error
+
+        with self._lock:
+            self.retries += 1
+            self.retries_by_reason[reason] = self.retries_by_reason.get(reason, 0) + 1
+            self.backoff_wait_seconds += delay
+
+        logger.warning(
+            f"Model call failed ({reason}), retry {attempt} in {delay:.2f}s"
+        )
+        return delay
+
+    def call(self, func, request):
+        """Call func(**request, timeout=...) under the rate limits and retry policy"""
+        deadline = self.start()
+        estimated_tokens = self.estimate_tokens(request)
+        attempt = 0
+
+        while True:
+            time.sleep(self.throttle(estimated_tokens, deadline))
+            attempt += 1
+            try:
+                response = func(**request, timeout=self._remaining(deadline))
+            except Exception as e:
+                delay = self.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+
+            self.record_usage(estimated_tokens, response.usage)
+            return response
+
+    async def acall(self, func, request):
+        """Async variant of call, awaiting func(**request, timeout=...)"""
+        deadline = self.start()
+        estimated_tokens = self.estimate_tokens(request)
+        attempt = 0
+
+        while True:
+            await asyncio.sleep(self.throttle(estimated_tokens, deadline))
+            attempt += 1
+            try:
+                response = await func(**request, timeout=self._remaining(deadline))
+            except Exception as e:
+                delay = self.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+
+            self.record_usage(estimated_tokens, response.usage)
+            return response
+
+    def _remaining(self, deadline):
+        return max(deadline - time.monotonic(), 0.001)
+
+    def _count_deadline_exceeded(self):
+        with self._lock:
+            self.deadline_exceeded += 1
+            self.failures += 1
+
+    @staticmethod
+    def _retry_reason(error):
+        """Return a short label for a retryable error, or None"""
+        if isinstance(error, anthropic.APITimeoutError):
+            return "timeout"
+        if isinstance(error, anthropic.APIConnectionError):
+            return "connection"
+        if isinstance(error, anthropic.APIStatusError):
+            should_retry = error.response.headers.get("x-should-retry")
+            if should_retry == "false":
+                return None
+            if should_retry == "true" or error.status_code in RETRYABLE_STATUS_CODES:
+                return str(error.status_code)
+        return None
+
+    @staticmethod
+    def _retry_after(error):
+        """Read the server's requested delay (retry-after-ms or retry-after) in seconds"""
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+
+        headers = response.headers
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            retry_after = headers.get("retry-after")
+            if not retry_after:
+                return None
+            try:
+                return float(retry_after)
+            except ValueError:
+                # HTTP-date form
+                retry_at = email.utils.parsedate_to_datetime(retry_after)
+                return max(retry_at.timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+# One governor per process: the API limits apply to the key, not to a service
+rate_governor = RateGovernor()
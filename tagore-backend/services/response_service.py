@@ -1,15 +1,43 @@
+import functools
 import json
 import logging
+import re
+import time
 import traceback
-from db import get_messages_by_conversation_id, add_message, add_tool_call, init_db
+from config import TOOL_HISTORY
+from db import (
+    get_messages_by_conversation_id,
+    get_tool_calls_by_turn,
+    add_message,
+    add_tool_call,
+    init_db,
+    run_in_executor,
+)
 from services.anthropic_service import AnthropicService
+from services.history_service import HistoryService
+from services.model_router import model_router
+from services.tool_history import tool_call_key, with_tool_history, with_tool_notes
+from services.tool_loop import (
+    ToolLoopBudget,
+    assistant_message,
+    run_tools,
+    submit_tool,
+    tool_result,
+    tool_results_message,
+)
+from services.tool_memo import tool_memo
+from services.usage_service import TurnUsage
 from tools.tagore_tools import (
     LIST_WORKS_TOOL,
     GET_WORK_CONTENT_TOOL,
+    SEARCH_WORKS_TOOL,
+    INLINE_WORK_PARTS,
     list_works,
     get_work_content,
+    search_works,
     format_works_response,
     format_work_content_response,
+    format_search_response,
 )
 
 logging.basicConfig(
@@ -18,80 +46,202 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # List of available tools (updated with the new tools)
-TOOLS = [LIST_WORKS_TOOL, GET_WORK_CONTENT_TOOL]
+TOOLS = [LIST_WORKS_TOOL, SEARCH_WORKS_TOOL, GET_WORK_CONTENT_TOOL]
+
+# Streamed text is released for speech one complete sentence at a time
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
 
 
 class ResponseService:
     def __init__(self):
         """Initialize the response service"""
         self.anthropic_service = AnthropicService()
+        self.history_service = HistoryService(self.anthropic_service)
         init_db()
 
     def generate_full_response(self, user_message, conversation_id):
         """
         Generate a full response using the Anthropic API with tool support
 
+        Tool results are sent back to the model, which may call further
+        tools, within the tool loop's step and time budget.
+
         Args:
             user_message (str): The message from the user
             conversation_id (str): The conversation ID
 
         Returns:
-            str: The assistant's response
+            tuple: (response_text, speakable_chunks, work_parts) where
+            work_parts lists a cursor into /api/works/<id>/parts for each
+            whole work only partly shown in the reply
         """
-        conversation_id, user_message_id = add_message(
-            conversation_id, "user", user_message
+        conversation_id, user_message_id, messages, routing, usage = self._prepare_messages(
+            user_message, conversation_id, "chat"
         )
-        logger.info(
-            f"\n--- New user message in conversation_id {conversation_id} user_message_id {user_message_id} ---"
-        )
-        logger.info(f"User: {user_message}")
 
-        messages = get_messages_by_conversation_id(conversation_id)
+        logger.info(f"Starting full response with model: {routing.model}")
+        logger.info(f"Messages count: {len(messages)}")
+        logger.info(f"Tools enabled: {[tool['name'] for tool in TOOLS]}")
 
-        # Validate messages
-        if not messages or not isinstance(messages, list) or len(messages) == 0:
-            raise ValueError("No messages found for this conversation")
+        budget = ToolLoopBudget()
+        reply = {
+            "full_response": "",
+            "history_response": "",
+            "speakable_chunks": [],
+            "tools_used": [],
+            "work_parts": [],
+        }
+
+        while budget.next_step():
+            # Pass TOOLS to create_message
+            started = time.perf_counter()
+            response = self.anthropic_service.create_message(
+                messages, TOOLS, model=routing.model
+            )
+            usage.add_response(response, time.perf_counter() - started)
+
+            results = self._process_response(
+                response, conversation_id, user_message_id, usage, reply
+            )
+            if not results or response.stop_reason != "tool_use":
+                break
+            messages = messages + [
+                assistant_message(response.content),
+                tool_results_message(results),
+            ]
+
+        return self._save_reply(conversation_id, reply, usage)
+
+    async def agenerate_full_response(self, user_message, conversation_id):
+        """
+        Async variant of generate_full_response for the ASGI server
 
-        model = self.anthropic_service.model
-        logger.info(f"Starting full response with model: {model}")
+        The model calls are awaited on the event loop; history reads, tool
+        execution and writes are blocking SQLite work and run on the
+        database executor.
+
+        Args:
+            user_message (str): The message from the user
+            conversation_id (str): The conversation ID
+
+        Returns:
+            tuple: (response_text, speakable_chunks, work_parts)
+        """
+        # Only the database work runs on the executor; summarizing an older
+        # part of the history is a model call, awaited here
+        turn = await run_in_executor(self._load_turn, user_message, conversation_id, "chat")
+        conversation_id, user_message_id, messages, routing, usage, tool_calls_by_turn = turn
+        window = await self.history_service.abuild_window(conversation_id, messages)
+        messages = self._with_earlier_tool_calls(messages, window, tool_calls_by_turn)
+
+        logger.info(f"Starting async full response with model: {routing.model}")
         logger.info(f"Messages count: {len(messages)}")
-        logger.info(f"Tools enabled: {[tool['name'] for tool in TOOLS]}")
 
-        # Pass TOOLS to create_message
-        response = self.anthropic_service.create_message(messages, TOOLS)
+        budget = ToolLoopBudget()
+        reply = {
+            "full_response": "",
+            "history_response": "",
+            "speakable_chunks": [],
+            "tools_used": [],
+            "work_parts": [],
+        }
+
+        while budget.next_step():
+            started = time.perf_counter()
+            response = await self.anthropic_service.acreate_message(
+                messages, TOOLS, model=routing.model
+            )
+            usage.add_response(response, time.perf_counter() - started)
+
+            results = await run_in_executor(
+                self._process_response,
+                response,
+                conversation_id,
+                user_message_id,
+                usage,
+                reply,
+            )
+            if not results or response.stop_reason != "tool_use":
+                break
+            messages = messages + [
+                assistant_message(response.content),
+                tool_results_message(results),
+            ]
+
+        return await run_in_executor(self._save_reply, conversation_id, reply, usage)
+
+    def _process_response(self, response, conversation_id, user_message_id, usage, reply):
+        """
+        Add one model response to the reply, running its tool calls
+        (concurrently when there are several)
 
-        # Process the response and handle any tool calls
-        full_response = ""
-        history_response = ""
-        speakable_chunks = []
+        The reply is sent in one piece, so whole works are cut to their first
+        INLINE_WORK_PARTS parts, with a cursor to the rest in work_parts.
+
+        Args:
+            reply (dict): The turn's full_response, history_response,
+                speakable_chunks, tools_used and work_parts, updated in place
+
+        Returns:
+            list: The tool result dicts, to be sent back to the model
+        """
+        tool_uses = [block for block in response.content if block.type == "tool_use"]
+        results = run_tools(
+            lambda tool_use: self._handle_tool_call(
+                tool_use, conversation_id, user_message_id, usage, INLINE_WORK_PARTS
+            ),
+            tool_uses,
+        )
+        results_by_id = {result["tool_use_id"]: result for result in results}
 
         for content_block in response.content:
             if content_block.type == "text":
                 text_content = content_block.text
-                full_response += text_content
-                history_response += text_content
-                speakable_chunks.append({"text": text_content, "speakable": True})
+                reply["full_response"] += text_content
+                reply["history_response"] += text_content
+                reply["speakable_chunks"].append({"text": text_content, "speakable": True})
             elif content_block.type == "tool_use":
-                # Process the tool call and capture the results
-                for result in self._handle_tool_call(
-                    content_block, conversation_id, user_message_id
-                ):
-                    if result["type"] == "chunk":
-                        full_response += result["content"]
-                        speakable_status = result.get("speakable", False)
+                # Add the tool's formatted output to the reply
+                for chunk in results_by_id[content_block.id]["chunks"]:
+                    if chunk["type"] == "chunk":
+                        reply["full_response"] += chunk["content"]
+                        speakable_status = chunk.get("speakable", False)
                         if speakable_status:
-                            speakable_chunks.append(
+                            reply["speakable_chunks"].append(
                                 {
-                                    "text": result["content"],
+                                    "text": chunk["content"],
                                     "speakable": speakable_status,
                                 }
                             )
+                    elif chunk["type"] == "work_parts":
+                        reply["work_parts"].append(
+                            {key: value for key, value in chunk.items() if key != "type"}
+                        )
+
+                reply["tools_used"].append(content_block.name)
+
+        return results
+
+    def _save_reply(self, conversation_id, reply, usage):
+        """
+        Save the assistant message along with the turn's usage metrics
 
-                history_response += f"\n\n[Note: Used tool '{content_block.name}' to retrieve information]"
+        Returns:
+            tuple: (full_response, speakable_chunks, work_parts)
+        """
+        full_response = reply["full_response"]
+        history_response = self._history_text(
+            reply["history_response"], reply["tools_used"]
+        )
+        speakable_chunks = reply["speakable_chunks"]
 
         # Save the complete response
         conversation_id, assistant_message_id = add_message(
-            conversation_id, "assistant", history_response
+            conversation_id,
+            "assistant",
+            history_response,
+            wait=False,
+            metrics=usage.as_metrics(),
         )
 
         logger.info(f"\n--- Complete assistant response ---")
@@ -109,53 +259,295 @@ class ResponseService:
         print(f"full_response: {full_response}")
         print(f"speakable_chunks: {speakable_chunks}")
 
-        return full_response, speakable_chunks
+        return full_response, speakable_chunks, reply["work_parts"]
+
+    def stream_response(self, user_message, conversation_id):
+        """
+        Stream a response using the Anthropic streaming API with tool support
+
+        Tool calls start on the tool pool as soon as their block is complete,
+        while the rest of the response is still streaming; their output is
+        sent once the response ends, and their results go back to the model
+        for the next step of the tool loop. The assistant message is saved
+        once the last step ends.
+
+        Args:
+            user_message (str): The message from the user
+            conversation_id (str): The conversation ID
+
+        Yields:
+            dict: Events, one of
+                {"type": "delta", "text"} - text to display
+                {"type": "speakable", "text"} - text ready to be spoken
+                {"type": "done", "conversationId"} - the reply is complete
+        """
+        conversation_id, user_message_id, messages, routing, usage = self._prepare_messages(
+            user_message, conversation_id, "chat_stream"
+        )
 
-    def _handle_tool_call(self, tool_use, conversation_id, user_message_id):
-        """Handle a tool call"""
+        logger.info(f"Starting streamed response with model: {routing.model}")
+        logger.info(f"Messages count: {len(messages)}")
+
+        full_response = ""
+        history_response = ""
+        pending_speech = ""
+        tool_output_chars = 0
+        tools_used = []
+        budget = ToolLoopBudget()
+
+        def execute(tool_use):
+            return self._handle_tool_call(
+                tool_use, conversation_id, user_message_id, usage
+            )
+
+        while budget.next_step():
+            response = None
+            pending_tools = []
+            started = time.perf_counter()
+
+            for event in self.anthropic_service.stream_message(
+                messages, TOOLS, model=routing.model
+            ):
+                if event.type == "message_stop":
+                    response = event.message
+                    usage.add_response(response, time.perf_counter() - started)
+
+                elif event.type == "text":
+                    full_response += event.text
+                    history_response += event.text
+                    pending_speech += event.text
+                    yield {"type": "delta", "text": event.text}
+
+                    # Release every complete sentence for speech synthesis
+                    sentences = SENTENCE_END.split(pending_speech)
+                    pending_speech = sentences.pop()
+                    for sentence in sentences:
+                        yield {"type": "speakable", "text": sentence}
+
+                elif event.type == "content_block_stop":
+                    content_block = event.content_block
+
+                    if content_block.type == "text" and pending_speech.strip():
+                        yield {"type": "speakable", "text": pending_speech}
+                        pending_speech = ""
+
+                    elif content_block.type == "tool_use":
+                        pending_tools.append(submit_tool(execute, content_block))
+
+            results = []
+            for future in pending_tools:
+                result = future.result()
+                results.append(result)
+                for chunk in result["chunks"]:
+                    if chunk["type"] == "chunk":
+                        # Sent as soon as it is read and not kept, so a
+                        # streamed whole work is never held in memory
+                        tool_output_chars += len(chunk["content"])
+                        yield {"type": "delta", "text": chunk["content"]}
+                        if chunk.get("speakable", False):
+                            yield {"type": "speakable", "text": chunk["content"]}
+
+                tools_used.append(result["name"])
+
+            if not results or response is None or response.stop_reason != "tool_use":
+                break
+            messages = messages + [
+                assistant_message(response.content),
+                tool_results_message(results),
+            ]
+
+        if pending_speech.strip():
+            yield {"type": "speakable", "text": pending_speech}
+
+        # Save the complete response
+        add_message(
+            conversation_id,
+            "assistant",
+            self._history_text(history_response, tools_used),
+            wait=False,
+            metrics=usage.as_metrics(),
+        )
+
+        logger.info("\n--- Complete streamed assistant response ---")
+        logger.info(
+            f"Assistant (full): {full_response[:200]}..."
+            if len(full_response) > 200
+            else f"Assistant (full): {full_response}"
+        )
+        logger.info(f"Assistant (tool output): {tool_output_chars} characters")
+
+        yield {"type": "done", "conversationId": conversation_id}
+
+    def _history_text(self, history_response, tools_used):
+        """
+        The reply text to store; tool calls are kept in tool_calls and
+        replayed from there, so a note is stored only if the reply was
+        nothing but tool output
+        """
+        if history_response.strip() or not tools_used:
+            return history_response
+        return "".join(
+            f"\n\n[Note: Used tool '{tool_name}' to retrieve information]"
+            for tool_name in tools_used
+        )
+
+    def _prepare_messages(self, user_message, conversation_id, route):
+        """
+        Store the user message, build the history to send to the model and
+        pick the model for the turn
+
+        Earlier tool calls in the window are replayed as tool_use /
+        tool_result blocks (TAGORE_TOOL_HISTORY=structured) or as text notes
+        (TAGORE_TOOL_HISTORY=notes).
+
+        Args:
+            route (str): Route name for the turn's usage metrics
+
+        Returns:
+            tuple: (conversation_id, user_message_id, messages, routing, usage)
+            where routing is the model router's RoutingDecision and usage
+            the TurnUsage to record the turn in
+        """
+        turn = self._load_turn(user_message, conversation_id, route)
+        conversation_id, user_message_id, messages, routing, usage, tool_calls_by_turn = turn
+
+        # Keep the recent turns within the token budget, older ones summarized
+        window = self.history_service.build_window(conversation_id, messages)
+        window = self._with_earlier_tool_calls(messages, window, tool_calls_by_turn)
+
+        return conversation_id, user_message_id, window, routing, usage
+
+    def _load_turn(self, user_message, conversation_id, route):
+        """
+        The database part of _prepare_messages: store the user message, read
+        the history and its tool calls and pick the model
+
+        Returns:
+            tuple: (conversation_id, user_message_id, messages, routing,
+            usage, tool_calls_by_turn) with the full history as messages
+        """
+        conversation_id, user_message_id = add_message(
+            conversation_id, "user", user_message
+        )
+        logger.info(
+            f"\n--- New user message in conversation_id {conversation_id} user_message_id {user_message_id} ---"
+        )
+        logger.info(f"User: {user_message}")
+
+        messages = get_messages_by_conversation_id(conversation_id)
+
+        # Validate messages
+        if not messages or not isinstance(messages, list) or len(messages) == 0:
+            raise ValueError("No messages found for this conversation")
+
+        # Depth is taken from the full history, before older turns are folded
+        routing = model_router.choose("chat", user_message, len(messages))
+        tool_calls_by_turn = get_tool_calls_by_turn(conversation_id)
+        usage = TurnUsage(
+            route,
+            routing.rule,
+            earlier_tool_calls=(
+                tool_call_key(call["tool_name"], call["parameters"])
+                for calls in tool_calls_by_turn.values()
+                for call in calls
+            ),
+        )
+
+        return conversation_id, user_message_id, messages, routing, usage, tool_calls_by_turn
+
+    @staticmethod
+    def _with_earlier_tool_calls(messages, window, tool_calls_by_turn):
+        """Replay the earlier tool calls of the turns in window"""
+        # Messages are numbered from 1, so the window starts at this seq
+        first_seq = len(messages) - len(window) + 1
+        if TOOL_HISTORY == "structured":
+            return with_tool_history(window, first_seq, tool_calls_by_turn)
+        return with_tool_notes(window, first_seq, tool_calls_by_turn)
+
+    def _handle_tool_call(self, tool_use, conversation_id, user_message_id, usage, max_parts=None):
+        """
+        Handle a tool call
+
+        Args:
+            max_parts (int, optional): Parts of a whole work to show; all of
+                them by default
+
+        Returns:
+            dict: The tool result (see services.tool_loop.tool_result)
+        """
         tool_name = tool_use.name
         tool_params = tool_use.input
 
         # Updated map of tool names to their handler functions
         tool_handlers = {
             "list_works": self._handle_list_works,
-            "get_work_content": self._handle_get_work_content,
+            "get_work_content": functools.partial(
+                self._handle_get_work_content, max_parts=max_parts
+            ),
+            "search_works": self._handle_search_works,
         }
 
         try:
             if tool_name in tool_handlers:
-                yield from tool_handlers[tool_name](
-                    tool_use, conversation_id, user_message_id
+                tool_response, tool_response_json, chunks = tool_handlers[tool_name](
+                    tool_use, conversation_id, user_message_id, usage
+                )
+                return tool_result(
+                    tool_use,
+                    tool_response_json,
+                    chunks,
+                    is_error="error" in tool_response,
                 )
             else:
                 # Handle unknown tool
                 logger.error(f"Unknown tool '{tool_name}' called")
-                yield {
-                    "type": "chunk",
-                    "content": f"\n\nI tried to use a tool that isn't available ({tool_name}). Please contact support.\n\n",
-                }
+                return tool_result(
+                    tool_use,
+                    f"Unknown tool '{tool_name}'",
+                    [
+                        {
+                            "type": "chunk",
+                            "content": f"\n\nI tried to use a tool that isn't available ({tool_name}). Please contact support.\n\n",
+                        }
+                    ],
+                    is_error=True,
+                )
         except Exception as e:
             logger.error(f"Error executing tool {tool_name}: {str(e)}")
             logger.error(traceback.format_exc())
-            yield {
-                "type": "chunk",
-                "content": f"\n\nI encountered an error while trying to use the {tool_name} tool: {str(e)}\n\n",
-            }
-
-    def _handle_list_works(self, tool_use, conversation_id, user_message_id):
-        """Handle the list_works tool"""
+            return tool_result(
+                tool_use,
+                f"Error executing {tool_name}: {str(e)}",
+                [
+                    {
+                        "type": "chunk",
+                        "content": f"\n\nI encountered an error while trying to use the {tool_name} tool: {str(e)}\n\n",
+                    }
+                ],
+                is_error=True,
+            )
+
+    def _handle_list_works(self, tool_use, conversation_id, user_message_id, usage):
+        """Handle the list_works tool, returning (tool_response, response_json, chunks)"""
         tool_params = tool_use.input
 
-        # Execute the tool
-        tool_response = list_works(tool_params)
-
-        logger.info(
-            f"Tool Response (list_works): {json.dumps(tool_response, indent=2)}"
+        # Execute the tool, or reuse this conversation's earlier result
+        started = time.perf_counter()
+        tool_response, tool_response_json, memo_hit = tool_memo.call(
+            conversation_id, "list_works", tool_params, list_works
         )
+        duration = time.perf_counter() - started
+        usage.add_tool("list_works", duration, tool_params, memo_hit=memo_hit)
+
+        if memo_hit:
+            # Already stored in tool_calls by the earlier turn
+            logger.info("Tool Response (list_works) served from memo")
+            return tool_response, tool_response_json, list(format_works_response(tool_response))
+
+        logger.info(f"Tool Response (list_works): {tool_response_json}")
 
         # Store the tool call
         tool_params_json = json.dumps(tool_params) if tool_params else "{}"
-        tool_response_json = json.dumps(tool_response)
 
         add_tool_call(
             conversation_id,
@@ -163,24 +555,45 @@ class ResponseService:
             "list_works",
             tool_params_json,
             tool_response_json,
+            wait=False,
+            duration_ms=round(duration * 1000),
         )
 
-        yield from format_works_response(tool_response)
+        return tool_response, tool_response_json, list(format_works_response(tool_response))
 
-    def _handle_get_work_content(self, tool_use, conversation_id, user_message_id):
-        """Handle the get_work_content tool"""
-        tool_params = tool_use.input
+    def _handle_get_work_content(
+        self, tool_use, conversation_id, user_message_id, usage, max_parts=None
+    ):
+        """
+        Handle the get_work_content tool, returning (tool_response,
+        response_json, chunks)
 
-        # Execute the tool
-        tool_response = get_work_content(tool_params)
+        Whole works are streamed: the response only lists their part
+        numbers, and chunks is a generator that reads the parts a few at a
+        time as the reply is sent, up to max_parts of them if given.
+        """
+        tool_params = tool_use.input
 
-        logger.info(
-            f"Tool Response (get_work_content): {json.dumps(tool_response, indent=2)}"
+        # Execute the tool, or reuse this conversation's earlier result
+        started = time.perf_counter()
+        tool_response, tool_response_json, memo_hit = tool_memo.call(
+            conversation_id,
+            "get_work_content",
+            tool_params,
+            lambda params: get_work_content(params, stream_parts=True),
         )
+        duration = time.perf_counter() - started
+        usage.add_tool("get_work_content", duration, tool_params, memo_hit=memo_hit)
+
+        if memo_hit:
+            # Already stored in tool_calls by the earlier turn
+            logger.info("Tool Response (get_work_content) served from memo")
+            return tool_response, tool_response_json, format_work_content_response(tool_response, max_parts)
+
+        logger.info(f"Tool Response (get_work_content): {tool_response_json}")
 
         # Store the tool call
         tool_params_json = json.dumps(tool_params) if tool_params else "{}"
-        tool_response_json = json.dumps(tool_response)
 
         add_tool_call(
             conversation_id,
@@ -188,6 +601,42 @@ class ResponseService:
             "get_work_content",
             tool_params_json,
             tool_response_json,
+            wait=False,
+            duration_ms=round(duration * 1000),
+        )
+
+        return tool_response, tool_response_json, format_work_content_response(tool_response, max_parts)
+
+    def _handle_search_works(self, tool_use, conversation_id, user_message_id, usage):
+        """Handle the search_works tool, returning (tool_response, response_json, chunks)"""
+        tool_params = tool_use.input
+
+        # Execute the tool, or reuse this conversation's earlier result
+        started = time.perf_counter()
+        tool_response, tool_response_json, memo_hit = tool_memo.call(
+            conversation_id, "search_works", tool_params, search_works
+        )
+        duration = time.perf_counter() - started
+        usage.add_tool("search_works", duration, tool_params, memo_hit=memo_hit)
+
+        if memo_hit:
+            # Already stored in tool_calls by the earlier turn
+            logger.info("Tool Response (search_works) served from memo")
+            return tool_response, tool_response_json, list(format_search_response(tool_response))
+
+        logger.info(f"Tool Response (search_works): {tool_response_json}")
+
+        # Store the tool call
+        tool_params_json = json.dumps(tool_params) if tool_params else "{}"
+
+        add_tool_call(
+            conversation_id,
+            user_message_id,
+            "search_works",
+            tool_params_json,
+            tool_response_json,
+            wait=False,
+            duration_ms=round(duration * 1000),
         )
 
-        yield from format_work_content_response(tool_response)
+        return tool_response, tool_response_json, list(format_search_response(tool_response))
@@ -0,0 +1,196 @@
+import json
+import re
+from config import TOOL_HISTORY_MAX_CHARS
+
+# The placeholder stored in the reply text when a turn used a tool
+TOOL_NOTE = re.compile(r"\s*\[Note: Used tool '[^']*' [^\]]*\]")
+
+# Characters of each work part kept in a compacted get_work_content result
+EXCERPT_CHARS = 200
+
+
+def _compact_list_works(response):
+    return {
+        "works": [
+            {"id": work.get("id"), "title": work.get("title"), "category": work.get("category")}
+            for work in response.get("works", [])
+        ],
+        "count": response.get("count"),
+        "category": response.get("category"),
+    }
+
+
+def _compact_get_work_content(response):
+    work = response.get("work")
+    if not work:
+        return response
+    compact = {key: value for key, value in work.items() if key != "parts"}
+    compact["parts"] = [
+        {
+            "part_number": part.get("part_number"),
+            "chars": len(part.get("content") or ""),
+            "excerpt": (part.get("content") or "")[:EXCERPT_CHARS],
+        }
+        for part in work.get("parts", [])
+    ]
+    return dict(response, work=compact)
+
+
+def _compact_list_items(response):
+    return dict(
+        response,
+        items=[
+            {
+                "id": item.get("id"),
+                "name": item.get("name"),
+                "stock": item.get("stock"),
+                "price": item.get("price"),
+            }
+            for item in response.get("items", [])
+        ],
+    )
+
+
+# Tool-specific reductions to ids, titles and other small fields
+COMPACTORS = {
+    "list_works": _compact_list_works,
+    "get_work_content": _compact_get_work_content,
+    "list_items": _compact_list_items,
+}
+
+
+def compact_tool_response(tool_name, response_json, max_chars=TOOL_HISTORY_MAX_CHARS):
+    """
+    Shrink a stored tool response for replay in the history
+
+    Args:
+        tool_name (str): The tool that produced the response
+        response_json (str): The response as stored in tool_calls
+        max_chars (int): Hard cap on the returned text
+
+    Returns:
+        str: The compacted response, truncated to max_chars
+    """
+    try:
+        response = json.loads(response_json)
+    except (TypeError, ValueError):
+        text = response_json or ""
+    else:
+        compactor = COMPACTORS.get(tool_name)
+        if compactor and isinstance(response, dict):
+            response = compactor(response)
+        text = json.dumps(response, ensure_ascii=False)
+
+    if len(text) > max_chars:
+        text = text[:max_chars] + " ...[truncated]"
+    return text
+
+
+def tool_call_key(tool_name, parameters):
+    """Identify a tool call by its name and normalized parameters"""
+    if isinstance(parameters, str):
+        try:
+            parameters = json.loads(parameters)
+        except ValueError:
+            return tool_name, parameters
+    return tool_name, json.dumps(parameters or {}, sort_keys=True)
+
+
+def _parse_parameters(parameters):
+    try:
+        parsed = json.loads(parameters) if parameters else {}
+    except ValueError:
+        parsed = {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def with_tool_history(window, first_seq, tool_calls_by_turn):
+    """
+    Replay earlier tool calls in a history window as content blocks
+
+    After every user message whose turn called tools, an assistant message
+    with the tool_use blocks and a user message with their compacted
+    tool_result blocks are inserted ahead of the stored reply, and the
+    reply's "[Note: Used tool ...]" placeholders are dropped.
+
+    Args:
+        window (list): {"role", "content"} messages, oldest first
+        first_seq (int): Sequence number of window[0]
+        tool_calls_by_turn (dict): User message seq -> tool calls, as
+            returned by db.get_tool_calls_by_turn
+
+    Returns:
+        list: The expanded messages
+    """
+    expanded = []
+    replayed = False
+
+    for index, message in enumerate(window):
+        if replayed and message["role"] == "assistant":
+            # Keep the placeholder if the reply was nothing but tool output
+            content = TOOL_NOTE.sub("", message["content"]).strip()
+            message = dict(message, content=content or message["content"])
+        replayed = False
+        expanded.append(message)
+
+        calls = tool_calls_by_turn.get(first_seq + index)
+        followed_by_reply = (
+            index + 1 < len(window) and window[index + 1]["role"] == "assistant"
+        )
+        if message["role"] != "user" or not calls or not followed_by_reply:
+            continue
+
+        expanded.append(
+            {
+                "role": "assistant",
+                "content": [
+                    {
+                        "type": "tool_use",
+                        "id": f"toolu_hist_{call['id']}",
+                        "name": call["tool_name"],
+                        "input": _parse_parameters(call["parameters"]),
+                    }
+                    for call in calls
+                ],
+            }
+        )
+        expanded.append(
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "tool_result",
+                        "tool_use_id": f"toolu_hist_{call['id']}",
+                        "content": compact_tool_response(call["tool_name"], call["response"]),
+                    }
+                    for call in calls
+                ],
+            }
+        )
+        replayed = True
+
+    return expanded
+
+
+def with_tool_notes(window, first_seq, tool_calls_by_turn):
+    """
+    Mark earlier tool calls with text placeholders only, without their
+    results (TAGORE_TOOL_HISTORY=notes)
+
+    Args and Returns are as for with_tool_history.
+    """
+    expanded = []
+    for index, message in enumerate(window):
+        calls = tool_calls_by_turn.get(first_seq + index - 1)
+        if (
+            message["role"] == "assistant"
+            and calls
+            and not TOOL_NOTE.search(message["content"])
+        ):
+            notes = "".join(
+                f"\n\n[Note: Used tool '{call['tool_name']}' to retrieve information]"
+                for call in calls
+            )
+            message = dict(message, content=message["content"] + notes)
+        expanded.append(message)
+    return expanded
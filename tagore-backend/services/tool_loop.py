@@ -0,0 +1,139 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import TOOL_LOOP_DEADLINE, TOOL_LOOP_MAX_STEPS, TOOL_WORKERS
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Appended to every tool result: its formatted output is already part of
+# the reply, so the model should build on it rather than repeat it
+SHOWN_TO_USER_NOTE = (
+    "(This result has already been shown to the user. Continue from it - "
+    "summarize, compare or call further tools - without repeating it.)"
+)
+
+_executor = None
+
+
+def get_tool_executor():
+    """The shared thread pool that runs tool calls concurrently"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=TOOL_WORKERS, thread_name_prefix="tagore-tool"
+        )
+    return _executor
+
+
+class ToolLoopBudget:
+    """Bounds one turn's model/tool round trips by step count and deadline"""
+
+    def __init__(self, max_steps=TOOL_LOOP_MAX_STEPS, deadline=TOOL_LOOP_DEADLINE):
+        self.max_steps = max_steps
+        self.deadline = time.monotonic() + deadline
+        self.steps = 0
+
+    def next_step(self):
+        """Count a model call; False if the turn may not make another one"""
+        if self.steps >= self.max_steps:
+            logger.warning(f"Tool loop stopped after {self.steps} step(s)")
+            return False
+        if self.steps and time.monotonic() >= self.deadline:
+            logger.warning(f"Tool loop deadline reached after {self.steps} step(s)")
+            return False
+        self.steps += 1
+        return True
+
+
+def submit_tool(execute, tool_use):
+    """Start execute(tool_use) on the tool pool, returning its Future"""
+    return get_tool_executor().submit(execute, tool_use)
+
+
+def run_tools(execute, tool_uses, concurrent_tools=None):
+    """
+    Run the tool calls of one model response, concurrently when there are
+    several that may run together
+
+    Args:
+        execute (callable): Runs one tool_use block and returns its result
+            dict (see tool_result)
+        tool_uses (list): The tool_use blocks, in response order
+        concurrent_tools (collection, optional): Names of the read-only
+            tools that may run alongside each other; any other call runs on
+            its own, after the calls before it and before the ones after it.
+            None lets every call run concurrently
+
+    Returns:
+        list: The result dicts, in the same order as tool_uses
+    """
+    if len(tool_uses) == 1:
+        return [execute(tool_uses[0])]
+
+    results = []
+    pending = []
+    for tool_use in tool_uses:
+        if concurrent_tools is None or tool_use.name in concurrent_tools:
+            pending.append(submit_tool(execute, tool_use))
+            continue
+        # A write waits for the calls before it, and holds up the ones after
+        results.extend(future.result() for future in pending)
+        pending = []
+        results.append(execute(tool_use))
+    results.extend(future.result() for future in pending)
+    return results
+
+
+def tool_result(tool_use, content, chunks, is_error=False):
+    """
+    The result of one tool call
+
+    Args:
+        tool_use: The tool_use block that was executed
+        content (str): What the model is told, e.g. the tool's JSON response
+        chunks (iterable): Formatted {"type": "chunk", ...} dicts for the
+            reply; may be a generator, consumed once
+        is_error (bool): Whether the tool failed
+
+    Returns:
+        dict: {"tool_use_id", "name", "content", "chunks", "is_error"}
+    """
+    return {
+        "tool_use_id": tool_use.id,
+        "name": tool_use.name,
+        "content": content,
+        "chunks": chunks,
+        "is_error": is_error,
+    }
+
+
+def assistant_message(content):
+    """Turn a response's content blocks back into an assistant message"""
+    blocks = []
+    for block in content:
+        if block.type == "text":
+            if block.text:
+                blocks.append({"type": "text", "text": block.text})
+        elif block.type == "tool_use":
+            blocks.append(
+                {"type": "tool_use", "id": block.id, "name": block.name, "input": block.input}
+            )
+    return {"role": "assistant", "content": blocks}
+
+
+def tool_results_message(results):
+    """The user message carrying tool_result blocks for the model"""
+    blocks = []
+    for result in results:
+        block = {
+            "type": "tool_result",
+            "tool_use_id": result["tool_use_id"],
+            "content": f"{result['content']}\n\n{SHOWN_TO_USER_NOTE}",
+        }
+        if result["is_error"]:
+            block["is_error"] = True
+        blocks.append(block)
+    return {"role": "user", "content": blocks}
@@ -0,0 +1,153 @@
+import json
+import threading
+from config import TOOL_MEMO, TOOL_MEMO_MAX_BYTES
+from lru import ByteBudgetLRU
+from services.tool_history import tool_call_key
+from tools import inventory_tools, tagore_tools
+
+# Read-only tools whose result depends only on their parameters and the
+# data behind them, mapped to the function that versions that data
+MEMOIZED_TOOLS = {
+    "list_works": tagore_tools.data_version,
+    "get_work_content": tagore_tools.data_version,
+    "search_works": tagore_tools.data_version,
+    "get_item_details": inventory_tools.data_version,
+}
+
+
+class ToolMemo:
+    """
+    Per-conversation memo of read-only tool results
+
+    Results are keyed by conversation and tool_call_key() (tool name plus
+    normalized parameters) and stored with the data version they were read
+    at; a result whose data has changed since, e.g. after an inventory
+    write, is dropped on lookup instead of served. Conversations are evicted
+    least-recently-used first once the serialized results exceed max_bytes.
+    """
+
+    # Rough per-entry overhead of the key, the parsed response and dict slots
+    ENTRY_OVERHEAD_BYTES = 300
+
+    def __init__(self, max_bytes=TOOL_MEMO_MAX_BYTES, enabled=TOOL_MEMO):
+        self.enabled = enabled
+        self._lru = ByteBudgetLRU(max_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._by_tool = {}
+
+    @property
+    def max_bytes(self):
+        return self._lru.max_bytes
+
+    @staticmethod
+    def cacheable(tool_name, params):
+        """Whether a call may be served from the memo"""
+        if tool_name not in MEMOIZED_TOOLS:
+            return False
+        # A random selection is meant to differ between calls
+        return not (tool_name == "list_works" and (params or {}).get("random", False))
+
+    def call(self, conversation_id, tool_name, params, execute):
+        """
+        Run a tool call, or serve it from the memo
+
+        Args:
+            conversation_id (str): The conversation making the call
+            tool_name (str): The tool
+            params (dict): The tool input
+            execute (callable): The tool function, called with params on a miss
+
+        Returns:
+            tuple: (tool_response, response_json, hit) where hit says whether
+                the result came from the memo
+        """
+        if not self.enabled or not self.cacheable(tool_name, params):
+            tool_response = execute(params)
+            return tool_response, json.dumps(tool_response), False
+
+        key = tool_call_key(tool_name, params)
+        # Read the version first so a write during execute() is not masked
+        version = MEMOIZED_TOOLS[tool_name]()
+
+        with self._lock:
+            counts = self._by_tool.setdefault(tool_name, {"hits": 0, "misses": 0})
+            memo = self._lru.get(conversation_id, touch=False)
+            entry = memo.get(key) if memo else None
+            if entry is not None and entry[2] != version:
+                self._drop(conversation_id, key)
+                self.stale += 1
+                entry = None
+            if entry is not None:
+                self._lru.touch(conversation_id)
+                self.hits += 1
+                counts["hits"] += 1
+                return entry[0], entry[1], True
+            self.misses += 1
+            counts["misses"] += 1
+
+        tool_response = execute(params)
+        response_json = json.dumps(tool_response)
+        # Failures may be transient, so only successful results are kept
+        if isinstance(tool_response, dict) and "error" not in tool_response:
+            self._put(conversation_id, key, (tool_response, response_json, version))
+        return tool_response, response_json, False
+
+    def invalidate(self, conversation_id):
+        """Drop a conversation's memoized results"""
+        with self._lock:
+            self._lru.pop(conversation_id)
+
+    def clear(self):
+        """Drop every memoized result"""
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self):
+        """Return hit/miss counters, per tool and overall, and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stale": self.stale,
+                "evictions": self._lru.evictions,
+                "by_tool": {
+                    tool_name: dict(
+                        counts,
+                        hit_rate=counts["hits"] / (counts["hits"] + counts["misses"])
+                        if counts["hits"] + counts["misses"]
+                        else 0.0,
+                    )
+                    for tool_name, counts in self._by_tool.items()
+                },
+                "conversations": len(self._lru),
+                "bytes": self._lru.total_bytes,
+                "max_bytes": self._lru.max_bytes,
+            }
+
+    @classmethod
+    def _entry_size(cls, entry):
+        return len(entry[1]) + cls.ENTRY_OVERHEAD_BYTES
+
+    def _put(self, conversation_id, key, entry):
+        with self._lock:
+            self._drop(conversation_id, key)
+            memo = self._lru.get(conversation_id)
+            if memo is None:
+                memo = {}
+                self._lru.put(conversation_id, memo, 0)
+            memo[key] = entry
+            self._lru.add_bytes(conversation_id, self._entry_size(entry))
+
+    def _drop(self, conversation_id, key):
+        memo = self._lru.get(conversation_id, touch=False)
+        if memo and key in memo:
+            self._lru.add_bytes(conversation_id, -self._entry_size(memo.pop(key)))
+
+
+# Shared by all services
+tool_memo = ToolMemo()
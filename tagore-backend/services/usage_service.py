@@ -0,0 +1,186 @@
+import json
+import threading
+from config import (
+    CACHE_READ_PRICE_MULTIPLIER,
+    CACHE_WRITE_PRICE_MULTIPLIER,
+    MODEL_PRICING,
+)
+from db import get_tool_timings, get_usage_totals
+from services.tool_history import tool_call_key
+
+
+def estimate_cost(model, input_tokens, output_tokens, cache_read_tokens=0, cache_write_tokens=0):
+    """
+    Estimate the USD cost of a model's token usage
+
+    Returns:
+        float or None: The cost, or None if the model has no entry in MODEL_PRICING
+    """
+    for prefix, (input_price, output_price) in MODEL_PRICING.items():
+        if model and model.startswith(prefix):
+            return (
+                input_tokens * input_price
+                + cache_write_tokens * input_price * CACHE_WRITE_PRICE_MULTIPLIER
+                + cache_read_tokens * input_price * CACHE_READ_PRICE_MULTIPLIER
+                + output_tokens * output_price
+            ) / 1_000_000
+    return None
+
+
+class TurnUsage:
+    """Accumulates model usage and timings over one assistant turn"""
+
+    def __init__(self, route, routing_rule=None, earlier_tool_calls=()):
+        """
+        Args:
+            route (str): The calling route, e.g. "chat"
+            routing_rule (str, optional): The model router rule for the turn
+            earlier_tool_calls (iterable): tool_call_key()s of the tool
+                calls already made in the conversation, to count repeats
+        """
+        self.route = route
+        self.routing_rule = routing_rule
+        self.earlier_tool_calls = set(earlier_tool_calls)
+        self.model = None
+        self.model_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_read_tokens = 0
+        self.cache_write_tokens = 0
+        self.model_seconds = 0.0
+        self.tool_seconds = 0.0
+        self.tools = []
+        self.repeated_tool_calls = 0
+        self.tool_calls = 0
+        self.memo_hits = 0
+        # Tools of one response may run concurrently
+        self._lock = threading.Lock()
+
+    def add_response(self, response, seconds):
+        """Record a model response (a Message) and how long the call took"""
+        usage = response.usage
+        self.model = response.model
+        self.model_calls += 1
+        self.input_tokens += usage.input_tokens
+        self.output_tokens += usage.output_tokens
+        self.cache_read_tokens += getattr(usage, "cache_read_input_tokens", None) or 0
+        self.cache_write_tokens += getattr(usage, "cache_creation_input_tokens", None) or 0
+        self.model_seconds += seconds
+
+    def add_tool(self, tool_name, seconds, parameters=None, memo_hit=False):
+        """Record one tool execution, or one served from the tool memo"""
+        with self._lock:
+            if tool_call_key(tool_name, parameters) in self.earlier_tool_calls:
+                self.repeated_tool_calls += 1
+            self.tool_calls += 1
+            if memo_hit:
+                self.memo_hits += 1
+            self.tool_seconds += seconds
+            if tool_name not in self.tools:
+                self.tools.append(tool_name)
+
+    def as_metrics(self):
+        """The metrics dict stored with the assistant message (see db.add_message)"""
+        return {
+            "route": self.route,
+            "routing_rule": self.routing_rule,
+            "model": self.model,
+            "model_calls": self.model_calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_read_tokens": self.cache_read_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+            "model_latency_ms": round(self.model_seconds * 1000),
+            "tool_time_ms": round(self.tool_seconds * 1000),
+            "repeated_tool_calls": self.repeated_tool_calls,
+            "tool_calls": self.tool_calls,
+            "memo_hits": self.memo_hits,
+            "tools": json.dumps(self.tools) if self.tools else None,
+        }
+
+
+def usage_report(group_by="day", days=30):
+    """
+    Aggregate cost and latency of assistant turns for capacity planning
+
+    Args:
+        group_by (str): "day", "route", "model", "rule" (the model router
+            rule that picked the model) or "tool"
+        days (int): How many days back to include
+
+    Returns:
+        list: One dict per group with messages, model_calls, token totals,
+            cost (USD, None if any model is unpriced), avg/max model latency
+            per turn, tool time, repeated tool calls (same tool and
+            parameters as an earlier call in the conversation), turn_tool_calls
+            and memo_hits (calls served from the tool memo) with
+            memo_hit_rate; tool groups also carry tool_calls and avg_tool_ms
+            from the individual executions
+    """
+    report = {}
+    for totals in get_usage_totals(group_by, days):
+        entry = report.setdefault(
+            totals["group"],
+            {
+                "group": totals["group"],
+                "models": [],
+                "messages": 0,
+                "model_calls": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "cache_read_tokens": 0,
+                "cache_write_tokens": 0,
+                "cost": 0.0,
+                "model_latency_ms": 0,
+                "max_model_latency_ms": 0,
+                "tool_time_ms": 0,
+                "repeated_tool_calls": 0,
+                "turn_tool_calls": 0,
+                "memo_hits": 0,
+            },
+        )
+        entry["models"].append(totals["model"])
+        for field in (
+            "messages",
+            "model_calls",
+            "input_tokens",
+            "output_tokens",
+            "cache_read_tokens",
+            "cache_write_tokens",
+            "model_latency_ms",
+            "tool_time_ms",
+            "repeated_tool_calls",
+            "turn_tool_calls",
+            "memo_hits",
+        ):
+            entry[field] += totals[field]
+        entry["max_model_latency_ms"] = max(
+            entry["max_model_latency_ms"], totals["max_model_latency_ms"]
+        )
+
+        cost = estimate_cost(
+            totals["model"],
+            totals["input_tokens"],
+            totals["output_tokens"],
+            totals["cache_read_tokens"],
+            totals["cache_write_tokens"],
+        )
+        entry["cost"] = None if cost is None or entry["cost"] is None else entry["cost"] + cost
+
+    for entry in report.values():
+        # Per turn, like max_model_latency_ms (a turn may make several calls)
+        entry["avg_model_latency_ms"] = round(
+            entry["model_latency_ms"] / (entry["messages"] or 1)
+        )
+        entry["memo_hit_rate"] = entry["memo_hits"] / (entry["turn_tool_calls"] or 1)
+
+    if group_by == "tool":
+        for tool_name, timings in get_tool_timings(days).items():
+            entry = report.get(tool_name)
+            if entry is None:
+                continue
+            entry["tool_calls"] = timings["calls"]
+            entry["avg_tool_ms"] = round(timings["duration_ms"] / (timings["calls"] or 1))
+            entry["max_tool_ms"] = timings["max_duration_ms"]
+
+    return sorted(report.values(), key=lambda entry: str(entry["group"]))
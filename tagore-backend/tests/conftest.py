@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import db  # noqa: E402
+from tools import inventory_tools  # noqa: E402
+
+
+@pytest.fixture
+def conversation_db(tmp_path, monkeypatch):
+    """The db module pointed at an empty shard and archive under tmp_path"""
+    monkeypatch.setattr(db, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "conversations.db"))
+    monkeypatch.setattr(db, "ARCHIVE_DB_FILE", str(tmp_path / "archive.db"))
+    monkeypatch.setattr(db, "DB_SHARD_COUNT", 1)
+    monkeypatch.setattr(db, "DB_WRITE_BEHIND", False)
+    db.history_cache.clear()
+    db.init_db()
+    yield db
+    db.close_connections()
+    db.history_cache.clear()
+
+
+@pytest.fixture
+def inventory_db(tmp_path, monkeypatch):
+    """The inventory tools pointed at an empty database under tmp_path"""
+    monkeypatch.setattr(inventory_tools, "DB_PATH", str(tmp_path / "inventory.db"))
+    inventory_tools.init_inventory_db()
+    return inventory_tools
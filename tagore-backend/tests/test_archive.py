@@ -0,0 +1,103 @@
+import sqlite3
+import threading
+import time
+
+
+def _make_idle(db, conversation_id, days=30):
+    with db.get_connection(db.shard_for(conversation_id)) as conn:
+        conn.execute(
+            "UPDATE conversations SET updated_at = datetime('now', ?) WHERE id = ?",
+            (f"-{days} days", conversation_id),
+        )
+        conn.commit()
+
+
+def _rows(db_file, sql, args=()):
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute(sql, args).fetchall()
+    finally:
+        conn.close()
+
+
+def _contents(db, conversation_id):
+    return [message["content"] for message in db.get_messages_by_conversation_id(conversation_id)]
+
+
+def test_resumed_conversation_continues_and_is_archived_again(conversation_db):
+    db = conversation_db
+    db.add_message("c1", "user", "first")
+    db.add_message("c1", "assistant", "second")
+    _make_idle(db, "c1")
+
+    assert db.archive_idle_conversations(7) == 1
+    assert _rows(db.DB_FILE, "SELECT id FROM conversations") == []
+    db.history_cache.clear()
+    assert _contents(db, "c1") == ["first", "second"]
+
+    db.add_message("c1", "user", "third")
+    db.history_cache.clear()
+    assert _contents(db, "c1") == ["first", "second", "third"]
+    assert _rows(
+        db.DB_FILE, "SELECT seq FROM messages WHERE conversation_id = 'c1' ORDER BY seq"
+    ) == [(1,), (2,), (3,)]
+    last_id = db.get_last_message_id("c1")
+    assert _rows(db.DB_FILE, "SELECT content FROM messages WHERE id = ?", (last_id,)) == [
+        ("third",)
+    ]
+
+    _make_idle(db, "c1")
+    assert db.archive_idle_conversations(7) == 1
+    assert _rows(
+        db.ARCHIVE_DB_FILE,
+        "SELECT seq, content FROM messages WHERE conversation_id = 'c1' ORDER BY seq",
+    ) == [(1, "first"), (2, "second"), (3, "third")]
+    assert _rows(
+        db.ARCHIVE_DB_FILE, "SELECT message_count FROM conversations WHERE id = 'c1'"
+    ) == [(3,)]
+
+
+def test_archiving_deletes_only_unreferenced_blobs(conversation_db):
+    db = conversation_db
+    for conversation_id in ("c1", "c2"):
+        _, message_id = db.add_message(conversation_id, "user", "read me a poem")
+        db.add_tool_call(conversation_id, message_id, "get_work_content", "{}", '{"found": true}')
+    _make_idle(db, "c1")
+
+    db.archive_idle_conversations(7)
+    # Still referenced by c2's tool call
+    assert len(_rows(db.DB_FILE, "SELECT hash FROM tool_response_blobs")) == 1
+
+    _make_idle(db, "c2")
+    db.archive_idle_conversations(7)
+    assert _rows(db.DB_FILE, "SELECT hash FROM tool_response_blobs") == []
+    assert len(_rows(db.ARCHIVE_DB_FILE, "SELECT hash FROM tool_response_blobs")) == 1
+
+
+def test_message_written_while_archiving_is_not_lost(conversation_db, monkeypatch):
+    db = conversation_db
+    db.add_message("c1", "user", "first")
+    db.add_message("c1", "assistant", "second")
+    _make_idle(db, "c1")
+
+    delete_conversation = db._delete_conversation
+    writers = []
+
+    def delete_after_a_write(conn, conversation_id):
+        if not writers:
+            # A new message arrives after the batch was copied to the archive
+            writer = threading.Thread(
+                target=db.add_message, args=("c1", "user", "late"), daemon=True
+            )
+            writers.append(writer)
+            writer.start()
+            time.sleep(0.3)
+        delete_conversation(conn, conversation_id)
+
+    monkeypatch.setattr(db, "_delete_conversation", delete_after_a_write)
+    db.archive_idle_conversations(7)
+    writers[0].join(10)
+    assert not writers[0].is_alive()
+
+    db.history_cache.clear()
+    assert _contents(db, "c1") == ["first", "second", "late"]
@@ -0,0 +1,75 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from services.inventory_service import READ_ONLY_INVENTORY_TOOLS
+from services.tool_loop import run_tools
+
+
+def _stock(inventory, item_id):
+    return inventory.get_item({"item_id": item_id})["item"]["stock"]
+
+
+def test_concurrent_sales_never_oversell(inventory_db):
+    item_id = inventory_db.create_item({"name": "Gitanjali", "stock": 20})["item_id"]
+
+    def sell(_):
+        return inventory_db.record_transaction(
+            {"item_id": item_id, "transaction_type": "sale", "quantity": 1}
+        )
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(sell, range(50)))
+
+    assert sum(result["success"] for result in results) == 20
+    assert all(
+        result["error"].startswith("Insufficient stock")
+        for result in results
+        if not result["success"]
+    )
+    assert _stock(inventory_db, item_id) == 0
+
+
+def test_concurrent_purchases_and_sales_add_up(inventory_db):
+    item_id = inventory_db.create_item({"name": "Gora", "stock": 100})["item_id"]
+
+    def trade(index):
+        transaction_type = "sale" if index % 2 else "purchase"
+        return inventory_db.record_transaction(
+            {"item_id": item_id, "transaction_type": transaction_type, "quantity": 3}
+        )
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(trade, range(40)))
+
+    assert all(result["success"] for result in results)
+    assert _stock(inventory_db, item_id) == 100
+
+
+def test_run_tools_runs_writes_alone_and_in_order():
+    spans = []
+    lock = threading.Lock()
+
+    def execute(tool_use):
+        started = time.monotonic()
+        time.sleep(0.05)
+        with lock:
+            spans.append((tool_use.id, started, time.monotonic()))
+        return {"tool_use_id": tool_use.id}
+
+    names = ["list_items", "record_transaction", "update_item", "get_item_details", "list_items"]
+    tool_uses = [
+        SimpleNamespace(id=f"call-{index}", name=name) for index, name in enumerate(names)
+    ]
+
+    results = run_tools(execute, tool_uses, READ_ONLY_INVENTORY_TOOLS)
+
+    assert [result["tool_use_id"] for result in results] == [tool_use.id for tool_use in tool_uses]
+    by_id = {tool_use_id: (started, ended) for tool_use_id, started, ended in spans}
+    for write_id in ("call-1", "call-2"):
+        write_started, write_ended = by_id[write_id]
+        for other_id, (started, ended) in by_id.items():
+            if other_id != write_id:
+                assert ended <= write_started or started >= write_ended
+    assert by_id["call-1"][1] <= by_id["call-2"][0]
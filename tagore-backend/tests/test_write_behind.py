@@ -0,0 +1,111 @@
+import sqlite3
+import threading
+
+import pytest
+
+# Long enough for a loaded CI machine, short enough that a hang fails the test
+TIMEOUT = 10
+
+
+def _insert(cursor, conversation_id):
+    cursor.execute("INSERT INTO conversations (id) VALUES (?)", (conversation_id,))
+    return conversation_id
+
+
+def _fail(cursor):
+    raise sqlite3.OperationalError("disk I/O error")
+
+
+def _call_within(function, *args):
+    """Run function(*args) in a thread, failing the test if it does not return"""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = function(*args)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    assert not thread.is_alive(), f"{function.__name__} did not return"
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("result")
+
+
+def _stored_ids(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        return {row[0] for row in conn.execute("SELECT id FROM conversations")}
+    finally:
+        conn.close()
+
+
+def test_failed_write_raises_in_caller_and_writer_keeps_running(conversation_db):
+    writer = conversation_db.WriteBehindQueue(conversation_db.DB_FILE)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            _call_within(writer.submit, _fail, ())
+
+        assert _call_within(writer.submit, _insert, ("after-error",)) == "after-error"
+        assert writer._thread.is_alive()
+    finally:
+        writer.stop()
+
+
+def test_failed_write_does_not_lose_the_rest_of_its_batch(conversation_db):
+    writer = conversation_db.WriteBehindQueue(conversation_db.DB_FILE)
+    try:
+        writer.submit(_insert, ("before",), wait=False)
+        writer.submit(_fail, (), wait=False)
+        writer.submit(_insert, ("after",), wait=False)
+        _call_within(writer.flush)
+    finally:
+        writer.stop()
+
+    assert _stored_ids(conversation_db.DB_FILE) == {"before", "after"}
+
+
+def test_connection_error_releases_waiting_callers(conversation_db, monkeypatch):
+    def no_connection(db_file=None):
+        raise sqlite3.OperationalError("unable to open database file")
+
+    writer = conversation_db.WriteBehindQueue(conversation_db.DB_FILE)
+    try:
+        monkeypatch.setattr(conversation_db, "get_connection", no_connection)
+        with pytest.raises(sqlite3.OperationalError):
+            _call_within(writer.submit, _insert, ("lost",))
+
+        monkeypatch.undo()
+        assert _call_within(writer.submit, _insert, ("kept",)) == "kept"
+    finally:
+        writer.stop()
+
+
+def test_flush_returns_while_other_writers_keep_the_queue_busy(conversation_db):
+    writer = conversation_db.WriteBehindQueue(conversation_db.DB_FILE)
+    stop = threading.Event()
+
+    def keep_writing(prefix):
+        count = 0
+        while not stop.is_set():
+            writer.submit(_insert, (f"{prefix}-{count}",), wait=False)
+            count += 1
+
+    producers = [
+        threading.Thread(target=keep_writing, args=(f"producer-{index}",), daemon=True)
+        for index in range(4)
+    ]
+    try:
+        for producer in producers:
+            producer.start()
+        writer.submit(_insert, ("flushed",), wait=False)
+        _call_within(writer.flush)
+        assert "flushed" in _stored_ids(conversation_db.DB_FILE)
+    finally:
+        stop.set()
+        for producer in producers:
+            producer.join(TIMEOUT)
+        writer.stop()
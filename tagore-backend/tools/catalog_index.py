@@ -0,0 +1,272 @@
+import os
+import random
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Fields of a work record, in the order they are stored
+WORK_FIELDS = ("id", "title", "category", "has_parts", "date_created")
+
+# Minimum trigram similarity for a fuzzy title to resolve a lookup, and to
+# be offered as a suggestion
+MATCH_SIMILARITY = 0.45
+SUGGESTION_SIMILARITY = 0.2
+
+# How far the best fuzzy title must score above the next one to resolve a
+# lookup; closer calls return not-found with suggestions instead
+MATCH_MARGIN = 0.1
+
+# A less similar title still resolves a lookup when no other title comes
+# close, as with a typo in a short title ("The Chld")
+SOLE_MATCH_SIMILARITY = 0.3
+SOLE_MATCH_MARGIN = 0.3
+
+# Spellings that vary between transliterations of Bengali titles
+# (Cabuliwallah / Kabuliwala, Baishnab / Vaishnava), folded together before
+# comparing
+TRANSLITERATION_FOLDS = (
+    (re.compile(r"(.)\1+"), r"\1"),
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"c(?!h)"), "k"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"b(?=[aeiou])"), "v"),
+)
+
+LEADING_ARTICLE = re.compile(r"^(the|a|an) ")
+
+
+def normalize_title(title: str) -> str:
+    """Lowercase a title, strip accents and punctuation and collapse spaces"""
+    title = unicodedata.normalize("NFKD", title.lower())
+    title = "".join(char if char.isalnum() else " " for char in title if not unicodedata.combining(char))
+    return " ".join(title.split())
+
+
+def title_trigrams(title: str) -> frozenset:
+    """
+    The trigrams of a title's words, after normalizing it, dropping a
+    leading article and folding transliteration variants; each word is
+    padded with two spaces in front and one behind, as in pg_trgm
+    """
+    folded = LEADING_ARTICLE.sub("", normalize_title(title))
+    for pattern, replacement in TRANSLITERATION_FOLDS:
+        folded = pattern.sub(replacement, folded)
+    trigrams = set()
+    for word in folded.split():
+        padded = f"  {word} "
+        trigrams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(trigrams)
+
+
+class CatalogSnapshot:
+    """
+    One immutable load of the works table
+
+    Works are kept as tuples in WORK_FIELDS order, in id order, in one list,
+    by id and grouped by category, along with the part numbers of each work;
+    titles are indexed for the exact lookup, kept lowercased, shortest
+    first, for the substring search, and broken into trigrams for the fuzzy
+    one.
+    """
+
+    def __init__(self, rows, part_rows, version):
+        self.version = version
+        self.works = [tuple(row) for row in rows]
+        # Part numbers of each work, ascending; the content stays in SQLite
+        self.part_numbers = {}
+        for work_id, part_number in part_rows:
+            self.part_numbers.setdefault(work_id, []).append(part_number)
+        self.by_id = {}
+        self.by_category = {}
+        self.by_title = {}
+        for work in self.works:
+            self.by_id[work[0]] = work
+            self.by_category.setdefault(work[2], []).append(work)
+            # The first work with a title wins, as with the SQL lookup
+            self.by_title.setdefault(work[1], work)
+        self.by_length = sorted(
+            ((work[1].lower(), work) for work in self.works), key=lambda entry: len(entry[0])
+        )
+
+        # Case, accent and punctuation insensitive exact titles, and an
+        # inverted index from trigram to the works whose titles contain it
+        self.by_normalized = {}
+        self.trigrams = []
+        self.postings = {}
+        for position, work in enumerate(self.works):
+            self.by_normalized.setdefault(normalize_title(work[1]), work)
+            trigrams = title_trigrams(work[1])
+            self.trigrams.append(trigrams)
+            for trigram in trigrams:
+                self.postings.setdefault(trigram, []).append(position)
+
+    def similar(self, title, threshold):
+        """
+        Works whose titles share trigrams with title, as (similarity, work)
+        pairs, most similar (then shortest) first
+
+        Similarity is the Jaccard index of the two trigram sets, so only
+        works sharing at least one trigram are scored.
+        """
+        query = title_trigrams(title)
+        if not query:
+            return []
+        shared = Counter(
+            position for trigram in query for position in self.postings.get(trigram, ())
+        )
+        scored = []
+        for position, count in shared.items():
+            similarity = count / (len(query) + len(self.trigrams[position]) - count)
+            if similarity >= threshold:
+                scored.append((similarity, self.works[position]))
+        scored.sort(key=lambda entry: (-entry[0], len(entry[1][1])))
+        return scored
+
+
+class CatalogIndex:
+    """
+    Process-wide in-memory index of the works in creations.db
+
+    The catalog only changes when manage_creations.py runs, so it is read
+    once and served from memory. Every access compares the database file's
+    modification time and size with the loaded snapshot and reloads on a
+    change; a reload builds a new snapshot and swaps it in whole, so readers
+    never see a half-loaded catalog.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self.loads = 0
+
+    def file_version(self):
+        """The database file's modification time and size"""
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            return (None, None)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def snapshot(self) -> CatalogSnapshot:
+        """The current snapshot, (re)loading it if the database changed"""
+        version = self.file_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with self._load_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == version:
+                return snapshot
+
+            conn = sqlite3.connect(self.db_path)
+            try:
+                rows = conn.execute(
+                    """
+                    SELECT w.id, w.title, c.name, w.has_parts, w.date_created
+                    FROM works w
+                    JOIN categories c ON w.category_id = c.id
+                    ORDER BY w.id
+                    """
+                ).fetchall()
+                part_rows = conn.execute(
+                    "SELECT work_id, part_number FROM work_parts ORDER BY work_id, part_number"
+                ).fetchall()
+            finally:
+                conn.close()
+
+            snapshot = CatalogSnapshot(rows, part_rows, version)
+            self._snapshot = snapshot
+            self.loads += 1
+            return snapshot
+
+    def invalidate(self):
+        """Force a reload on the next access"""
+        self._snapshot = None
+
+    @staticmethod
+    def as_dict(work) -> Dict:
+        """A fresh dict for one work record"""
+        return dict(zip(WORK_FIELDS, work))
+
+    def list_works(self, category: str = "all", sample: Optional[int] = None) -> List[Dict]:
+        """
+        Works of a category ("all" for every work), in id order
+
+        Args:
+            category (str): Category name or "all"
+            sample (int, optional): Return this many works picked at random
+                instead; only the picked records are copied
+
+        Returns:
+            list: Work dicts with the WORK_FIELDS keys
+        """
+        snapshot = self.snapshot()
+        works = snapshot.works if category == "all" else snapshot.by_category.get(category, [])
+        if sample is not None and works:
+            works = random.sample(works, min(sample, len(works)))
+        return [self.as_dict(work) for work in works]
+
+    def find_title(self, title: str, fuzzy_match: bool = True) -> Optional[Dict]:
+        """
+        The work with exactly this title or, with fuzzy_match, the first of:
+        the same title ignoring case, accents and punctuation; the most
+        similar title by trigrams, if at least MATCH_SIMILARITY and
+        MATCH_MARGIN above the next one (or SOLE_MATCH_SIMILARITY and
+        SOLE_MATCH_MARGIN above it)
+
+        A title merely containing the query does not resolve it ("The Home"
+        is not "The Home Coming"); it is offered by title_suggestions.
+        """
+        snapshot = self.snapshot()
+        work = snapshot.by_title.get(title)
+        if work is None and fuzzy_match:
+            work = snapshot.by_normalized.get(normalize_title(title))
+        if work is None and fuzzy_match:
+            matches = snapshot.similar(title, 0.0)
+            if matches:
+                best = matches[0][0]
+                margin = best - (matches[1][0] if len(matches) > 1 else 0.0)
+                if (best >= MATCH_SIMILARITY and margin >= MATCH_MARGIN) or (
+                    best >= SOLE_MATCH_SIMILARITY and margin >= SOLE_MATCH_MARGIN
+                ):
+                    work = matches[0][1]
+        return self.as_dict(work) if work is not None else None
+
+    def find_id(self, work_id: int) -> Optional[Dict]:
+        """The work with this id"""
+        work = self.snapshot().by_id.get(work_id)
+        return self.as_dict(work) if work is not None else None
+
+    def part_numbers(self, work_id: int) -> List[int]:
+        """The part numbers of a work, ascending"""
+        return self.snapshot().part_numbers.get(work_id, [])
+
+    def title_suggestions(self, title: str, limit: int = 3) -> List[str]:
+        """
+        Up to limit titles: those containing title, shortest first, then
+        the most similar ones by trigrams
+        """
+        snapshot = self.snapshot()
+        suggestions = [work[1] for work in self._containing(snapshot, title, limit)]
+        for _, work in snapshot.similar(title, SUGGESTION_SIMILARITY):
+            if len(suggestions) >= limit:
+                break
+            if work[1] not in suggestions:
+                suggestions.append(work[1])
+        return suggestions
+
+    @staticmethod
+    def _containing(snapshot, title, limit):
+        needle = title.lower()
+        matches = []
+        for lowered, work in snapshot.by_length:
+            if needle in lowered:
+                matches.append(work)
+                if len(matches) >= limit:
+                    break
+        return matches
@@ -1,3 +1,4 @@
+import itertools
 import json
 import os
 import sqlite3
@@ -215,6 +216,30 @@ def get_connection():
     """Get a database connection"""
     return sqlite3.connect(DB_PATH)
 
+# Bumped after every committed write so that cached tool results can tell
+# the inventory has changed (see services.tool_memo)
+_write_counter = itertools.count(1)
+_write_generation = 0
+
+def _record_write():
+    global _write_generation
+    _write_generation = next(_write_counter)
+
+def data_version():
+    """
+    Identify the current inventory contents
+
+    Returns:
+        tuple: This process's write generation plus the database file's
+            modification time and size, which also change on writes made
+            by other processes
+    """
+    try:
+        stat = os.stat(DB_PATH)
+    except OSError:
+        return (_write_generation, None, None)
+    return (_write_generation, stat.st_mtime_ns, stat.st_size)
+
 def list_items(params: Optional[Dict] = None) -> Dict:
     """
     List items from the inventory with filtering and sorting options.
@@ -380,6 +405,7 @@ def create_item(params: Dict) -> Dict:
         item_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        _record_write()
         
         return {
             "success": True, 
@@ -456,6 +482,7 @@ def update_item(params: Dict) -> Dict:
         
         conn.commit()
         conn.close()
+        _record_write()
         
         return {
             "success": True,
@@ -498,30 +525,26 @@ def record_transaction(params: Dict) -> Dict:
         conn = get_connection()
         cursor = conn.cursor()
         
-        # Get the current stock level
-        cursor.execute("SELECT stock FROM items WHERE id = ?", (item_id,))
+        # Apply the change relative to the stored stock in one statement, so
+        # concurrent transactions on the same item cannot lose an update
+        change = -quantity if transaction_type == "sale" else quantity
+        cursor.execute(
+            "UPDATE items SET stock = stock + ? WHERE id = ? AND stock + ? >= 0 RETURNING stock",
+            (change, item_id, change)
+        )
         result = cursor.fetchone()
         
         if not result:
+            cursor.execute("SELECT stock FROM items WHERE id = ?", (item_id,))
+            row = cursor.fetchone()
+            conn.rollback()
             conn.close()
-            return {"success": False, "error": f"Item with ID {item_id} not found"}
-        
-        current_stock = result[0]
+            if not row:
+                return {"success": False, "error": f"Item with ID {item_id} not found"}
+            return {"success": False, "error": f"Insufficient stock: {row[0]} available, {quantity} requested"}
         
-        # Calculate new stock level
-        if transaction_type == "sale":
-            if current_stock < quantity:
-                conn.close()
-                return {"success": False, "error": f"Insufficient stock: {current_stock} available, {quantity} requested"}
-            new_stock = current_stock - quantity
-        else:  # purchase
-            new_stock = current_stock + quantity
-        
-        # Update the stock level
-        cursor.execute(
-            "UPDATE items SET stock = ? WHERE id = ?",
-            (new_stock, item_id)
-        )
+        new_stock = result[0]
+        current_stock = new_stock - change
         
         # Record the transaction
         cursor.execute(
@@ -531,6 +554,7 @@ def record_transaction(params: Dict) -> Dict:
         
         conn.commit()
         conn.close()
+        _record_write()
         
         return {
             "success": True,
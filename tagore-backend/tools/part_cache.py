@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List
+from lru import ByteBudgetLRU
+
+# Upper bound on the text held by the work part cache
+PART_CACHE_MAX_BYTES = int(
+    os.environ.get("TAGORE_PART_CACHE_MAX_BYTES", str(8 * 1024 * 1024))
+)
+
+# Stay below SQLite's default limit on host parameters per statement
+MAX_QUERY_PARTS = 500
+
+
+class WorkPartCache:
+    """
+    Process-wide LRU cache of work part content keyed by
+    (work_id, part_number)
+
+    On a miss only the missing parts are read, with a range query when they
+    are consecutive. Entries are evicted least-recently-used first once the
+    cached text exceeds max_bytes, and everything is dropped when the
+    catalog version the caller passes in changes.
+    """
+
+    # Rough per-part overhead of the key tuple, the string header and dict slots
+    PART_OVERHEAD_BYTES = 150
+
+    def __init__(self, db_path, max_bytes=PART_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self._lru = ByteBudgetLRU(max_bytes)
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+
+    @property
+    def max_bytes(self):
+        return self._lru.max_bytes
+
+    @classmethod
+    def _part_size(cls, content):
+        return len(content) + cls.PART_OVERHEAD_BYTES
+
+    def get_parts(
+        self, work_id: int, part_numbers: Iterable[int], version=None, store=True
+    ) -> List[Dict]:
+        """
+        The content of some parts of a work
+
+        Args:
+            work_id (int): The work
+            part_numbers (iterable): The parts wanted, in the order to return them
+            version: The catalog's data version; a different one than on the
+                previous call clears the cache first
+            store (bool): Whether to cache the parts read on a miss; long
+                sequential reads pass False so they do not evict the
+                popular parts
+
+        Returns:
+            list: {"part_number", "content"} dicts for the parts that exist
+        """
+        part_numbers = list(part_numbers)
+        found = {}
+        with self._lock:
+            if version != self._version:
+                self._lru.clear()
+                self._version = version
+            for part_number in part_numbers:
+                content = self._lru.get((work_id, part_number))
+                if content is None:
+                    self.misses += 1
+                    continue
+                self.hits += 1
+                found[part_number] = content
+
+        missing = [part_number for part_number in part_numbers if part_number not in found]
+        if missing:
+            loaded = self._load(work_id, missing)
+            found.update(loaded)
+            with self._lock:
+                self.queries += -(-len(missing) // MAX_QUERY_PARTS)
+                if store and version == self._version:
+                    for part_number, content in loaded.items():
+                        self._lru.put((work_id, part_number), content, self._part_size(content))
+
+        return [
+            {"part_number": part_number, "content": found[part_number]}
+            for part_number in part_numbers
+            if part_number in found
+        ]
+
+    def _load(self, work_id, part_numbers):
+        """Read just these parts of a work"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            loaded = {}
+            for start in range(0, len(part_numbers), MAX_QUERY_PARTS):
+                batch = sorted(part_numbers[start : start + MAX_QUERY_PARTS])
+                if batch[-1] - batch[0] == len(batch) - 1:
+                    # Consecutive parts: one range scan of the unique index
+                    rows = conn.execute(
+                        """
+                        SELECT part_number, content FROM work_parts
+                        WHERE work_id = ? AND part_number BETWEEN ? AND ?
+                        """,
+                        (work_id, batch[0], batch[-1]),
+                    )
+                else:
+                    rows = conn.execute(
+                        f"""
+                        SELECT part_number, content FROM work_parts
+                        WHERE work_id = ? AND part_number IN ({", ".join("?" * len(batch))})
+                        """,
+                        (work_id, *batch),
+                    )
+                loaded.update(rows.fetchall())
+            return loaded
+        finally:
+            conn.close()
+
+    def clear(self):
+        """Drop every cached part"""
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self):
+        """Return hit/miss counters and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self._lru.evictions,
+                "queries": self.queries,
+                "parts": len(self._lru),
+                "bytes": self._lru.total_bytes,
+                "max_bytes": self._lru.max_bytes,
+            }
+
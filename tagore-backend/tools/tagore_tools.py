@@ -1,8 +1,11 @@
 import json
 import os
-import random
+import re
 import sqlite3
+from contextlib import closing
 from typing import Dict, List, Optional, Union
+from tools.catalog_index import CatalogIndex
+from tools.part_cache import WorkPartCache
 
 # Define the database path - ensure it's consistent with manage_creations.py
 DB_DIR = os.path.abspath(
@@ -10,6 +13,32 @@ DB_DIR = os.path.abspath(
 )
 DB_PATH = os.path.join(DB_DIR, "creations.db")
 
+# Works and titles served from memory instead of a query per call
+catalog = CatalogIndex(DB_PATH)
+
+# Part content of recently read works, loaded part by part
+part_cache = WorkPartCache(DB_PATH)
+
+# Parts read per query when a whole work is streamed
+STREAM_BATCH_PARTS = 8
+
+# Parts of a whole work put in a non-streamed chat reply; the reply points
+# to /api/works/<id>/parts for the rest
+INLINE_WORK_PARTS = 5
+
+# Most hits search_works returns, whatever limit the model asks for
+SEARCH_MAX_HITS = 20
+
+
+def data_version():
+    """
+    Identify the current catalog contents by the database file's
+    modification time and size (works are edited by manage_creations.py,
+    in another process)
+    """
+    return catalog.file_version()
+
+
 # Define tool schemas
 LIST_WORKS_TOOL = {
     "name": "list_works",
@@ -66,6 +95,66 @@ GET_WORK_CONTENT_TOOL = {
     },
 }
 
+SEARCH_WORKS_TOOL = {
+    "name": "search_works",
+    "description": "Searches the titles and full text of Tagore's works for words or a remembered line, e.g. 'the poem about the mind without fear'. Returns the best matching works and parts with a short snippet of the matching text; read one with get_work_content using its title and part number.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "Words, a theme or a quoted line to search for",
+            },
+            "category": {
+                "type": "string",
+                "description": "Category of works to search ('poem', 'short-stories', 'essay', 'non-fiction', or 'all')",
+                "enum": ["poem", "short-stories", "essay", "non-fiction", "all"],
+            },
+            "limit": {
+                "type": "integer",
+                "description": "Maximum number of matches to return",
+                "default": 5,
+            },
+        },
+        "required": ["query"],
+    },
+}
+
+# Words of a search query; each is quoted so FTS5 operators and punctuation
+# in user text are matched literally
+SEARCH_TERM = re.compile(r"\w+")
+
+# Words that describe the request rather than the work ("the poem about ...")
+SEARCH_STOPWORDS = {
+    "a", "about", "an", "and", "called", "essay", "goes", "in", "is", "line",
+    "lines", "of", "on", "one", "poem", "poems", "song", "songs", "stories",
+    "story", "that", "the", "titled", "to", "which", "work", "works",
+}
+
+# Title matches count ten times as much as content matches in the ranking
+SEARCH_QUERY = """
+SELECT w.id, w.title, c.name AS category, w.has_parts, p.part_number,
+       snippet(works_fts, 1, '', '', '...', 16) AS snippet,
+       bm25(works_fts, 10.0, 1.0) AS rank
+FROM works_fts
+JOIN work_parts p ON p.id = works_fts.rowid
+JOIN works w ON w.id = p.work_id
+JOIN categories c ON c.id = w.category_id
+WHERE works_fts MATCH ?
+"""
+
+
+def _limit_param(params: Dict, default: int, maximum: Optional[int] = None) -> int:
+    """
+    The "limit" tool parameter as a positive int, falling back to default
+    when it is missing or not a number and capped at maximum
+    """
+    try:
+        limit = max(int(params.get("limit", default)), 1)
+    except (TypeError, ValueError):
+        limit = default
+    return min(limit, maximum) if maximum is not None else limit
+
 
 def list_works(params: Optional[Dict] = None) -> Dict:
     """
@@ -84,39 +173,13 @@ def list_works(params: Optional[Dict] = None) -> Dict:
     params = params or {}
     category = params.get("category", "all")
     random_select = params.get("random", False)
-    limit = params.get("limit", 5)
+    limit = _limit_param(params, 5)
 
     try:
-        # Connect to the SQLite database
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        # Build the query
-        query = """
-        SELECT w.id, w.title, c.name as category, w.has_parts, w.date_created
-        FROM works w
-        JOIN categories c ON w.category_id = c.id
-        """
-
-        query_params = ()
-        if category != "all":
-            query += " WHERE c.name = ?"
-            query_params = (category,)
-
-        # Get all matching works
-        cursor.execute(query, query_params)
-        rows = cursor.fetchall()
-
-        # Convert rows to dictionaries
-        works = [dict(row) for row in rows]
-
-        # Handle randomization
-        if random_select and works:
-            # Randomly select up to 'limit' works
-            selected_works = random.sample(works, min(limit, len(works)))
-        else:
-            selected_works = works
+        # Sample straight from the index rather than copying every work first
+        selected_works = catalog.list_works(
+            category, sample=limit if random_select else None
+        )
 
         # Format the response
         result = {
@@ -126,14 +189,36 @@ def list_works(params: Optional[Dict] = None) -> Dict:
             "randomized": random_select,
         }
 
-        conn.close()
         return result
 
     except Exception as e:
         return {"error": str(e)}
 
 
-def get_work_content(params: Dict) -> Dict:
+def iter_work_parts(work_id: int, part_numbers: List[int], batch_size: int = STREAM_BATCH_PARTS):
+    """
+    Read parts of a work lazily, batch_size parts per query.
+
+    Parts already in the part cache are served from it; the others are read
+    without being cached, so one long read neither holds the whole work in
+    memory nor evicts the popular parts.
+
+    Args:
+        work_id (int): The work
+        part_numbers (list): The parts to read, in order
+        batch_size (int): Parts read per query
+
+    Yields:
+        dict: {"part_number", "content"} for each part that exists
+    """
+    version = data_version()
+    for start in range(0, len(part_numbers), batch_size):
+        yield from part_cache.get_parts(
+            work_id, part_numbers[start : start + batch_size], version, store=False
+        )
+
+
+def get_work_content(params: Dict, stream_parts: bool = False) -> Dict:
     """
     Retrieve a specific work's content by title.
 
@@ -143,6 +228,9 @@ def get_work_content(params: Dict) -> Dict:
             - fuzzy_match (bool): Whether to perform fuzzy matching on the title
             - part_number (int, optional): Specific part number to retrieve
             - whole_work (bool): Whether to retrieve the entire work with all parts
+        stream_parts (bool): For whole_work, return only the part numbers
+            and mark the response "streamed"; format_work_content_response
+            then reads the parts lazily while its chunks are consumed
 
     Returns:
         dict: A structured response containing the work and its content
@@ -156,104 +244,53 @@ def get_work_content(params: Dict) -> Dict:
         return {"error": "Title is required"}
 
     try:
-        # Connect to the SQLite database
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        # Try to find the work by exact title first
-        cursor.execute(
-            """
-            SELECT w.id, w.title, c.name as category, w.has_parts, w.date_created
-            FROM works w
-            JOIN categories c ON w.category_id = c.id
-            WHERE w.title = ?
-            """,
-            (title,),
-        )
+        # Exact title first, then the most similar one if it is a clear match
+        work_dict = catalog.find_title(title, fuzzy_match)
 
-        work = cursor.fetchone()
-
-        # If not found and fuzzy matching is enabled, try a LIKE search
-        if work is None and fuzzy_match:
-            cursor.execute(
-                """
-                SELECT w.id, w.title, c.name as category, w.has_parts, w.date_created
-                FROM works w
-                JOIN categories c ON w.category_id = c.id
-                WHERE w.title LIKE ?
-                ORDER BY length(w.title)  /* Prioritize shorter titles as more likely exact matches */
-                LIMIT 1
-                """,
-                (f"%{title}%",),
-            )
-            work = cursor.fetchone()
-
-        if work is None:
-            conn.close()
+        if work_dict is None:
             return {
                 "found": False,
                 "message": f"No work found with title '{title}'",
                 "suggestions": get_title_suggestions(title) if fuzzy_match else [],
             }
 
-        # Convert to dict
-        work_dict = dict(work)
-
-        cursor.execute(
-            """
-            SELECT part_number, content
-            FROM work_parts
-            WHERE work_id = ?
-            ORDER BY part_number
-            """,
-            (work_dict["id"],),
-        )
-
-        all_parts = []
-        for row in cursor.fetchall():
-            all_parts.append(
-                {"part_number": row["part_number"], "content": row["content"]}
-            )
-
-        # Handle the special cases for part selection
-        selected_parts = []
+        # Pick the part numbers first, so only those parts are read
+        part_numbers = catalog.part_numbers(work_dict["id"])
 
-        # Case 1: If title contains "Gitanjali" and no specific part is requested, return part 35
-        if "gitanjali" in title.lower() and not part_number and not whole_work:
-            for part in all_parts:
-                if part["part_number"] == 35:
-                    selected_parts = [part]
-                    break
-            # If part 35 was not found, fall back to the first part or all parts
-            if not selected_parts and all_parts:
-                selected_parts = [all_parts[0]]
+        # Case 1: If the resolved work is Gitanjali (however the title was
+        # spelled) and no specific part is requested, return part 35
+        if "gitanjali" in work_dict["title"].lower() and not part_number and not whole_work:
+            # If part 35 is missing, fall back to the first part
+            selected = [35] if 35 in part_numbers else part_numbers[:1]
 
         # Case 2: If a specific part number is requested
         elif part_number is not None:
-            for part in all_parts:
-                if part["part_number"] == part_number:
-                    selected_parts = [part]
-                    break
             # If requested part was not found, indicate this in the response
-            if not selected_parts:
+            if part_number not in part_numbers:
                 return {
                     "found": True,
                     "work": work_dict,
                     "message": f"Part {part_number} not found for '{title}'",
                 }
+            selected = [part_number]
 
         # Case 3: Return all parts if whole_work is True
         elif whole_work:
-            selected_parts = all_parts
+            if stream_parts:
+                work_dict["part_numbers"] = part_numbers
+                return {
+                    "found": True,
+                    "work": work_dict,
+                    "streamed": True,
+                    "message": f"All {len(part_numbers)} part(s) of '{work_dict['title']}' are being shown to the user; request a part_number to read one of them",
+                }
+            selected = part_numbers
 
         # Case 4: Default behavior - return only the first part
-        elif all_parts:
-            selected_parts = [all_parts[0]]
-
-        work_dict["parts"] = selected_parts
+        else:
+            selected = part_numbers[:1]
 
-        conn.close()
+        work_dict["parts"] = part_cache.get_parts(work_dict["id"], selected, data_version())
 
         return {"found": True, "work": work_dict}
 
@@ -261,6 +298,80 @@ def get_work_content(params: Dict) -> Dict:
         return {"error": str(e)}
 
 
+def search_works(params: Dict) -> Dict:
+    """
+    Full-text search over the titles and content of the works.
+
+    Uses the works_fts index that manage_creations.py builds and keeps in
+    sync. Words that only describe the request ("the poem about") are
+    dropped; all remaining words must match, or if nothing does, any of them.
+
+    Args:
+        params (dict): Parameters for the search
+            - query (str): Words or a line to look for
+            - category (str): Category to search in, or 'all'
+            - limit (int): Maximum number of hits, at most SEARCH_MAX_HITS
+
+    Returns:
+        dict: A structured response with the ranked hits (work, part and
+            snippet), best first
+    """
+    query = params.get("query")
+    category = params.get("category", "all")
+    limit = _limit_param(params, 5, SEARCH_MAX_HITS)
+
+    words = SEARCH_TERM.findall((query or "").lower())
+    if not words:
+        return {"error": "A search query is required"}
+    terms = [word for word in words if word not in SEARCH_STOPWORDS] or words
+
+    sql = SEARCH_QUERY
+    category_params = ()
+    if category != "all":
+        sql += " AND c.name = ?"
+        category_params = (category,)
+    sql += " ORDER BY rank LIMIT ?"
+
+    try:
+        with closing(sqlite3.connect(DB_PATH)) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            rows = []
+            for operator in (" AND ", " OR "):
+                expression = operator.join(f'"{term}"' for term in terms)
+                cursor.execute(sql, (expression, *category_params, limit))
+                rows = cursor.fetchall()
+                if rows or len(terms) == 1:
+                    break
+
+    except sqlite3.OperationalError as e:
+        if "works_fts" in str(e):
+            return {"error": "The search index is missing; run manage_creations.py init"}
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": str(e)}
+
+    hits = [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "category": row["category"],
+            "part_number": row["part_number"] if row["has_parts"] else None,
+            "snippet": " ".join(row["snippet"].split()),
+        }
+        for row in rows
+    ]
+
+    return {
+        "query": query,
+        "category": category,
+        "hits": hits,
+        "count": len(hits),
+        "all_words": operator == " AND ",
+    }
+
+
 def get_title_suggestions(title: str, limit: int = 3) -> List[str]:
     """
     Get title suggestions for a failed search.
@@ -273,25 +384,7 @@ def get_title_suggestions(title: str, limit: int = 3) -> List[str]:
         list: A list of suggested titles
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # Get similar titles
-        cursor.execute(
-            """
-            SELECT title
-            FROM works
-            WHERE title LIKE ?
-            ORDER BY length(title)
-            LIMIT ?
-            """,
-            (f"%{title}%", limit),
-        )
-
-        suggestions = [row[0] for row in cursor.fetchall()]
-        conn.close()
-
-        return suggestions
+        return catalog.title_suggestions(title, limit)
 
     except Exception:
         return []
@@ -403,12 +496,15 @@ def format_works_response(tool_response: Dict) -> List[Dict]:  # type: ignore
         }
 
 
-def format_work_content_response(tool_response: Dict) -> List[Dict]:  # type: ignore
+def format_work_content_response(tool_response: Dict, max_parts: Optional[int] = None) -> List[Dict]:  # type: ignore
     """
     Format the get_work_content tool response for display
 
     Args:
         tool_response (dict): Response from the get_work_content function
+        max_parts (int, optional): For a streamed whole work, show only the
+            first max_parts parts, followed by a "work_parts" item with the
+            cursor to page through the rest with
 
     Returns:
         Generator yielding formatted chunks for display
@@ -450,8 +546,20 @@ def format_work_content_response(tool_response: Dict) -> List[Dict]:  # type: ig
         "speakable": False,
     }
 
-    parts = work.get("parts", [])
-    if len(parts) > 1:
+    next_from = None
+    if tool_response.get("streamed"):
+        # Read a few parts at a time as the chunks are consumed
+        part_numbers = work["part_numbers"]
+        part_count = len(part_numbers)
+        if max_parts is not None and part_count > max_parts:
+            next_from = part_numbers[max_parts]
+            part_numbers = part_numbers[:max_parts]
+        parts = iter_work_parts(work["id"], part_numbers)
+    else:
+        parts = work.get("parts", [])
+        part_count = len(parts)
+
+    if part_count > 1:
         # Multi-part work
         for part in parts:
             part_number = part["part_number"]
@@ -462,10 +570,26 @@ def format_work_content_response(tool_response: Dict) -> List[Dict]:  # type: ig
                 "content": f"## Part {part_number}\n\n{content}\n\n",
                 "speakable": False,
             }
+
+        if next_from is not None:
+            yield {
+                "type": "chunk",
+                "content": f"*Showing {max_parts} of {part_count} parts. Ask me for part {next_from} to read on.*\n",
+                "speakable": False,
+            }
+            yield {
+                "type": "work_parts",
+                "workId": work["id"],
+                "title": title,
+                "partCount": part_count,
+                "nextFrom": next_from,
+                "url": f"/api/works/{work['id']}/parts?from={next_from}",
+            }
     else:
         # Single-part work
-        if parts:
-            content = parts[0]["content"]
+        part = next(iter(parts), None)
+        if part:
+            content = part["content"]
             yield {"type": "chunk", "content": f"{content}\n", "speakable": True}
         else:
             yield {
@@ -475,12 +599,66 @@ def format_work_content_response(tool_response: Dict) -> List[Dict]:  # type: ig
             }
 
 
+def format_search_response(tool_response: Dict) -> List[Dict]:  # type: ignore
+    """
+    Format the search_works tool response for display
+
+    Args:
+        tool_response (dict): Response from the search_works function
+
+    Returns:
+        Generator yielding formatted chunks for display
+    """
+    if "error" in tool_response:
+        yield {
+            "type": "chunk",
+            "content": f"\n\nSorry, I encountered an error while searching: {tool_response['error']}\n",
+            "speakable": False,
+        }
+        return
+
+    hits = tool_response.get("hits", [])
+    if not hits:
+        yield {
+            "type": "chunk",
+            "content": f"\n\nI couldn't find any of my works matching \"{tool_response.get('query')}\".\n",
+            "speakable": True,
+        }
+        return
+
+    yield {"type": "chunk", "content": "\n\n", "speakable": False}
+
+    for i, hit in enumerate(hits, 1):
+        part = f", part {hit['part_number']}" if hit.get("part_number") else ""
+        yield {
+            "type": "chunk",
+            "content": f'{i}. "{hit["title"]}"{part} ({hit["category"]})\n',
+            "speakable": False,
+        }
+        yield {
+            "type": "chunk",
+            "content": f"   {hit['snippet']}\n",
+            "speakable": False,
+        }
+
+    yield {
+        "type": "chunk",
+        "content": f'\nYou can ask me to read any of these, like "Please read {hits[0]["title"]}".\n',
+        "speakable": True,
+    }
+
+
 # Export the tools and functions for use in the ResponseService
 __all__ = [
     "LIST_WORKS_TOOL",
     "GET_WORK_CONTENT_TOOL",
+    "SEARCH_WORKS_TOOL",
+    "INLINE_WORK_PARTS",
     "list_works",
     "get_work_content",
+    "search_works",
+    "iter_work_parts",
     "format_works_response",
     "format_work_content_response",
+    "format_search_response",
 ]
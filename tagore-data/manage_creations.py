@@ -64,12 +64,96 @@ def init_db():
             "INSERT OR IGNORE INTO categories (name) VALUES (?)", (category,)
         )
 
+    # Create the full-text index, filling it if it is new
+    if init_search_index(cursor):
+        rebuild_search_index(cursor)
+
     conn.commit()
     conn.close()
 
     print(f"Database initialized at {DB_PATH}")
 
 
+def init_search_index(cursor):
+    """
+    Create the works_fts full-text index and the triggers that keep it in
+    sync with works and work_parts
+
+    The index has one row per work part (rowid = work_parts.id) covering the
+    work's title and the part's content, searched by the backend's
+    search_works tool. It is an external-content table over the
+    works_fts_source view, so the text itself is not stored twice. The
+    triggers follow every insert, update and delete, including the raw
+    UPDATEs of the interactive editor.
+
+    Returns:
+        bool: True if the index did not exist yet
+    """
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'works_fts'"
+    )
+    created = cursor.fetchone() is None
+
+    cursor.executescript(
+        """
+    CREATE VIEW IF NOT EXISTS works_fts_source AS
+    SELECT p.id, w.title, p.content
+    FROM work_parts p
+    JOIN works w ON w.id = p.work_id;
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS works_fts USING fts5(
+        title,
+        content,
+        content = 'works_fts_source',
+        content_rowid = 'id',
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS work_parts_fts_insert AFTER INSERT ON work_parts
+    BEGIN
+        INSERT INTO works_fts (rowid, title, content)
+        SELECT new.id, title, new.content FROM works WHERE id = new.work_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS work_parts_fts_update AFTER UPDATE ON work_parts
+    BEGIN
+        INSERT INTO works_fts (works_fts, rowid, title, content)
+        SELECT 'delete', old.id, title, old.content FROM works WHERE id = old.work_id;
+        INSERT INTO works_fts (rowid, title, content)
+        SELECT new.id, title, new.content FROM works WHERE id = new.work_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS work_parts_fts_delete AFTER DELETE ON work_parts
+    BEGIN
+        INSERT INTO works_fts (works_fts, rowid, title, content)
+        SELECT 'delete', old.id, title, old.content FROM works WHERE id = old.work_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS works_fts_title AFTER UPDATE OF title ON works
+    BEGIN
+        INSERT INTO works_fts (works_fts, rowid, title, content)
+        SELECT 'delete', id, old.title, content FROM work_parts WHERE work_id = old.id;
+        INSERT INTO works_fts (rowid, title, content)
+        SELECT id, new.title, content FROM work_parts WHERE work_id = new.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS works_fts_delete AFTER DELETE ON works
+    BEGIN
+        INSERT INTO works_fts (works_fts, rowid, title, content)
+        SELECT 'delete', id, old.title, content FROM work_parts WHERE work_id = old.id;
+    END;
+    """
+    )
+
+    return created
+
+
+def rebuild_search_index(cursor):
+    """Refill works_fts from works and work_parts"""
+    cursor.execute("INSERT INTO works_fts (works_fts) VALUES ('rebuild')")
+    cursor.execute("INSERT INTO works_fts (works_fts) VALUES ('optimize')")
+
+
 def add_work(category, title, content=None, has_parts=False):
     """
     Add a new work to the database
@@ -615,6 +699,11 @@ def main():
     view_parser.add_argument("-i", "--id", type=int, help="Work ID")
     view_parser.add_argument("-t", "--title", help="Work title")
 
+    # Rebuild the full-text index command
+    reindex_parser = subparsers.add_parser(
+        "reindex", help="Rebuild the full-text search index"
+    )
+
     args = parser.parse_args()
 
     if args.command == "init":
@@ -645,6 +734,16 @@ def main():
                 print(f"Created: {work['date_created']}")
                 if work["preview"]:
                     print(f"Preview: {work['preview']}")
+    elif args.command == "reindex":
+        init_db()  # Ensure database and index exist
+
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        rebuild_search_index(cursor)
+        conn.commit()
+        cursor.execute("SELECT COUNT(*) FROM works_fts")
+        print(f"Search index rebuilt with {cursor.fetchone()[0]} parts")
+        conn.close()
     elif args.command == "view":
         init_db()  # Ensure database exists
 